@@ -0,0 +1,91 @@
+"""Building blocks for screening many health records in one request.
+
+A batch is parsed (JSON or CSV), validated in a single pydantic pass,
+grouped by prediction cache key so identical inputs share one model call,
+and fanned out over a fixed number of workers. Completions are handed back
+in groups of whatever is ready, so the caller can write each group with one
+`insert_many` and stream it without waiting for the whole batch.
+"""
+import asyncio
+import csv
+import io
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from pydantic import TypeAdapter, ValidationError
+
+
+def _column_name(header: str) -> str:
+    return "_".join((header or "").strip().lower().replace("-", " ").split())
+
+
+def parse_csv_records(text: str) -> List[dict]:
+    """Rows of a CSV with a header line; blank cells become None so optional fields validate"""
+    reader = csv.reader(io.StringIO(text.lstrip("\ufeff")))
+    header = next(reader, None)
+    if header is None:
+        return []
+    columns = [_column_name(name) for name in header]
+    return [
+        {column: (value.strip() or None) for column, value in zip(columns, row)}
+        for row in reader
+        if any(value.strip() for value in row)
+    ]
+
+
+def validate_records(model, rows: List[Any]) -> Tuple[List[Tuple[int, Any]], List[dict]]:
+    """Validate every row against `model` in bulk.
+
+    Returns (index, instance) pairs for valid rows and {"index", "errors"} for
+    the rest. The common all-valid case is a single validator call; otherwise
+    the failing indexes come from the error locations and the remaining rows
+    are validated once more.
+    """
+    adapter = TypeAdapter(List[model])
+    try:
+        return list(enumerate(adapter.validate_python(rows))), []
+    except ValidationError as e:
+        errors: Dict[int, List[str]] = {}
+        for error in e.errors():
+            index, *location = error['loc']
+            field = ".".join(str(part) for part in location) or "record"
+            errors.setdefault(index, []).append(f"{field}: {error['msg']}")
+    valid_indexes = [index for index in range(len(rows)) if index not in errors]
+    instances = adapter.validate_python([rows[index] for index in valid_indexes])
+    invalid = [{"index": index, "errors": messages} for index, messages in sorted(errors.items())]
+    return list(zip(valid_indexes, instances)), invalid
+
+
+async def fan_out(items: List[Tuple[str, Any]], compute: Callable[[Any], Awaitable[dict]],
+                  concurrency: int) -> AsyncIterator[List[Tuple[str, Optional[dict], Optional[Exception]]]]:
+    """Run `compute` over (key, payload) items with at most `concurrency` in flight.
+
+    Yields lists of (key, result, error) in completion order, each holding
+    everything finished since the previous yield. Closing the iterator
+    cancels the workers.
+    """
+    if not items:
+        return
+    pending = iter(items)
+    completed: asyncio.Queue = asyncio.Queue()
+
+    async def worker():
+        # Workers share one iterator, so each item is taken exactly once
+        for key, payload in pending:
+            try:
+                completed.put_nowait((key, await compute(payload), None))
+            except Exception as e:
+                completed.put_nowait((key, None, e))
+
+    workers = [asyncio.create_task(worker()) for _ in range(min(concurrency, len(items)))]
+    try:
+        remaining = len(items)
+        while remaining:
+            ready = [await completed.get()]
+            while not completed.empty():
+                ready.append(completed.get_nowait())
+            remaining -= len(ready)
+            yield ready
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
@@ -0,0 +1,159 @@
+"""Streaming encoders for data exports.
+
+Every encoder consumes an async iterator of flat dicts (usually straight
+off a Motor cursor) and yields bytes in bounded chunks, so memory stays
+flat no matter how many rows are exported and the first bytes go out as
+soon as the first rows are read.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, List, Tuple
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# (column name, type) where type is one of: string, float, int, bool, timestamp
+ColumnSpec = List[Tuple[str, str]]
+
+CHUNK_BYTES = 64 * 1024
+PARQUET_ROW_GROUP = 10000
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def parquet_available() -> bool:
+    return pa is not None
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def _csv_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return "" if value is None else value
+
+
+async def stream_csv(rows: AsyncIterator[dict], columns: ColumnSpec) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, _ in columns])
+    # Send the header right away so the download starts immediately
+    yield buffer.getvalue().encode("utf-8")
+    buffer.seek(0)
+    buffer.truncate()
+
+    async for row in rows:
+        writer.writerow([_csv_value(row.get(name)) for name, _ in columns])
+        if buffer.tell() >= CHUNK_BYTES:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+async def stream_ndjson(rows: AsyncIterator[dict], columns: ColumnSpec) -> AsyncIterator[bytes]:
+    parts = []
+    size = 0
+    async for row in rows:
+        line = json.dumps({name: row.get(name) for name, _ in columns}, default=_json_default) + "\n"
+        parts.append(line)
+        size += len(line)
+        if size >= CHUNK_BYTES:
+            yield "".join(parts).encode("utf-8")
+            parts = []
+            size = 0
+    if parts:
+        yield "".join(parts).encode("utf-8")
+
+
+class _DrainableSink(io.RawIOBase):
+    """Write-only file object whose contents can be drained between row groups"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _arrow_schema(columns: ColumnSpec):
+    types = {
+        "string": pa.string(),
+        "float": pa.float64(),
+        "int": pa.int64(),
+        "bool": pa.bool_(),
+        "timestamp": pa.timestamp("us", tz="UTC"),
+    }
+    return pa.schema([(name, types[kind]) for name, kind in columns])
+
+
+async def stream_parquet(rows: AsyncIterator[dict], columns: ColumnSpec) -> AsyncIterator[bytes]:
+    """Write one row group per PARQUET_ROW_GROUP rows and ship it before reading on"""
+    schema = _arrow_schema(columns)
+    sink = _DrainableSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    batch = {name: [] for name, _ in columns}
+    count = 0
+
+    def write_batch():
+        writer.write_table(pa.Table.from_pydict(batch, schema=schema))
+        for values in batch.values():
+            values.clear()
+
+    async for row in rows:
+        for name, _ in columns:
+            batch[name].append(row.get(name))
+        count += 1
+        if count >= PARQUET_ROW_GROUP:
+            write_batch()
+            count = 0
+            yield sink.drain()
+    if count:
+        write_batch()
+    writer.close()
+    yield sink.drain()
+
+
+async def gzip_stream(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+    async for chunk in chunks:
+        # Sync-flush each chunk so compressed bytes reach the client without waiting on zlib's window
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+ENCODERS = {
+    "csv": stream_csv,
+    "ndjson": stream_ndjson,
+    "parquet": stream_parquet,
+}
@@ -0,0 +1,277 @@
+"""Durable background job queue backed by a Mongo collection.
+
+Jobs are documents with a `status` of queued, running, completed or dead.
+Each process keeps a fair in-memory schedule (round-robin across users)
+of the jobs it knows about, and a fixed pool of asyncio workers claims
+them with an atomic queued -> running transition. This means several
+processes can share one collection, and jobs left behind by a crash are
+picked up again once their lease expires.
+"""
+import asyncio
+import logging
+import random
+import uuid
+from collections import deque
+from datetime import datetime, timezone, timedelta
+from typing import Awaitable, Callable, Deque, Dict, Optional, Set
+
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ("completed", "dead")
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _as_utc(value: datetime) -> datetime:
+    # Mongo hands datetimes back naive unless the client is tz_aware; they are stored as UTC
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+class JobQueue:
+    def __init__(
+        self,
+        collection,
+        handler: Callable[[dict], Awaitable[dict]],
+        workers: int = 8,
+        max_attempts: int = 3,
+        job_timeout: float = 90.0,
+        base_backoff: float = 2.0,
+        max_backoff: float = 60.0,
+    ):
+        self.collection = collection
+        self.handler = handler
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.job_timeout = job_timeout
+        self.lease_seconds = job_timeout + 30
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+        self._queues: Dict[str, Deque[str]] = {}
+        self._users: Deque[str] = deque()
+        self._ready: Optional[asyncio.Semaphore] = None
+        self._known: Set[str] = set()
+        self._waiters: Dict[str, Set[asyncio.Event]] = {}
+        self._tasks = []
+
+        self.running = 0
+        self.scheduled_retries = 0
+        self.completed = 0
+        self.retried = 0
+        self.dead = 0
+
+    # ---- scheduling -------------------------------------------------------
+
+    def _push(self, user_id: str, job_id: str):
+        queue = self._queues.get(user_id)
+        if queue is None:
+            queue = self._queues[user_id] = deque()
+            self._users.append(user_id)
+        queue.append(job_id)
+        self._ready.release()
+
+    def _pop(self) -> str:
+        # Round-robin across users so one user's burst cannot starve the rest
+        user_id = self._users.popleft()
+        queue = self._queues[user_id]
+        job_id = queue.popleft()
+        if queue:
+            self._users.append(user_id)
+        else:
+            del self._queues[user_id]
+        return job_id
+
+    def _schedule(self, user_id: str, job_id: str, delay: float = 0.0):
+        self._known.add(job_id)
+        if delay <= 0:
+            self._push(user_id, job_id)
+            return
+        self.scheduled_retries += 1
+
+        def push_later():
+            self.scheduled_retries -= 1
+            self._push(user_id, job_id)
+
+        asyncio.get_running_loop().call_later(delay, push_later)
+
+    def _notify(self, job_id: str):
+        for event in self._waiters.pop(job_id, ()):
+            event.set()
+
+    # ---- public API -------------------------------------------------------
+
+    async def submit(self, user_id: str, payload: dict) -> dict:
+        now = _utcnow()
+        job = {
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "payload": payload,
+            "status": "queued",
+            "attempts": 0,
+            "error": None,
+            "result": None,
+            "next_attempt_at": now,
+            "lease_expires_at": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+        await self.collection.insert_one(dict(job))
+        self._schedule(user_id, job["id"])
+        return job
+
+    async def get(self, job_id: str, user_id: str) -> Optional[dict]:
+        return await self.collection.find_one({"id": job_id, "user_id": user_id}, {"_id": 0})
+
+    async def wait(self, job_id: str, timeout: float) -> bool:
+        """Wait for the next status change of a job handled by this process"""
+        event = asyncio.Event()
+        self._waiters.setdefault(job_id, set()).add(event)
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            # Jobs run elsewhere never notify here, so every waiter removes itself
+            waiters = self._waiters.get(job_id)
+            if waiters is not None:
+                waiters.discard(event)
+                if not waiters:
+                    del self._waiters[job_id]
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queue_depth,
+            "waiting_users": len(self._queues),
+            "scheduled_retries": self.scheduled_retries,
+            "running": self.running,
+            "workers": self.workers,
+            "completed": self.completed,
+            "retried": self.retried,
+            "dead": self.dead,
+        }
+
+    # ---- lifecycle --------------------------------------------------------
+
+    async def start(self):
+        self._ready = asyncio.Semaphore(0)
+        await self.recover()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._sweeper()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def recover(self):
+        """Requeue jobs whose lease expired and schedule queued jobs not yet known locally"""
+        now = _utcnow()
+        await self.collection.update_many(
+            {"status": "running", "lease_expires_at": {"$lt": now}},
+            {"$set": {"status": "queued", "lease_expires_at": None, "updated_at": now}}
+        )
+        cursor = self.collection.find(
+            {"status": "queued"},
+            {"_id": 0, "id": 1, "user_id": 1, "next_attempt_at": 1}
+        ).sort("created_at", 1)
+        async for job in cursor:
+            if job["id"] in self._known:
+                continue
+            next_attempt_at = _as_utc(job.get("next_attempt_at") or now)
+            self._schedule(job["user_id"], job["id"], (next_attempt_at - now).total_seconds())
+
+    async def _sweeper(self):
+        while True:
+            await asyncio.sleep(self.lease_seconds)
+            try:
+                await self.recover()
+            except Exception as e:
+                logger.error(f"Job recovery failed: {str(e)}")
+
+    async def _worker(self):
+        while True:
+            await self._ready.acquire()
+            job_id = self._pop()
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Forget the job so recover() schedules it again: still queued if the claim
+                # failed, or requeued once its lease expires if the settle failed
+                self._known.discard(job_id)
+                logger.error(f"Job {job_id} bookkeeping failed: {str(e)}")
+
+    async def _run(self, job_id: str):
+        now = _utcnow()
+        job = await self.collection.find_one_and_update(
+            {"id": job_id, "status": "queued", "next_attempt_at": {"$lte": now}},
+            {
+                "$set": {
+                    "status": "running",
+                    "lease_expires_at": now + timedelta(seconds=self.lease_seconds),
+                    "updated_at": now,
+                },
+                "$inc": {"attempts": 1},
+            },
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER,
+        )
+        if job is None:
+            # Claimed by another process, or no longer queued
+            self._known.discard(job_id)
+            return
+
+        self.running += 1
+        self._notify(job_id)
+        try:
+            result = await asyncio.wait_for(self.handler(job), timeout=self.job_timeout)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await self._fail(job, e)
+        else:
+            await self.collection.update_one(
+                {"id": job_id},
+                {"$set": {"status": "completed", "result": result, "error": None,
+                          "lease_expires_at": None, "updated_at": _utcnow()}}
+            )
+            self.completed += 1
+            self._known.discard(job_id)
+        finally:
+            self.running -= 1
+            self._notify(job_id)
+
+    async def _fail(self, job: dict, error: Exception):
+        message = str(error) or error.__class__.__name__
+        now = _utcnow()
+        if job["attempts"] >= self.max_attempts:
+            await self.collection.update_one(
+                {"id": job["id"]},
+                {"$set": {"status": "dead", "error": message, "lease_expires_at": None, "updated_at": now}}
+            )
+            self.dead += 1
+            self._known.discard(job["id"])
+            logger.error(f"Job {job['id']} moved to dead-letter after {job['attempts']} attempts: {message}")
+            return
+
+        # Exponential backoff with +/-50% jitter to avoid synchronized retries
+        delay = min(self.max_backoff, self.base_backoff * 2 ** (job["attempts"] - 1))
+        delay *= random.uniform(0.5, 1.5)
+        await self.collection.update_one(
+            {"id": job["id"]},
+            {"$set": {"status": "queued", "error": message, "lease_expires_at": None,
+                      "next_attempt_at": now + timedelta(seconds=delay), "updated_at": now}}
+        )
+        self.retried += 1
+        self._schedule(job["user_id"], job["id"], delay)
@@ -0,0 +1,68 @@
+"""Process entry point: python launcher.py serve [--workers N] [--host HOST] [--port PORT]
+
+Other commands (python launcher.py migrate-dates, ...) go to `server.main`.
+Spawned processes, both uvicorn workers and process pools, re-run the
+parent's __main__ module, so the entry point is this module rather than
+server.py: it imports nothing heavy, and each worker imports `server:app`
+exactly once.
+
+Each worker is a separate uvicorn process with its own event loop, Mongo
+pool and in-memory caches, so CPU-bound work (bcrypt, JWT, validation,
+JSON encoding) spreads across cores. The worker count is exported as
+WEB_CONCURRENCY, which the server reads to size its thread pools and
+to switch on the shared caches.
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+from typing import List
+
+
+def available_cores() -> int:
+    try:
+        # Respects CPU affinity and cgroup-pinned containers where available
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def default_workers() -> int:
+    configured = os.environ.get('WEB_CONCURRENCY')
+    return int(configured) if configured else available_cores()
+
+
+def serve(argv: List[str], app: str = "server:app", default_port: int = 8001):
+    parser = argparse.ArgumentParser(prog="launcher.py serve", description="Run the API with one or more worker processes")
+    parser.add_argument("--workers", type=int, default=default_workers(),
+                        help="worker processes (default: $WEB_CONCURRENCY or the number of usable cores)")
+    parser.add_argument("--host", default=os.environ.get('HOST', '0.0.0.0'))
+    parser.add_argument("--port", type=int, default=int(os.environ.get('PORT', str(default_port))))
+    parser.add_argument("--log-level", default=os.environ.get('LOG_LEVEL', 'info'))
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    # Inherited by the spawned workers
+    os.environ['WEB_CONCURRENCY'] = str(args.workers)
+
+    import uvicorn
+
+    uvicorn.run(
+        app,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        log_level=args.log_level,
+        proxy_headers=True,
+        app_dir=str(Path(__file__).parent),
+    )
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["serve"]:
+        serve(sys.argv[2:])
+    else:
+        import server
+
+        server.main(sys.argv[1:])
@@ -0,0 +1,41 @@
+"""Keyset pagination for list endpoints sorted newest first.
+
+A page ends with the (sort key, id) of its last row, packed into an
+opaque URL-safe cursor. The next page matches rows strictly after that
+pair in descending order, so rows sharing a sort key are split by id
+and never skipped or repeated, however far into the list the page is.
+"""
+import base64
+import json
+from datetime import datetime
+
+from fastapi import HTTPException
+
+
+def encode_cursor(sort_value: datetime, doc_id: str) -> str:
+    """Pack the (sort key, id) of the last row into an opaque page token"""
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps({"v": sort_value, "id": doc_id}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if not isinstance(data['id'], str):
+            raise TypeError("cursor id must be a string")
+        return datetime.fromisoformat(data['v']), data['id']
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def build_keyset_filter(field: str, last_value, last_id: str) -> dict:
+    """Match rows strictly after (last_value, last_id) in descending order"""
+    return {
+        "$or": [
+            {field: {"$lt": last_value}},
+            {field: last_value, "id": {"$lt": last_id}}
+        ]
+    }
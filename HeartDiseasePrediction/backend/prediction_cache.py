@@ -0,0 +1,133 @@
+"""Content-addressed cache for LLM heart-risk assessments.
+
+Entries are keyed on a hash of the rendered prompt plus the model name and
+prompt version, so submissions that would send the model the same prompt
+(from the same user or different ones) reuse one upstream completion, and
+any difference the prompt shows gets its own.
+"""
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone, timedelta
+from typing import Awaitable, Callable, Dict, Optional
+
+
+def cache_key(prompt: str, model: str, prompt_version: str) -> str:
+    """SHA-256 over the model, prompt version and the exact prompt text.
+
+    Hashing the prompt itself means values are compared as the model sees them;
+    no rounding or case folding can merge inputs that would get different answers.
+    """
+    return hashlib.sha256(f"{model}|{prompt_version}|{prompt}".encode('utf-8')).hexdigest()
+
+
+class PredictionCache:
+    """Two-tier cache: an in-process LRU with TTL and an optional shared Mongo collection.
+
+    Concurrent lookups for the same key share a single in-flight computation.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600, collection=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.collection = collection
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def _get_local(self, key: str) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _set_local(self, key: str, value: dict):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _get_shared(self, key: str) -> Optional[dict]:
+        if self.collection is None:
+            return None
+        doc = await self.collection.find_one(
+            {"_id": key, "expires_at": {"$gt": datetime.now(timezone.utc)}},
+            {"_id": 0, "value": 1}
+        )
+        return doc["value"] if doc else None
+
+    async def _set_shared(self, key: str, value: dict):
+        if self.collection is None:
+            return
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=self.ttl_seconds)
+        await self.collection.update_one(
+            {"_id": key},
+            {"$set": {"value": value, "expires_at": expires_at}},
+            upsert=True
+        )
+
+    async def _load(self, key: str, compute: Callable[[], Awaitable[dict]]) -> dict:
+        value = await self._get_shared(key)
+        if value is not None:
+            self.shared_hits += 1
+        else:
+            self.misses += 1
+            value = await compute()
+            await self._set_shared(key, value)
+        self._set_local(key, value)
+        return value
+
+    async def get(self, key: str) -> Optional[dict]:
+        """Look a key up in both tiers without computing it"""
+        value = self._get_local(key)
+        if value is not None:
+            self.local_hits += 1
+            return value
+        value = await self._get_shared(key)
+        if value is not None:
+            self.shared_hits += 1
+            self._set_local(key, value)
+            return value
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, value: dict):
+        self._set_local(key, value)
+        await self._set_shared(key, value)
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[dict]]) -> dict:
+        value = self._get_local(key)
+        if value is not None:
+            self.local_hits += 1
+            return value
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(self._load(key, compute))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shield so one cancelled caller does not cancel the shared upstream call
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        lookups = self.local_hits + self.shared_hits + self.misses + self.coalesced
+        hits = lookups - self.misses
+        return {
+            "entries": len(self._entries),
+            "local_hits": self.local_hits,
+            "shared_hits": self.shared_hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
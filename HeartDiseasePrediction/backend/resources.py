@@ -0,0 +1,91 @@
+"""Process-wide connections owned by the application lifespan.
+
+Importing the server opens nothing. `Resources` builds the Motor client on
+first use with `connect=False`, so the pool belongs to whichever process
+(or forked worker) actually serves requests. The lifespan then warms the
+pool and closes it on shutdown. `LazyDatabase` lets module-level code keep
+writing `db.<collection>` before any client exists.
+"""
+import asyncio
+from typing import Iterable
+
+
+class Resources:
+    def __init__(self, mongo_url: str, db_name: str, max_pool_size: int = 100, min_pool_size: int = 0,
+                 event_listeners: Iterable = ()):
+        self.mongo_url = mongo_url
+        self.db_name = db_name
+        self.max_pool_size = max_pool_size
+        self.min_pool_size = min_pool_size
+        self.event_listeners = list(event_listeners)
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            # Looked up at call time so a stand-in client patched into motor is honoured
+            from motor.motor_asyncio import AsyncIOMotorClient
+
+            self._client = AsyncIOMotorClient(
+                self.mongo_url,
+                tz_aware=True,
+                connect=False,
+                maxPoolSize=self.max_pool_size,
+                minPoolSize=self.min_pool_size,
+                event_listeners=self.event_listeners,
+            )
+        return self._client
+
+    @property
+    def db(self):
+        return self.client[self.db_name]
+
+    async def warm(self):
+        """Open min_pool_size connections (at least one) before the first request needs them"""
+        await asyncio.gather(*(self.client.admin.command("ping") for _ in range(max(1, self.min_pool_size))))
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+
+class LazyCollection:
+    """Resolves to the real collection of the current client on each attribute access"""
+
+    __slots__ = ("_resources", "_name", "_client", "_collection")
+
+    def __init__(self, resources: Resources, name: str):
+        self._resources = resources
+        self._name = name
+        self._client = None
+        self._collection = None
+
+    def _target(self):
+        client = self._resources.client
+        if client is not self._client:
+            self._client = client
+            self._collection = client[self._resources.db_name][self._name]
+        return self._collection
+
+    def __getattr__(self, attr):
+        return getattr(self._target(), attr)
+
+    def __repr__(self) -> str:
+        return f"LazyCollection({self._resources.db_name}.{self._name})"
+
+
+class LazyDatabase:
+    def __init__(self, resources: Resources):
+        self._resources = resources
+
+    def __getattr__(self, name: str) -> LazyCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        collection = LazyCollection(self._resources, name)
+        # Cached on the instance, so later lookups never reach __getattr__
+        setattr(self, name, collection)
+        return collection
+
+    def __getitem__(self, name: str) -> LazyCollection:
+        return getattr(self, name)
@@ -0,0 +1,230 @@
+"""Deterministic 10-year cardiovascular risk scoring.
+
+The core is the sex-specific Framingham general CVD model (D'Agostino et
+al., Circulation 2008) on age, total and HDL cholesterol, systolic blood
+pressure, smoking and diabetes. The remaining HealthData fields are folded
+in as hazard multipliers from `ADJUSTMENT_TABLES`; these are approximate
+relative risks from the literature and are not part of the validated
+model. Treatment for hypertension is unknown, so the untreated SBP
+coefficient is used.
+
+Everything is evaluated as NumPy arrays, so scoring one record and
+scoring thousands costs about the same number of Python-level operations.
+"""
+import math
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+MODEL_VERSION = "framingham-cvd-2008+adjustments-v1"
+
+# Columns: ln(age), ln(total chol), ln(HDL), ln(SBP untreated), smoker, diabetes
+COEFFICIENTS = {
+    "male": np.array([3.06117, 1.12370, -0.93263, 1.93303, 0.65451, 0.57367]),
+    "female": np.array([2.32888, 1.20904, -0.70833, 2.76157, 0.52873, 0.69154]),
+}
+MEAN_PREDICTOR = {"male": 23.9802, "female": 26.1931}
+BASELINE_SURVIVAL = {"male": 0.88936, "female": 0.95012}
+
+# Inputs are clamped to the ranges the model was fitted on
+AGE_RANGE = (30, 79)
+TOTAL_CHOLESTEROL_RANGE = (100, 405)
+HDL_RANGE = (10, 100)
+SBP_RANGE = (90, 200)
+DEFAULT_HDL = {"male": 45.0, "female": 55.0}
+
+# Reference profile used to express each factor's contribution
+REFERENCE = {"total_cholesterol": 170.0, "hdl": 50.0, "sbp": 120.0}
+
+ADJUSTMENT_TABLES: Dict[str, Dict[str, float]] = {
+    "family_history": {"yes": 1.5},
+    "smoking": {"former": 1.2},
+    "diabetes": {"pre-diabetic": 1.2},
+    "exercise_frequency": {"sedentary": 1.3, "1-2 days/week": 1.1, "5+ days/week": 0.9},
+    "stress_level": {"moderate": 1.05, "high": 1.2},
+    "diet_quality": {"poor": 1.2, "fair": 1.1, "excellent": 0.9},
+}
+BMI_MULTIPLIERS = ((30.0, 1.2), (25.0, 1.1))  # (lower bound, multiplier), highest first
+
+RISK_LEVELS = ((0.20, "Very High"), (0.10, "High"), (0.05, "Moderate"), (0.0, "Low"))
+TOP_FACTORS = 5
+
+FACTOR_LABELS = [
+    "Age",
+    "Total cholesterol",
+    "HDL cholesterol",
+    "Systolic blood pressure",
+    "Smoking",
+    "Diabetes",
+    "Family history",
+    "Former smoking",
+    "Pre-diabetes",
+    "Exercise frequency",
+    "Stress level",
+    "Diet quality",
+    "BMI",
+]
+NON_MODIFIABLE = {"Age", "Family history"}
+
+
+def _normalize(value) -> str:
+    return str(value or "").strip().lower()
+
+
+def _lookup(table: Dict[str, float], values: List[str]) -> np.ndarray:
+    return np.log(np.array([table.get(value, 1.0) for value in values]))
+
+
+def _sex(value: str) -> str:
+    value = _normalize(value)
+    if value in ("male", "m", "man"):
+        return "male"
+    if value in ("female", "f", "woman"):
+        return "female"
+    return "other"
+
+
+def risk_level(risk: float) -> str:
+    for threshold, level in RISK_LEVELS:
+        if risk >= threshold:
+            return level
+    return "Low"
+
+
+def score_batch(records: Iterable[dict]) -> List[dict]:
+    """Score HealthData-shaped dicts; returns one result per record in order"""
+    records = list(records)
+    if not records:
+        return []
+    sexes = np.array([_sex(record.get('gender')) for record in records])
+    is_male = sexes == "male"
+    is_female = sexes == "female"
+
+    age = np.clip(np.array([record['age'] for record in records], dtype=float), *AGE_RANGE)
+    total_cholesterol = np.clip(
+        np.array([record['cholesterol_total'] for record in records], dtype=float), *TOTAL_CHOLESTEROL_RANGE)
+    default_hdl = np.where(is_male, DEFAULT_HDL["male"], np.where(is_female, DEFAULT_HDL["female"],
+                                                                  (DEFAULT_HDL["male"] + DEFAULT_HDL["female"]) / 2))
+    hdl = np.array([record.get('cholesterol_hdl') or np.nan for record in records], dtype=float)
+    hdl = np.clip(np.where(np.isnan(hdl), default_hdl, hdl), *HDL_RANGE)
+    sbp = np.clip(np.array([record['blood_pressure_systolic'] for record in records], dtype=float), *SBP_RANGE)
+    smoking = [_normalize(record.get('smoking')) for record in records]
+    diabetes = [_normalize(record.get('diabetes')) for record in records]
+    smoker = np.array([value == "current" for value in smoking], dtype=float)
+    diabetic = np.array([value.startswith("type") or value == "yes" for value in diabetes], dtype=float)
+    bmi = np.array([record.get('bmi') or 0.0 for record in records], dtype=float)
+
+    features = np.column_stack([np.log(age), np.log(total_cholesterol), np.log(hdl), np.log(sbp), smoker, diabetic])
+    adjustments = np.column_stack([
+        _lookup(ADJUSTMENT_TABLES["family_history"], [_normalize(r.get('family_history')) for r in records]),
+        _lookup(ADJUSTMENT_TABLES["smoking"], smoking),
+        _lookup(ADJUSTMENT_TABLES["diabetes"], diabetes),
+        _lookup(ADJUSTMENT_TABLES["exercise_frequency"], [_normalize(r.get('exercise_frequency')) for r in records]),
+        _lookup(ADJUSTMENT_TABLES["stress_level"], [_normalize(r.get('stress_level')) for r in records]),
+        _lookup(ADJUSTMENT_TABLES["diet_quality"], [_normalize(r.get('diet_quality')) for r in records]),
+        np.log(np.select([bmi >= bound for bound, _ in BMI_MULTIPLIERS],
+                         [multiplier for _, multiplier in BMI_MULTIPLIERS], default=1.0)),
+    ])
+    adjustment = adjustments.sum(axis=1)
+
+    def sex_risk(sex: str):
+        predictor = features @ COEFFICIENTS[sex] - MEAN_PREDICTOR[sex] + adjustment
+        return 1 - BASELINE_SURVIVAL[sex] ** np.exp(predictor)
+
+    # Sex is unspecified for "other": average the two sex-specific models
+    risk = np.where(is_male, sex_risk("male"), np.where(is_female, sex_risk("female"),
+                                                        (sex_risk("male") + sex_risk("female")) / 2))
+    risk = np.clip(risk, 0.0, 0.999)
+
+    # Log-hazard contribution of each factor against the reference profile
+    coefficients = np.where(is_male[:, None], COEFFICIENTS["male"], np.where(
+        is_female[:, None], COEFFICIENTS["female"], (COEFFICIENTS["male"] + COEFFICIENTS["female"]) / 2))
+    # Binary columns compare against 0 (log(1) here), continuous ones against the reference profile
+    reference = np.log([AGE_RANGE[0], REFERENCE["total_cholesterol"], REFERENCE["hdl"], REFERENCE["sbp"], 1.0, 1.0])
+    contributions = np.column_stack([coefficients * (features - reference), adjustments])
+    ranked = np.argsort(-contributions, axis=1)[:, :TOP_FACTORS]
+
+    # Plain lists: per-element NumPy scalar access would dominate the loop below
+    risk_values = risk.tolist()
+    contribution_rows = contributions.tolist()
+    total_cholesterol_values = total_cholesterol.tolist()
+    hdl_values = hdl.tolist()
+    results = []
+    for row, columns in enumerate(ranked.tolist()):
+        row_contributions = contribution_rows[row]
+        factors = [
+            {
+                "factor": FACTOR_LABELS[column],
+                "value": _describe(column, records[row], total_cholesterol_values[row], hdl_values[row]),
+                "relative_risk": round(math.exp(row_contributions[column]), 2),
+                "modifiable": FACTOR_LABELS[column] not in NON_MODIFIABLE,
+            }
+            for column in columns
+            if row_contributions[column] > 0.01
+        ]
+        results.append({
+            "ten_year_risk": round(risk_values[row], 4),
+            "risk_percent": round(risk_values[row] * 100, 1),
+            "risk_level": risk_level(risk_values[row]),
+            "factors": factors,
+            "model": MODEL_VERSION,
+        })
+    return results
+
+
+def _describe(column: int, record: dict, total_cholesterol: float, hdl: float) -> str:
+    """Human-readable input value behind a factor column"""
+    if column == 0:
+        return f"{record['age']} years"
+    if column == 1:
+        return f"{total_cholesterol:.0f} mg/dL"
+    if column == 2:
+        return f"{hdl:.0f} mg/dL" + ("" if record.get('cholesterol_hdl') else " (assumed)")
+    if column == 3:
+        return f"{record['blood_pressure_systolic']} mmHg"
+    fields = {4: 'smoking', 5: 'diabetes', 6: 'family_history', 7: 'smoking', 8: 'diabetes',
+              9: 'exercise_frequency', 10: 'stress_level', 11: 'diet_quality', 12: 'bmi'}
+    return str(record.get(fields[column]))
+
+
+def score(record: dict) -> dict:
+    return score_batch([record])[0]
+
+
+FACTOR_ADVICE = {
+    "Total cholesterol": "Discuss a lipid panel with your physician; diet changes or medication can lower total cholesterol.",
+    "HDL cholesterol": "Regular aerobic exercise and not smoking help raise HDL cholesterol.",
+    "Systolic blood pressure": "Recheck your blood pressure and discuss treatment if it stays above 130 mmHg.",
+    "Smoking": "Stopping smoking is the largest single reduction in cardiovascular risk you can make.",
+    "Diabetes": "Keep blood glucose within the targets agreed with your care team.",
+    "Former smoking": "Stay smoke-free; the excess risk keeps falling in the years after quitting.",
+    "Pre-diabetes": "Weight loss and regular activity can stop pre-diabetes from progressing.",
+    "Exercise frequency": "Aim for at least 150 minutes of moderate exercise a week.",
+    "Stress level": "Sleep, regular activity and stress-management techniques help keep stress in check.",
+    "Diet quality": "Move towards a Mediterranean-style diet rich in vegetables, whole grains, fish and olive oil.",
+    "BMI": "Gradual weight loss towards a BMI under 25 lowers blood pressure and cholesterol.",
+}
+
+
+def narrative(result: dict) -> dict:
+    """Template assessment and recommendations for a score, for when the language model is unavailable"""
+    factors = result['factors']
+    assessment = [
+        f"Your estimated 10-year cardiovascular risk is {result['risk_percent']}%, "
+        f"which is {result['risk_level'].lower()}."
+    ]
+    if factors:
+        assessment.append("The main contributing factors are " + ", ".join(
+            f"{factor['factor'].lower()} ({factor['value']}, {factor['relative_risk']}x)" for factor in factors
+        ) + ".")
+    else:
+        assessment.append("None of your values raise the risk noticeably above the reference profile.")
+    assessment.append("This summary was produced from the risk score alone; a detailed assessment is "
+                      "temporarily unavailable.")
+    advice = [FACTOR_ADVICE[factor['factor']] for factor in factors
+              if factor['modifiable'] and factor['factor'] in FACTOR_ADVICE]
+    advice.append("Review these results with your physician at your next check-up.")
+    return {
+        "risk_assessment": " ".join(assessment),
+        "recommendations": "\n".join(f"{number}. {text}" for number, text in enumerate(advice, 1)),
+    }
@@ -1,36 +1,174 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query, Request, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
+from fastapi.responses import JSONResponse, StreamingResponse
 from starlette.middleware.cors import CORSMiddleware
 try:
     from motor.motor_asyncio import AsyncIOMotorClient
+    from pymongo import ASCENDING, DESCENDING, IndexModel, UpdateOne
+    from pymongo.errors import BulkWriteError
 except Exception:
     AsyncIOMotorClient = None
 import os
+import math
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict, EmailStr
-from typing import List, Optional
+from pydantic import BaseModel, Field, ConfigDict, EmailStr, TypeAdapter
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
+from typing_extensions import TypedDict
 import uuid
+import json
+import hmac
 from datetime import datetime, timezone, timedelta
 import asyncio
+import time
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
 import bcrypt
 import jwt
-import requests
+import httpx
+from prediction_cache import PredictionCache, cache_key as prediction_cache_key
+from pagination import build_keyset_filter, decode_cursor, encode_cursor
+from exporters import ENCODERS, MEDIA_TYPES, gzip_stream, parquet_available
+from job_queue import JobQueue, TERMINAL_STATUSES
+from auth_cache import VerifiedTokenCache, UserProfileCache
+from instrumentation import Instrumentation, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from risk_engine import narrative as risk_narrative, score_batch as score_risk_batch
+from batch_predictions import fan_out, parse_csv_records, validate_records
+from resources import LazyDatabase, Resources
+from worker_sync import LocalEventBus, MongoEventBus, WorkerRegistry, secret_fingerprint
+from launcher import available_cores
+from rate_limit import ConcurrencyLimit, LocalBucketStore, MongoBucketStore, RateLimit, RateLimiter, UpstreamBusy
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# Instrumentation: latency histograms for routes, Mongo, the LLM and hashing, plus event-loop lag
+instrumentation = Instrumentation(lag_threshold=float(os.environ.get('LOOP_LAG_THRESHOLD_MS', '100')) / 1000)
+
+# Deployment: worker processes per host, as set by `python launcher.py serve --workers N` (or gunicorn/uvicorn)
+WORKERS = int(os.environ.get('WEB_CONCURRENCY', '1'))
+SHARED_CACHES = os.environ.get('SHARED_CACHES', 'auto').lower()
+SHARED_CACHES = WORKERS > 1 if SHARED_CACHES == 'auto' else SHARED_CACHES == 'true'
+
+LLM_API_URL = os.environ.get('LLM_API_URL', 'https://api.openai.com/v1/chat/completions')
+LLM_MAX_CONNECTIONS = int(os.environ.get('LLM_MAX_CONNECTIONS', '100'))
+LLM_MAX_KEEPALIVE = int(os.environ.get('LLM_MAX_KEEPALIVE', '20'))
+# Upstream calls in flight across all workers on this host; each worker takes an equal share
+LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', '64'))
+LLM_QUEUE_TIMEOUT_SECONDS = float(os.environ.get('LLM_QUEUE_TIMEOUT_SECONDS', '10'))
+LLM_TIMEOUT_SECONDS = float(os.environ.get('LLM_TIMEOUT_SECONDS', '60'))
+# Circuit breaker: opens once LLM_BREAKER_FAILURE_RATE of the calls in the window fail, then fails fast
+# for LLM_BREAKER_OPEN_SECONDS. Per-call timeouts track p99 latency, capped at LLM_TIMEOUT_SECONDS
+LLM_BREAKER_WINDOW_SECONDS = float(os.environ.get('LLM_BREAKER_WINDOW_SECONDS', '10'))
+LLM_BREAKER_MIN_CALLS = int(os.environ.get('LLM_BREAKER_MIN_CALLS', '10'))
+LLM_BREAKER_FAILURE_RATE = float(os.environ.get('LLM_BREAKER_FAILURE_RATE', '0.5'))
+LLM_BREAKER_OPEN_SECONDS = float(os.environ.get('LLM_BREAKER_OPEN_SECONDS', '30'))
+LLM_MIN_TIMEOUT_SECONDS = float(os.environ.get('LLM_MIN_TIMEOUT_SECONDS', '5'))
+LLM_TIMEOUT_P99_MULTIPLIER = float(os.environ.get('LLM_TIMEOUT_P99_MULTIPLIER', '2'))
+LLM_PREWARM = os.environ.get('LLM_PREWARM', 'true').lower() == 'true'
+
 
 class UserMessage(BaseModel):
     text: str
 
 
+class LlmHttpPool:
+    """Process-wide async HTTP client shared by every LlmChat.
+
+    Connections are kept alive (and multiplexed over HTTP/2 when `h2` is
+    installed). Requests in flight are capped by `gate`; a request that cannot
+    get a slot within the gate's max_wait fails with 503 and Retry-After.
+    Requests that got a slot go through `breaker`, so time spent waiting for
+    the gate never counts against upstream latency or health.
+    """
+
+    def __init__(self, max_connections: int, max_keepalive: int, gate: ConcurrencyLimit,
+                 breaker: CircuitBreaker, timeout: float):
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.gate = gate
+        self.breaker = breaker
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive,
+                ),
+                timeout=httpx.Timeout(self.timeout, connect=10.0),
+            )
+        return self._client
+
+    async def post_json(self, url: str, headers: dict, payload: dict) -> dict:
+        async def post() -> dict:
+            response = await self.client.post(url, headers=headers, json=payload)
+            response.raise_for_status()
+            return response.json()
+        async with self.gate.slot():
+            return await self.breaker.call(post)
+
+    async def stream_lines(self, url: str, headers: dict, payload: dict) -> AsyncIterator[str]:
+        # The concurrency slot is held for the whole stream, like a regular request
+        async with self.gate.slot():
+            async with self.client.stream("POST", url, headers=headers, json=payload) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    yield line
+
+    async def warm(self, url: str):
+        """Open a keep-alive connection to the LLM host so the first prediction skips the handshake"""
+        try:
+            await self.client.head(url, timeout=10.0)
+        except httpx.HTTPError as e:
+            logging.warning(f"LLM connection pre-warm failed: {str(e)}")
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+llm_gate = ConcurrencyLimit("The prediction model", max(1, math.ceil(LLM_MAX_CONCURRENCY / WORKERS)), LLM_QUEUE_TIMEOUT_SECONDS)
+llm_breaker = CircuitBreaker(
+    "The prediction model",
+    window_seconds=LLM_BREAKER_WINDOW_SECONDS,
+    min_calls=LLM_BREAKER_MIN_CALLS,
+    failure_threshold=LLM_BREAKER_FAILURE_RATE,
+    open_seconds=LLM_BREAKER_OPEN_SECONDS,
+    min_timeout=LLM_MIN_TIMEOUT_SECONDS,
+    max_timeout=LLM_TIMEOUT_SECONDS,
+    timeout_multiplier=LLM_TIMEOUT_P99_MULTIPLIER,
+    ignored=(UpstreamBusy,)
+)
+llm_http_pool = LlmHttpPool(LLM_MAX_CONNECTIONS, LLM_MAX_KEEPALIVE, llm_gate, llm_breaker, LLM_TIMEOUT_SECONDS)
+
+
 class LlmChat:
-    def __init__(self, api_key: Optional[str], session_id: str, system_message: str):
+    def __init__(
+        self,
+        api_key: Optional[str],
+        session_id: str,
+        system_message: str,
+        http_pool: Optional[LlmHttpPool] = None,
+        api_url: Optional[str] = None,
+    ):
         self.api_key = api_key
         self.session_id = session_id
         self.system_message = system_message
+        self.http_pool = http_pool or llm_http_pool
+        self.api_url = api_url or LLM_API_URL
         self.provider: Optional[str] = None
         self.model: Optional[str] = None
 
@@ -43,14 +181,36 @@ class LlmChat:
         if not self.api_key:
             raise ValueError("Missing EMERGENT_LLM_KEY")
         if self.provider == "openai":
-            return await self._send_openai(user_message)
+            with instrumentation.llm.time(provider=self.provider, mode="send"):
+                return await self._send_openai(user_message)
         raise ValueError("Unsupported provider")
 
-    async def _send_openai(self, user_message: UserMessage) -> str:
-        loop = asyncio.get_running_loop()
-        return await loop.run_in_executor(None, self._send_openai_sync, user_message)
+    async def stream_message(self, user_message: UserMessage) -> AsyncIterator[str]:
+        """Yield response text fragments as the model produces them"""
+        if not self.api_key:
+            raise ValueError("Missing EMERGENT_LLM_KEY")
+        if self.provider != "openai":
+            raise ValueError("Unsupported provider")
+        headers, payload = self._openai_request(user_message)
+        payload["stream"] = True
+        # Timed over the whole stream, not just the first token. The stream is not bounded by the
+        # breaker's timeout (a long answer is not a slow one), but its outcome still counts
+        with instrumentation.llm.time(provider=self.provider, mode="stream"):
+            async with self.http_pool.breaker.attempt():
+                async for line in self.http_pool.stream_lines(self.api_url, headers, payload):
+                    # Server-sent events: "data: {...}" lines, terminated by "data: [DONE]"
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    choices = json.loads(data).get("choices") or []
+                    if choices:
+                        content = choices[0].get("delta", {}).get("content")
+                        if content:
+                            yield content
 
-    def _send_openai_sync(self, user_message: UserMessage) -> str:
+    def _openai_request(self, user_message: UserMessage) -> Tuple[dict, dict]:
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
@@ -62,42 +222,165 @@ class LlmChat:
                 {"role": "user", "content": user_message.text},
             ],
         }
-        response = requests.post(
-            "https://api.openai.com/v1/chat/completions",
-            headers=headers,
-            json=payload,
-            timeout=60,
-        )
-        response.raise_for_status()
-        data = response.json()
+        return headers, payload
+
+    async def _send_openai(self, user_message: UserMessage) -> str:
+        headers, payload = self._openai_request(user_message)
+        data = await self.http_pool.post_json(self.api_url, headers, payload)
         choices = data.get("choices")
         if not choices:
             raise ValueError("No response from model")
         message = choices[0].get("message", {})
         content = message.get("content")
         if not content:
-# MongoDB connection
+            raise ValueError("Empty response from model")
+        return content
+
+
+# MongoDB connection: one pooled client per process, created on first use and closed by the lifespan
 mongo_url = os.environ.get('MONGO_URL')
 if not mongo_url:
     raise RuntimeError("MONGO_URL environment variable is not set")
+if not os.environ.get('DB_NAME'):
+    raise RuntimeError("DB_NAME environment variable is not set")
 if AsyncIOMotorClient is None:
     raise RuntimeError("Missing dependency 'motor'. Install it with: pip install motor")
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ.get('DB_NAME', 'test')]
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+resources = Resources(
+    mongo_url,
+    os.environ['DB_NAME'],
+    max_pool_size=int(os.environ.get('MONGO_MAX_POOL_SIZE', '100')),
+    min_pool_size=int(os.environ.get('MONGO_MIN_POOL_SIZE', '4')),
+    event_listeners=[instrumentation.mongo_listener()]
+)
+db = LazyDatabase(resources)
+
+# Workers register with a JWT secret fingerprint; cache invalidations reach the other workers over the event bus
+worker_registry = WorkerRegistry(db.workers)
+event_bus = MongoEventBus(db.cache_events) if SHARED_CACHES else LocalEventBus()
+
+# Rate limits: a per-worker budget for every API call keyed by user (or client address), a
+# smaller budget for LLM-backed predictions, and a separate one for batch screening; the LLM
+# budgets are shared by all workers when they share caches
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+API_RATE_LIMIT = RateLimit(
+    "api",
+    rate=float(os.environ.get('API_RATE_PER_SECOND', '20')),
+    burst=float(os.environ.get('API_RATE_BURST', '100'))
+)
+LLM_RATE_LIMIT = RateLimit(
+    "llm",
+    rate=float(os.environ.get('LLM_RATE_PER_MINUTE', '12')) / 60,
+    burst=float(os.environ.get('LLM_RATE_BURST', '6')),
+    shared=True
+)
+# A batch pays one token per distinct prompt, all before it starts; llm_gate paces the calls themselves
+BATCH_LLM_RATE_LIMIT = RateLimit(
+    "llm_batch",
+    rate=float(os.environ.get('BATCH_LLM_RATE_PER_HOUR', '20000')) / 3600,
+    burst=float(os.environ.get('BATCH_LLM_RATE_BURST', os.environ.get('BATCH_MAX_RECORDS', '10000'))),
+    shared=True
+)
+rate_limiter = RateLimiter(
+    LocalBucketStore(int(os.environ.get('RATE_LIMIT_MAX_KEYS', '100000'))),
+    MongoBucketStore(db.rate_limits) if SHARED_CACHES else None,
+    enabled=RATE_LIMIT_ENABLED
+)
+
+# Prediction model and cache
+PREDICTION_MODEL = os.environ.get('PREDICTION_MODEL', 'gpt-5')
+PREDICTION_PROMPT_VERSION = "v1"
+PREDICTION_SYSTEM_MESSAGE = "You are a medical AI assistant specializing in cardiovascular health risk assessment. Provide detailed, evidence-based analysis."
+PREDICTION_CACHE_SHARED = os.environ.get('PREDICTION_CACHE_SHARED', 'true' if SHARED_CACHES else 'false').lower() == 'true'
+prediction_cache = PredictionCache(
+    max_entries=int(os.environ.get('PREDICTION_CACHE_SIZE', '1024')),
+    ttl_seconds=float(os.environ.get('PREDICTION_CACHE_TTL_SECONDS', '86400')),
+    collection=db.prediction_cache if PREDICTION_CACHE_SHARED else None
+)
+
+# Batch screening: distinct prompts in flight per batch, and rows per insert_many
+BATCH_MAX_RECORDS = int(os.environ.get('BATCH_MAX_RECORDS', '10000'))
+BATCH_CONCURRENCY = int(os.environ.get('BATCH_CONCURRENCY', '16'))
+BATCH_INSERT_SIZE = int(os.environ.get('BATCH_INSERT_SIZE', '500'))
+
+# Flat export layout: prediction fields followed by each HealthData field
+PREDICTION_EXPORT_COLUMNS = [
+    ("id", "string"),
+    ("created_at", "timestamp"),
+    ("age", "int"),
+    ("gender", "string"),
+    ("blood_pressure_systolic", "int"),
+    ("blood_pressure_diastolic", "int"),
+    ("cholesterol_total", "int"),
+    ("cholesterol_ldl", "int"),
+    ("cholesterol_hdl", "int"),
+    ("smoking", "string"),
+    ("diabetes", "string"),
+    ("family_history", "string"),
+    ("bmi", "float"),
+    ("exercise_frequency", "string"),
+    ("ecg_data", "string"),
+    ("stress_level", "string"),
+    ("diet_quality", "string"),
+    ("risk_percent", "float"),
+    ("risk_level", "string"),
+    ("risk_assessment", "string"),
+    ("recommendations", "string"),
+]
 
 # JWT Configuration
 JWT_SECRET = os.environ.get('JWT_SECRET', 'your-secret-key-change-in-production')
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRATION_HOURS = 24 * 7  # 7 days
 
+# Verified tokens and user profiles served from memory on the auth hot path
+token_cache = VerifiedTokenCache(int(os.environ.get('TOKEN_CACHE_SIZE', '10000')))
+profile_cache = UserProfileCache(
+    max_entries=int(os.environ.get('PROFILE_CACHE_SIZE', '10000')),
+    ttl_seconds=float(os.environ.get('PROFILE_CACHE_TTL_SECONDS', '300'))
+)
+# Verified tokens depend only on the token and JWT_SECRET, so per-worker copies never disagree;
+# profiles can change, so invalidations are broadcast
+event_bus.subscribe("profile.invalidate", lambda payload: profile_cache.invalidate(payload['user_id']))
+
+def invalidate_profile(user_id: str):
+    profile_cache.invalidate(user_id)
+    event_bus.publish("profile.invalidate", {"user_id": user_id})
+
 # Security
 security = HTTPBearer()
+# Metrics and watchdog data describe the deployment, so they are served only to scrapers holding this
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+metrics_security = HTTPBearer(auto_error=False)
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', '12'))
+# Cores are split between worker processes, so each one gets a proportional share of hashing threads
+HASH_WORKERS = int(os.environ.get('HASH_WORKERS', str(max(1, min(4, available_cores() // WORKERS)))))
+HASH_QUEUE_LIMIT = int(os.environ.get('HASH_QUEUE_LIMIT', '64'))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Connect, warm up and start background work; undo it all in reverse on shutdown"""
+    instrumentation.start()
+    await resources.warm()
+    await worker_registry.start(secret_fingerprint(JWT_SECRET))
+    await event_bus.start()
+    await rate_limiter.start()
+    await ensure_indexes()
+    if LLM_PREWARM:
+        await llm_http_pool.warm(LLM_API_URL)
+    await prediction_job_queue.start()
+    try:
+        yield
+    finally:
+        await prediction_job_queue.stop()
+        await event_bus.stop()
+        await worker_registry.stop()
+        await instrumentation.stop()
+        await llm_http_pool.aclose()
+        password_hasher.shutdown()
+        resources.close()
 
 # Create the main app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 api_router = APIRouter(prefix="/api")
 
 # Models
@@ -141,6 +424,25 @@ class HealthData(BaseModel):
 class PredictionRequest(BaseModel):
     health_data: HealthData
 
+class RiskFactor(BaseModel):
+    factor: str
+    value: str
+    relative_risk: float
+    modifiable: bool
+
+class RiskScore(BaseModel):
+    ten_year_risk: float
+    risk_percent: float
+    risk_level: str
+    factors: List[RiskFactor]
+    model: str
+
+class BatchScoreRequest(BaseModel):
+    records: List[HealthData] = Field(..., min_length=1, max_length=10000)
+
+class BatchScoreResponse(BaseModel):
+    scores: List[RiskScore]
+
 class PredictionResult(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -148,14 +450,125 @@ class PredictionResult(BaseModel):
     health_data: HealthData
     risk_assessment: str
     recommendations: str
+    risk_score: Optional[RiskScore] = None
+    batch_id: Optional[str] = None
+    degraded: bool = False  # narrative built from the score alone while the model was unavailable
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+# Stored predictions are already valid, so list responses are encoded straight from the
+# projected documents instead of being re-validated row by row through PredictionResult
+class PredictionRow(TypedDict):
+    id: str
+    user_id: str
+    health_data: Dict[str, Any]
+    risk_assessment: str
+    recommendations: str
+    risk_score: Optional[Dict[str, Any]]
+    batch_id: Optional[str]
+    degraded: bool
+    created_at: Union[datetime, str]  # legacy rows may still hold ISO strings
+
+prediction_rows = TypeAdapter(List[PredictionRow])
+PREDICTION_ROW_PROJECTION = {"_id": 0, **{field: 1 for field in PredictionRow.__annotations__}}
+
+class PredictionJob(BaseModel):
+    id: str
+    status: str
+    attempts: int
+    error: Optional[str] = None
+    prediction: Optional[PredictionResult] = None
+    created_at: datetime
+    updated_at: datetime
+
+# Password Hashing
+class PasswordHasher:
+    """Runs bcrypt on a dedicated thread pool so hashing never blocks the event loop.
+
+    At most `queue_limit` calls may be queued or running; beyond that new
+    calls are rejected with 429 instead of piling up behind the pool.
+    """
+
+    def __init__(self, rounds: int, workers: int, queue_limit: int):
+        self.rounds = rounds
+        self.queue_limit = queue_limit
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    @staticmethod
+    def _timed(fn, *args):
+        start = time.perf_counter()
+        result = fn(*args)
+        return result, time.perf_counter() - start
+
+    async def _submit(self, operation: str, fn, *args):
+        if self.pending >= self.queue_limit:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=429,
+                detail="Too many authentication requests, please retry shortly",
+                headers={"Retry-After": "1"}
+            )
+        self.pending += 1
+        submitted = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            result, elapsed = await loop.run_in_executor(self._executor, self._timed, fn, *args)
+        finally:
+            self.pending -= 1
+        # Counters are only touched from the event loop thread
+        instrumentation.password_hashing.observe(elapsed, operation=operation)
+        instrumentation.password_hash_queue.observe(time.perf_counter() - submitted - elapsed, operation=operation)
+        self.completed += 1
+        self.total_seconds += elapsed
+        self.max_seconds = max(self.max_seconds, elapsed)
+        return result
+
+    def _hash_sync(self, password: str) -> str:
+        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(self.rounds)).decode('utf-8')
+
+    @staticmethod
+    def _verify_sync(password: str, hashed: str) -> bool:
+        return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+
+    async def hash(self, password: str) -> str:
+        return await self._submit("hash", self._hash_sync, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._submit("verify", self._verify_sync, password, hashed)
+
+    def needs_rehash(self, hashed: str) -> bool:
+        # bcrypt hashes look like $2b$<cost>$<salt+digest>
+        try:
+            return int(hashed.split('$')[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.pending,
+            "queue_limit": self.queue_limit,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_latency_ms": round(self.total_seconds / self.completed * 1000, 2) if self.completed else 0.0,
+            "max_latency_ms": round(self.max_seconds * 1000, 2),
+            "rounds": self.rounds,
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+password_hasher = PasswordHasher(BCRYPT_ROUNDS, HASH_WORKERS, HASH_QUEUE_LIMIT)
+
 # Helper Functions
-def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+async def hash_password(password: str) -> str:
+    return await password_hasher.hash(password)
 
-def verify_password(password: str, hashed: str) -> bool:
-    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+async def verify_password(password: str, hashed: str) -> bool:
+    return await password_hasher.verify(password, hashed)
 
 def create_token(user_id: str) -> str:
     expiration = datetime.now(timezone.utc) + timedelta(hours=JWT_EXPIRATION_HOURS)
@@ -166,18 +579,291 @@ def create_token(user_id: str) -> str:
     )
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> str:
+    token = credentials.credentials
+    # Tokens that already verified are trusted until their own exp
+    user_id = token_cache.get(token)
+    if user_id is not None:
+        return user_id
     try:
-        token = credentials.credentials
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
         user_id = payload.get("user_id")
-        if not user_id:
+        if not user_id or "exp" not in payload:
             raise HTTPException(status_code=401, detail="Invalid token")
+        token_cache.put(token, user_id, payload["exp"])
         return user_id
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+async def rate_limit_key(request: Request) -> str:
+    """The verified user for authenticated requests, otherwise the client address"""
+    scheme, _, token = request.headers.get('authorization', '').partition(' ')
+    if scheme.lower() == 'bearer' and token:
+        try:
+            return "user:" + await get_current_user(HTTPAuthorizationCredentials(scheme=scheme, credentials=token))
+        except HTTPException:
+            pass  # The route's own authentication answers with the 401
+    return "ip:" + (request.client.host if request.client else "unknown")
+
+async def require_metrics_token(credentials: Optional[HTTPAuthorizationCredentials] = Depends(metrics_security)):
+    # Without a configured token the endpoints do not exist
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if credentials is None or not hmac.compare_digest(credentials.credentials.encode(), METRICS_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+
+api_rate_limit = rate_limiter.dependency(API_RATE_LIMIT, rate_limit_key)
+llm_rate_limit = rate_limiter.dependency(LLM_RATE_LIMIT, get_current_user)
+
+def json_rows(adapter: TypeAdapter, rows: list, headers: Optional[dict] = None) -> Response:
+    """Encode trusted rows in a single pass; returning a Response skips response_model validation"""
+    return Response(content=adapter.dump_json(rows), media_type="application/json", headers=headers)
+
+def build_export_response(rows, export_format: str, columns: list, basename: str, compress: bool) -> StreamingResponse:
+    """Stream rows from a cursor as a downloadable file, optionally gzipped on the fly"""
+    body = ENCODERS[export_format](rows, columns)
+    filename = f"{basename}-{datetime.now(timezone.utc):%Y%m%d}.{export_format}"
+    media_type = MEDIA_TYPES[export_format]
+    # Parquet pages are already compressed
+    if compress and export_format != "parquet":
+        body = gzip_stream(body)
+        filename += ".gz"
+        media_type = "application/gzip"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+# Database Maintenance
+async def ensure_indexes():
+    """Create the indexes hot queries rely on; safe to run on every startup"""
+    await db.users.create_indexes([
+        IndexModel([("email", ASCENDING)], unique=True, name="email_unique"),
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+    ])
+    await db.predictions.create_indexes([
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="user_created_id"),
+        IndexModel([("user_id", ASCENDING), ("batch_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)],
+                   name="user_batch_created_id", partialFilterExpression={"batch_id": {"$type": "string"}}),
+    ])
+    await db.prediction_jobs.create_indexes([
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+        IndexModel([("status", ASCENDING), ("next_attempt_at", ASCENDING)], name="status_next_attempt"),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)], name="user_created"),
+    ])
+    # Shared prediction cache entries expire on their own
+    await db.prediction_cache.create_indexes([
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0, name="expires_at_ttl"),
+    ])
+
+async def migrate_string_dates(collection, fields: List[str], batch_size: int = 1000) -> int:
+    """Rewrite ISO-string date fields as native BSON datetimes"""
+    query = {"$or": [{field: {"$type": "string"}} for field in fields]}
+    projection = {field: 1 for field in fields}
+    operations = []
+    migrated = 0
+    async for doc in collection.find(query, projection):
+        update = {
+            field: datetime.fromisoformat(doc[field])
+            for field in fields
+            if isinstance(doc.get(field), str)
+        }
+        operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": update}))
+        if len(operations) >= batch_size:
+            await collection.bulk_write(operations, ordered=False)
+            migrated += len(operations)
+            operations = []
+    if operations:
+        await collection.bulk_write(operations, ordered=False)
+        migrated += len(operations)
+    return migrated
+
+async def run_date_migration():
+    await ensure_indexes()
+    users = await migrate_string_dates(db.users, ["created_at"])
+    predictions = await migrate_string_dates(db.predictions, ["created_at"])
+    logger.info(f"Migrated string dates: {users} users, {predictions} predictions")
+
+# Prediction Helpers
+def build_prediction_prompt(health_data: HealthData) -> str:
+    # Bump PREDICTION_PROMPT_VERSION whenever this template changes
+    prompt = f"""You are a medical AI assistant specializing in cardiovascular health risk assessment. Analyze the following patient data and provide a comprehensive heart attack risk assessment.
+
+Patient Information:
+- Age: {health_data.age}
+- Gender: {health_data.gender}
+- Blood Pressure: {health_data.blood_pressure_systolic}/{health_data.blood_pressure_diastolic} mmHg
+- Total Cholesterol: {health_data.cholesterol_total} mg/dL
+{f'- LDL Cholesterol: {health_data.cholesterol_ldl} mg/dL' if health_data.cholesterol_ldl else ''}
+{f'- HDL Cholesterol: {health_data.cholesterol_hdl} mg/dL' if health_data.cholesterol_hdl else ''}
+- Smoking Status: {health_data.smoking}
+- Diabetes Status: {health_data.diabetes}
+- Family History of Heart Disease: {health_data.family_history}
+- BMI: {health_data.bmi}
+- Exercise Frequency: {health_data.exercise_frequency}
+- Stress Level: {health_data.stress_level}
+- Diet Quality: {health_data.diet_quality}
+{f'- ECG Notes: {health_data.ecg_data}' if health_data.ecg_data else ''}
+
+Please provide:
+1. Overall Risk Assessment (Low/Moderate/High/Very High) with percentage if applicable
+2. Key Risk Factors identified
+3. Protective Factors (if any)
+4. Detailed lifestyle recommendations
+5. Medical follow-up suggestions
+
+Format your response clearly with sections for Risk Assessment and Recommendations."""
+    return prompt
+
+def parse_prediction_response(response_text: str) -> dict:
+    # Split into risk assessment and recommendations
+    parts = response_text.split("Recommendations", 1)
+    return {
+        "risk_assessment": parts[0].replace("Risk Assessment", "").strip(),
+        "recommendations": parts[1].strip() if len(parts) > 1 else response_text,
+    }
+
+class SectionStreamParser:
+    """Incremental counterpart of parse_prediction_response for streamed text.
+
+    Labels each fragment with the section it belongs to, holding back just
+    enough characters to spot a "Recommendations" marker split across tokens.
+    """
+
+    MARKER = "Recommendations"
+
+    def __init__(self):
+        self.section = "risk_assessment"
+        self._pending = ""
+        self._parts: List[str] = []
+
+    @property
+    def text(self) -> str:
+        return "".join(self._parts)
+
+    def feed(self, fragment: str) -> List[Tuple[str, str]]:
+        self._parts.append(fragment)
+        if self.section == "recommendations":
+            return [(self.section, fragment)]
+        
+        self._pending += fragment
+        index = self._pending.find(self.MARKER)
+        if index >= 0:
+            before, after = self._pending[:index], self._pending[index + len(self.MARKER):]
+            self._pending = ""
+            self.section = "recommendations"
+            return [(section, text) for section, text in (("risk_assessment", before), ("recommendations", after)) if text]
+        
+        cut = max(0, len(self._pending) - (len(self.MARKER) - 1))
+        emit, self._pending = self._pending[:cut], self._pending[cut:]
+        return [("risk_assessment", emit)] if emit else []
+
+    def close(self) -> List[Tuple[str, str]]:
+        pending, self._pending = self._pending, ""
+        return [(self.section, pending)] if pending else []
+
+def build_prediction_chat() -> LlmChat:
+    return LlmChat(
+        api_key=os.environ.get('EMERGENT_LLM_KEY'),
+        session_id=f"prediction-{uuid.uuid4()}",
+        system_message=PREDICTION_SYSTEM_MESSAGE
+    ).with_model("openai", PREDICTION_MODEL)
+
+def assessment_cache_key(health_data: HealthData) -> str:
+    return prediction_cache_key(build_prediction_prompt(health_data), PREDICTION_MODEL, PREDICTION_PROMPT_VERSION)
+
+async def generate_assessment(health_data: HealthData) -> dict:
+    chat = build_prediction_chat()
+    response = await chat.send_message(UserMessage(text=build_prediction_prompt(health_data)))
+    response_text = response if isinstance(response, str) else str(response)
+    return parse_prediction_response(response_text)
+
+def score_health_data(health_data: HealthData) -> RiskScore:
+    """Local Framingham-style score; needs no upstream call"""
+    return RiskScore(**score_risk_batch([health_data.model_dump()])[0])
+
+async def save_prediction(user_id: str, health_data: HealthData, assessment: dict,
+                          risk_score: Optional[RiskScore] = None, degraded: bool = False) -> PredictionResult:
+    prediction = PredictionResult(
+        user_id=user_id,
+        health_data=health_data,
+        risk_assessment=assessment['risk_assessment'],
+        recommendations=assessment['recommendations'],
+        risk_score=risk_score or score_health_data(health_data),
+        degraded=degraded
+    )
+    
+    prediction_doc = prediction.model_dump()
+    prediction_doc['health_data'] = health_data.model_dump()
+    
+    await db.predictions.insert_one(prediction_doc)
+    return prediction
+
+async def run_prediction_job(job: dict) -> dict:
+    health_data = HealthData(**job['payload']['health_data'])
+    key = assessment_cache_key(health_data)
+    assessment = await prediction_cache.get_or_compute(key, lambda: generate_assessment(health_data))
+    prediction = await save_prediction(job['user_id'], health_data, assessment)
+    return {"prediction_id": prediction.id}
+
+prediction_job_queue = JobQueue(
+    db.prediction_jobs,
+    run_prediction_job,
+    workers=int(os.environ.get('PREDICTION_JOB_WORKERS', '8')),
+    max_attempts=int(os.environ.get('PREDICTION_JOB_MAX_ATTEMPTS', '3')),
+    job_timeout=LLM_TIMEOUT_SECONDS + 30
+)
+
+async def load_prediction_job(job: dict) -> PredictionJob:
+    prediction = None
+    if job['status'] == "completed" and job.get('result'):
+        prediction_doc = await db.predictions.find_one(
+            {"id": job['result']['prediction_id'], "user_id": job['user_id']},
+            {"_id": 0}
+        )
+        if prediction_doc:
+            prediction = PredictionResult(**prediction_doc)
+    return PredictionJob(
+        id=job['id'],
+        status=job['status'],
+        attempts=job['attempts'],
+        error=job.get('error'),
+        prediction=prediction,
+        created_at=job['created_at'],
+        updated_at=job['updated_at']
+    )
+
+def format_sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def format_ndjson(data: dict) -> bytes:
+    return (json.dumps(data, separators=(',', ':')) + "\n").encode('utf-8')
+
+async def read_batch_records(request: Request) -> list:
+    """Raw batch rows from a JSON body, a text/csv body or a multipart `file` upload"""
+    content_type = request.headers.get('content-type', '').split(';')[0].strip().lower()
+    try:
+        if content_type == 'application/json':
+            body = json.loads(await request.body())
+            records = body.get('records') if isinstance(body, dict) else body
+            if not isinstance(records, list):
+                raise HTTPException(status_code=400, detail="Expected a JSON list of records or {\"records\": [...]}")
+            return records
+        if content_type in ('text/csv', 'application/csv'):
+            return parse_csv_records((await request.body()).decode('utf-8'))
+        if content_type == 'multipart/form-data':
+            form = await request.form()
+            upload = form.get('file')
+            if upload is None or isinstance(upload, str):
+                raise HTTPException(status_code=400, detail="Upload the CSV in a form field named 'file'")
+            return parse_csv_records((await upload.read()).decode('utf-8'))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Could not parse batch: {str(e)}")
+    raise HTTPException(status_code=415, detail="Send application/json, text/csv or a multipart CSV upload")
+
 # API Routes
 @api_router.post("/auth/register", response_model=AuthResponse)
 async def register(user_data: UserCreate):
@@ -193,10 +879,10 @@ async def register(user_data: UserCreate):
     )
     
     user_doc = user.model_dump()
-    user_doc['password'] = hash_password(user_data.password)
-    user_doc['created_at'] = user_doc['created_at'].isoformat()
+    user_doc['password'] = await hash_password(user_data.password)
     
     await db.users.insert_one(user_doc)
+    invalidate_profile(user.id)
     
     token = create_token(user.id)
     return AuthResponse(token=token, user=user)
@@ -207,9 +893,17 @@ async def login(credentials: UserLogin):
     if not user_doc:
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
-    if not verify_password(credentials.password, user_doc['password']):
+    if not await verify_password(credentials.password, user_doc['password']):
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
+    # Transparently upgrade hashes created with a different cost factor
+    if password_hasher.needs_rehash(user_doc['password']):
+        await db.users.update_one(
+            {"id": user_doc['id']},
+            {"$set": {"password": await hash_password(credentials.password)}}
+        )
+        invalidate_profile(user_doc['id'])
+    
     user = User(
         id=user_doc['id'],
         email=user_doc['email'],
@@ -222,98 +916,384 @@ async def login(credentials: UserLogin):
 
 @api_router.get("/auth/me", response_model=User)
 async def get_me(user_id: str = Depends(get_current_user)):
-    user_doc = await db.users.find_one({"id": user_id}, {"_id": 0, "password": 0})
-    if not user_doc:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    if isinstance(user_doc['created_at'], str):
-        user_doc['created_at'] = datetime.fromisoformat(user_doc['created_at'])
+    user_doc = profile_cache.get(user_id)
+    if user_doc is None:
+        user_doc = await db.users.find_one({"id": user_id}, {"_id": 0, "password": 0})
+        if not user_doc:
+            raise HTTPException(status_code=404, detail="User not found")
+        
+        if isinstance(user_doc['created_at'], str):
+            user_doc['created_at'] = datetime.fromisoformat(user_doc['created_at'])
+        profile_cache.put(user_id, user_doc)
     
     return User(**user_doc)
 
-@api_router.post("/predict", response_model=PredictionResult)
-async def predict_heart_attack(request: PredictionRequest, user_id: str = Depends(get_current_user)):
+@api_router.post("/predict", response_model=PredictionResult, dependencies=[Depends(llm_rate_limit)])
+async def predict_heart_attack(
+    request: PredictionRequest,
+    mode: str = Query("sync", pattern="^(sync|job)$"),
+    user_id: str = Depends(get_current_user)
+):
     health_data = request.health_data
     
-    # Build comprehensive prompt for GPT-5
-    prompt = f"""You are a medical AI assistant specializing in cardiovascular health risk assessment. Analyze the following patient data and provide a comprehensive heart attack risk assessment.
+    if mode == "job":
+        # Hand the LLM call to the worker pool and answer immediately
+        job = await prediction_job_queue.submit(user_id, {"health_data": health_data.model_dump()})
+        return JSONResponse(status_code=202, content={
+            "job_id": job['id'],
+            "status": job['status'],
+            "risk_score": score_health_data(health_data).model_dump()
+        })
+    
+    key = assessment_cache_key(health_data)
+    try:
+        try:
+            # Identical inputs share one cached (or in-flight) LLM assessment
+            assessment = await prediction_cache.get_or_compute(key, lambda: generate_assessment(health_data))
+        except CircuitOpenError:
+            # The model is failing; answer from the local score now rather than after a timeout.
+            # Degraded answers are never cached, so the next request after recovery gets the model's
+            risk_score = score_health_data(health_data)
+            return await save_prediction(user_id, health_data, risk_narrative(risk_score.model_dump()),
+                                         risk_score, degraded=True)
+        return await save_prediction(user_id, health_data, assessment)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Prediction error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
 
-Patient Information:
-- Age: {health_data.age}
-- Gender: {health_data.gender}
-- Blood Pressure: {health_data.blood_pressure_systolic}/{health_data.blood_pressure_diastolic} mmHg
-- Total Cholesterol: {health_data.cholesterol_total} mg/dL
-{f'- LDL Cholesterol: {health_data.cholesterol_ldl} mg/dL' if health_data.cholesterol_ldl else ''}
-{f'- HDL Cholesterol: {health_data.cholesterol_hdl} mg/dL' if health_data.cholesterol_hdl else ''}
-- Smoking Status: {health_data.smoking}
-- Diabetes Status: {health_data.diabetes}
-- Family History of Heart Disease: {health_data.family_history}
-- BMI: {health_data.bmi}
-- Exercise Frequency: {health_data.exercise_frequency}
-- Stress Level: {health_data.stress_level}
-- Diet Quality: {health_data.diet_quality}
-{f'- ECG Notes: {health_data.ecg_data}' if health_data.ecg_data else ''}
+@api_router.post("/predict/stream", dependencies=[Depends(llm_rate_limit)])
+async def predict_heart_attack_stream(request: PredictionRequest, user_id: str = Depends(get_current_user)):
+    """Server-sent events variant of /predict.
+    
+    Emits a `score` event with the local RiskScore immediately, `token`
+    events ({"section", "text"}) as the model writes, then a
+    `result` event with the saved PredictionResult, or an `error` event.
+    While the model's circuit breaker is open, the tokens carry a narrative
+    built from the score and the result is marked `degraded`.
+    If the client disconnects, the generator is cancelled, which closes the
+    upstream model request and skips the save.
+    """
+    health_data = request.health_data
+    key = assessment_cache_key(health_data)
+    
+    async def events():
+        # The numeric score goes out first and does not depend on the model
+        risk_score = score_health_data(health_data)
+        yield format_sse("score", risk_score.model_dump())
+        try:
+            assessment = await prediction_cache.get(key)
+            streamed = degraded = False
+            if assessment is None:
+                try:
+                    parser = SectionStreamParser()
+                    chat = build_prediction_chat()
+                    async for fragment in chat.stream_message(UserMessage(text=build_prediction_prompt(health_data))):
+                        for section, text in parser.feed(fragment):
+                            yield format_sse("token", {"section": section, "text": text})
+                    for section, text in parser.close():
+                        yield format_sse("token", {"section": section, "text": text})
+                    assessment = parse_prediction_response(parser.text)
+                    await prediction_cache.put(key, assessment)
+                    streamed = True
+                except CircuitOpenError:
+                    # Raised before any token goes out: the model is failing, so answer from the score
+                    assessment, degraded = risk_narrative(risk_score.model_dump()), True
+            if not streamed:
+                for section in ("risk_assessment", "recommendations"):
+                    yield format_sse("token", {"section": section, "text": assessment[section]})
+            
+            prediction = await save_prediction(user_id, health_data, assessment, risk_score, degraded=degraded)
+            yield format_sse("result", prediction.model_dump(mode="json"))
+        
+        except Exception as e:
+            logging.error(f"Streaming prediction error: {str(e)}")
+            yield format_sse("error", {"detail": f"Prediction failed: {str(e)}"})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
-Please provide:
-1. Overall Risk Assessment (Low/Moderate/High/Very High) with percentage if applicable
-2. Key Risk Factors identified
-3. Protective Factors (if any)
-4. Detailed lifestyle recommendations
-5. Medical follow-up suggestions
+@api_router.post("/predict/score", response_model=RiskScore)
+async def score_heart_risk(request: PredictionRequest, user_id: str = Depends(get_current_user)):
+    """Numeric 10-year risk and contributing factors, without the LLM narrative"""
+    return score_health_data(request.health_data)
 
-Format your response clearly with sections for Risk Assessment and Recommendations."""
+@api_router.post("/predict/score/batch", response_model=BatchScoreResponse)
+async def score_heart_risk_batch(request: BatchScoreRequest, user_id: str = Depends(get_current_user)):
+    records = [health_data.model_dump() for health_data in request.records]
+    # Vectorized, but thousands of records still take tens of milliseconds; keep them off the loop
+    scores = await asyncio.to_thread(score_risk_batch, records)
+    return BatchScoreResponse(scores=scores)
 
-    try:
-        # Initialize LLM Chat with GPT-5
-        chat = LlmChat(
-            api_key=os.environ.get('EMERGENT_LLM_KEY'),
-            session_id=f"prediction-{user_id}-{uuid.uuid4()}",
-            system_message="You are a medical AI assistant specializing in cardiovascular health risk assessment. Provide detailed, evidence-based analysis."
-        ).with_model("openai", "gpt-5")
-        
-        user_message = UserMessage(text=prompt)
-        response = await chat.send_message(user_message)
-        
-        # Parse response
-        response_text = response if isinstance(response, str) else str(response)
-        
-        # Split into risk assessment and recommendations
-        parts = response_text.split("Recommendations", 1)
-        risk_assessment = parts[0].replace("Risk Assessment", "").strip()
-        recommendations = parts[1].strip() if len(parts) > 1 else response_text
-        
-        # Save prediction
-        prediction = PredictionResult(
-            user_id=user_id,
-            health_data=health_data,
-            risk_assessment=risk_assessment,
-            recommendations=recommendations
-        )
-        
-        prediction_doc = prediction.model_dump()
-        prediction_doc['created_at'] = prediction_doc['created_at'].isoformat()
-        prediction_doc['health_data'] = health_data.model_dump()
-        
-        await db.predictions.insert_one(prediction_doc)
+@api_router.post("/predict/batch")
+async def predict_heart_attack_batch(request: Request, user_id: str = Depends(get_current_user)):
+    """Screen many records in one request; streams NDJSON as results complete.
+    
+    Accepts a JSON list (or {"records": [...]}), a text/csv body, or a
+    multipart upload in the `file` field, with HealthData field names as
+    columns. Lines are, in order: one `accepted` line with the batch id and
+    counts, an `invalid` line per row that failed validation, a `result`
+    line per valid row (`index` is its position in the batch, `status` is
+    "completed" with the saved prediction minus health_data, or "failed"
+    with the error and the local risk score), and a final `summary`.
+    Identical rows share one model call. The batch spends one token of the
+    batch LLM budget per distinct row before anything runs, so it is either
+    accepted whole or refused with a 429 (Retry-After) or, above the burst,
+    a 413. Saved predictions carry the batch id, so
+    `GET /predictions?batch_id=` returns them later.
+    """
+    records = await read_batch_records(request)
+    if not records:
+        raise HTTPException(status_code=400, detail="Batch contains no records")
+    if len(records) > BATCH_MAX_RECORDS:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {BATCH_MAX_RECORDS} records")
+    
+    valid, invalid = validate_records(HealthData, records)
+    # One vectorized scoring pass for the whole batch, off the event loop
+    scores = await asyncio.to_thread(score_risk_batch, [health_data.model_dump() for _, health_data in valid])
+    groups: Dict[str, list] = {}
+    for (index, health_data), score in zip(valid, scores):
+        key = assessment_cache_key(health_data)
+        groups.setdefault(key, []).append((index, health_data, RiskScore(**score)))
+    # Charged up front, so a batch never runs until the budget is gone and fails its remaining rows
+    await rate_limiter.enforce(BATCH_LLM_RATE_LIMIT, user_id, cost=len(groups))
+    batch_id = str(uuid.uuid4())
+    
+    def assess(item: Tuple[str, HealthData]):
+        # Also coalesces with identical rows in other batches and single predictions
+        key, health_data = item
+        return prediction_cache.get_or_compute(key, lambda: generate_assessment(health_data))
+    
+    async def save_all(predictions: List[PredictionResult]) -> Dict[int, str]:
+        """insert_many in chunks; returns the positions that were not saved, with the reason"""
+        unsaved = {}
+        for start in range(0, len(predictions), BATCH_INSERT_SIZE):
+            chunk = predictions[start:start + BATCH_INSERT_SIZE]
+            try:
+                await db.predictions.insert_many([prediction.model_dump() for prediction in chunk], ordered=False)
+            except BulkWriteError as e:
+                for write_error in e.details.get('writeErrors', []):
+                    unsaved[start + write_error['index']] = write_error.get('errmsg', 'write error')
+            except Exception as e:
+                unsaved.update((position, str(e)) for position in range(start, start + len(chunk)))
+        if unsaved:
+            logging.error(f"Batch {batch_id}: {len(unsaved)} predictions could not be saved")
+        return unsaved
+    
+    async def lines():
+        started = time.perf_counter()
+        yield format_ndjson({
+            "type": "accepted",
+            "batch_id": batch_id,
+            "total": len(records),
+            "valid": len(valid),
+            "invalid": len(invalid),
+            "unique_prompts": len(groups),
+        })
+        for row in invalid:
+            yield format_ndjson({"type": "invalid", **row})
         
-        return prediction
+        completed = failed = 0
+        items = [(key, (key, rows[0][1])) for key, rows in groups.items()]
+        async for ready in fan_out(items, assess, BATCH_CONCURRENCY):
+            predictions = []
+            failures = []
+            for key, assessment, error in ready:
+                for index, health_data, risk_score in groups[key]:
+                    if error is not None:
+                        failures.append((index, risk_score, f"Prediction failed: {str(error)}"))
+                        continue
+                    predictions.append((index, PredictionResult(
+                        user_id=user_id,
+                        health_data=health_data,
+                        risk_assessment=assessment['risk_assessment'],
+                        recommendations=assessment['recommendations'],
+                        risk_score=risk_score,
+                        batch_id=batch_id
+                    )))
+            # Everything that finished together is saved together, then reported
+            unsaved = await save_all([prediction for _, prediction in predictions])
+            if unsaved:
+                failures.extend((index, prediction.risk_score, f"Save failed: {unsaved[position]}")
+                                for position, (index, prediction) in enumerate(predictions) if position in unsaved)
+                predictions = [row for position, row in enumerate(predictions) if position not in unsaved]
+            for index, prediction in predictions:
+                yield format_ndjson({
+                    "type": "result",
+                    "index": index,
+                    "status": "completed",
+                    "prediction": prediction.model_dump(mode="json", exclude={"health_data"}),
+                })
+            for index, risk_score, detail in failures:
+                yield format_ndjson({
+                    "type": "result",
+                    "index": index,
+                    "status": "failed",
+                    "error": detail,
+                    "risk_score": risk_score.model_dump(),
+                })
+            completed += len(predictions)
+            failed += len(failures)
         
-    except Exception as e:
-        logging.error(f"Prediction error: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
+        yield format_ndjson({
+            "type": "summary",
+            "batch_id": batch_id,
+            "completed": completed,
+            "failed": failed,
+            "invalid": len(invalid),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        })
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers={"X-Accel-Buffering": "no"})
+
+@api_router.get("/predict/jobs/{job_id}", response_model=PredictionJob)
+async def get_prediction_job(job_id: str, user_id: str = Depends(get_current_user)):
+    job = await prediction_job_queue.get(job_id, user_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return await load_prediction_job(job)
+
+@api_router.get("/predict/jobs/{job_id}/events")
+async def subscribe_prediction_job(job_id: str, user_id: str = Depends(get_current_user)):
+    """Server-sent `status` events until the job completes or is dead-lettered"""
+    job = await prediction_job_queue.get(job_id, user_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    async def events():
+        current = job
+        last_status = None
+        while True:
+            if current['status'] != last_status:
+                last_status = current['status']
+                payload = await load_prediction_job(current)
+                yield format_sse("status", payload.model_dump(mode="json"))
+            if current['status'] in TERMINAL_STATUSES:
+                return
+            # Woken early when this process handles the job; re-read periodically otherwise
+            await prediction_job_queue.wait(job_id, timeout=5)
+            current = await prediction_job_queue.get(job_id, user_id)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Operational stats, outside the client rate limit and behind the metrics token
+metrics_router = APIRouter(prefix="/api/metrics", dependencies=[Depends(require_metrics_token)])
+
+@metrics_router.get("/prediction-jobs")
+async def get_prediction_job_metrics():
+    return prediction_job_queue.stats()
+
+@metrics_router.get("/prediction-cache")
+async def get_prediction_cache_metrics():
+    return prediction_cache.stats()
+
+@metrics_router.get("/password-hashing")
+async def get_password_hashing_metrics():
+    return password_hasher.stats()
+
+@metrics_router.get("/auth-cache")
+async def get_auth_cache_metrics():
+    return {"tokens": token_cache.stats(), "profiles": profile_cache.stats()}
+
+@metrics_router.get("/rate-limits")
+async def get_rate_limit_metrics():
+    return {"limits": rate_limiter.stats(), "upstream": llm_gate.stats()}
+
+@metrics_router.get("/llm-breaker")
+async def llm_breaker_metrics():
+    return llm_breaker.stats()
+
+@metrics_router.get("/workers")
+async def get_worker_metrics():
+    return {
+        "worker_id": worker_registry.worker_id,
+        "pid": os.getpid(),
+        "workers_per_host": WORKERS,
+        "shared_caches": SHARED_CACHES,
+        "prediction_cache_shared": PREDICTION_CACHE_SHARED,
+        "live_workers": await worker_registry.live_workers(),
+        "cache_events": event_bus.stats(),
+    }
 
 @api_router.get("/predictions", response_model=List[PredictionResult])
-async def get_user_predictions(user_id: str = Depends(get_current_user)):
+async def get_user_predictions(
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=200),
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    batch_id: Optional[str] = None,
+    user_id: str = Depends(get_current_user)
+):
+    query = {"user_id": user_id}
+    if batch_id:
+        query['batch_id'] = batch_id
+    created_filter = {}
+    if start_date is not None:
+        if start_date.tzinfo is None:
+            start_date = start_date.replace(tzinfo=timezone.utc)
+        created_filter['$gte'] = start_date
+    if end_date is not None:
+        if end_date.tzinfo is None:
+            end_date = end_date.replace(tzinfo=timezone.utc)
+        created_filter['$lte'] = end_date
+    if created_filter:
+        query['created_at'] = created_filter
+    if cursor:
+        last_created, last_id = decode_cursor(cursor)
+        query = {"$and": [query, build_keyset_filter("created_at", last_created, last_id)]}
+    
+    # Fetch one extra row to know whether another page exists
     predictions = await db.predictions.find(
-        {"user_id": user_id},
-        {"_id": 0}
-    ).sort("created_at", -1).to_list(100)
+        query,
+        PREDICTION_ROW_PROJECTION
+    ).sort([("created_at", -1), ("id", -1)]).limit(limit + 1).to_list(limit + 1)
+    
+    headers = {}
+    if len(predictions) > limit:
+        predictions = predictions[:limit]
+        headers['X-Next-Cursor'] = encode_cursor(predictions[-1]['created_at'], predictions[-1]['id'])
+    
+    # Older predictions predate these fields; keep the response shape stable
+    for prediction in predictions:
+        prediction.setdefault('risk_score', None)
+        prediction.setdefault('batch_id', None)
+        prediction.setdefault('degraded', False)
     
-    for pred in predictions:
-        if isinstance(pred['created_at'], str):
-            pred['created_at'] = datetime.fromisoformat(pred['created_at'])
+    return json_rows(prediction_rows, predictions, headers)
+
+@api_router.get("/predictions/export")
+async def export_predictions(
+    export_format: str = Query("csv", alias="format", pattern="^(csv|ndjson|parquet)$"),
+    compress: bool = False,
+    user_id: str = Depends(get_current_user)
+):
+    if export_format == "parquet" and not parquet_available():
+        raise HTTPException(status_code=501, detail="Parquet export requires pyarrow")
     
-    return predictions
+    # Flatten health_data server-side so rows arrive ready to encode
+    projection = {"_id": 0}
+    for name, _ in PREDICTION_EXPORT_COLUMNS:
+        if name in HealthData.model_fields:
+            projection[name] = f"$health_data.{name}"
+        elif name in RiskScore.model_fields:
+            projection[name] = f"$risk_score.{name}"
+        else:
+            projection[name] = 1
+    rows = db.predictions.aggregate([
+        {"$match": {"user_id": user_id}},
+        {"$sort": {"created_at": -1, "id": -1}},
+        {"$project": projection},
+    ], batchSize=1000)
+    return build_export_response(rows, export_format, PREDICTION_EXPORT_COLUMNS, "predictions", compress)
 
 @api_router.get("/predictions/{prediction_id}", response_model=PredictionResult)
 async def get_prediction(prediction_id: str, user_id: str = Depends(get_current_user)):
@@ -330,8 +1310,9 @@ async def get_prediction(prediction_id: str, user_id: str = Depends(get_current_
     
     return PredictionResult(**prediction)
 
-# Include router
-app.include_router(api_router)
+# Include router; every API call spends from the client's general budget
+app.include_router(api_router, dependencies=[Depends(api_rate_limit)])
+app.include_router(metrics_router)
 
 app.add_middleware(
     CORSMiddleware,
@@ -339,7 +1320,24 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Retry-After"],
 )
+instrumentation.install(app)
+
+# Existing JSON stats are also exported as gauges
+instrumentation.registry.register_collector("password_hashing", password_hasher.stats)
+instrumentation.registry.register_collector("prediction_cache", prediction_cache.stats)
+instrumentation.registry.register_collector("prediction_jobs", prediction_job_queue.stats)
+instrumentation.registry.register_collector("token_cache", token_cache.stats)
+instrumentation.registry.register_collector("profile_cache", profile_cache.stats)
+instrumentation.registry.register_collector("cache_events", event_bus.stats)
+instrumentation.registry.register_collector("rate_limits", rate_limiter.stats)
+instrumentation.registry.register_collector("llm_upstream", llm_gate.stats)
+instrumentation.registry.register_collector("llm_breaker", llm_breaker.stats)
+
+@app.get("/metrics", include_in_schema=False, dependencies=[Depends(require_metrics_token)])
+async def prometheus_metrics():
+    return Response(content=instrumentation.render(), media_type=METRICS_CONTENT_TYPE)
 
 logging.basicConfig(
     level=logging.INFO,
@@ -347,6 +1345,10 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+def main(argv: List[str]):
+    """Maintenance commands, run through launcher.py: migrate-dates"""
+    if argv == ["migrate-dates"]:
+        asyncio.run(run_date_migration())
+        resources.close()
+    else:
+        print("Usage: python launcher.py serve [--workers N] [--host HOST] [--port PORT] | migrate-dates")
@@ -0,0 +1,216 @@
+"""Coordination between server processes that share one database.
+
+- `WorkerRegistry` records every live worker with a fingerprint of its
+  JWT secret and refuses to start a worker whose secret differs from the
+  others, since tokens it issued would be rejected elsewhere.
+- `MongoEventBus` fans in-memory cache updates out to the other workers
+  through a collection they all poll. `LocalEventBus` is the single-process
+  stand-in with the same interface, where publishing is a no-op.
+
+Event delivery is at-most-once and best effort: events are applied only by
+workers that are running when they are published, and publisher clocks
+must agree to within `max_skew_seconds`.
+"""
+import asyncio
+import hashlib
+import hmac
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timezone, timedelta
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def secret_fingerprint(secret: str) -> str:
+    """Short keyed digest that identifies a secret without storing it"""
+    return hmac.new(secret.encode("utf-8"), b"jwt-secret-fingerprint", hashlib.sha256).hexdigest()[:16]
+
+
+class SecretMismatchError(RuntimeError):
+    pass
+
+
+class WorkerRegistry:
+    def __init__(self, collection, heartbeat_seconds: float = 10.0):
+        self.collection = collection
+        self.heartbeat_seconds = heartbeat_seconds
+        self.worker_id = str(uuid.uuid4())
+        self._identity: dict = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def _live_after(self) -> datetime:
+        return datetime.now(timezone.utc) - timedelta(seconds=self.heartbeat_seconds * 3)
+
+    async def start(self, jwt_fingerprint: str):
+        await self.collection.create_index("last_seen", expireAfterSeconds=int(self.heartbeat_seconds * 3))
+        self._identity = {
+            "host": socket.gethostname(),
+            "pid": os.getpid(),
+            "jwt_fingerprint": jwt_fingerprint,
+            "started_at": datetime.now(timezone.utc),
+        }
+        await self.collection.insert_one(
+            {"_id": self.worker_id, **self._identity, "last_seen": datetime.now(timezone.utc)}
+        )
+        # Compare after registering, so two workers starting together still see each other.
+        # Only documents that carry a fingerprint say anything about the secret.
+        others = await self.collection.find(
+            {"last_seen": {"$gte": self._live_after()}, "jwt_fingerprint": {"$exists": True, "$ne": jwt_fingerprint}},
+            {"host": 1, "pid": 1}
+        ).to_list(None)
+        if others:
+            await self.collection.delete_one({"_id": self.worker_id})
+            workers = ", ".join(f"{worker['host']}:{worker['pid']}" for worker in others)
+            raise SecretMismatchError(
+                f"JWT_SECRET differs from running workers ({workers}); tokens would not validate across them"
+            )
+        self._task = asyncio.create_task(self._heartbeat())
+
+    async def _beat(self):
+        # A stalled heartbeat lets the TTL index drop the document; re-create it whole, not bare
+        await self.collection.update_one(
+            {"_id": self.worker_id},
+            {"$set": {"last_seen": datetime.now(timezone.utc)}, "$setOnInsert": self._identity},
+            upsert=True
+        )
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds)
+            try:
+                await self._beat()
+            except Exception as e:
+                logger.error(f"Worker heartbeat failed: {str(e)}")
+
+    async def live_workers(self) -> List[dict]:
+        return await self.collection.find(
+            {"last_seen": {"$gte": self._live_after()}}, {"_id": 1, "host": 1, "pid": 1, "started_at": 1}
+        ).to_list(None)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.collection.delete_one({"_id": self.worker_id})
+
+
+class LocalEventBus:
+    """Single-process stand-in: local state is already current, so nothing is sent"""
+
+    def subscribe(self, kind: str, handler: Callable[[dict], None]):
+        pass
+
+    def publish(self, kind: str, payload: dict):
+        pass
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    def stats(self) -> dict:
+        return {"shared": False}
+
+
+class MongoEventBus:
+    def __init__(self, collection, poll_interval: float = 0.5, retention_seconds: int = 600,
+                 max_skew_seconds: float = 5.0):
+        self.collection = collection
+        self.poll_interval = poll_interval
+        self.retention_seconds = retention_seconds
+        self.max_skew_seconds = max_skew_seconds
+        self.origin = str(uuid.uuid4())
+        self._handlers: Dict[str, List[Callable[[dict], None]]] = {}
+        self._outbox: List[dict] = []
+        self._seen: Dict[str, datetime] = {}
+        self._since: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+        self.published = 0
+        self.applied = 0
+        self.failed = 0
+
+    def subscribe(self, kind: str, handler: Callable[[dict], None]):
+        self._handlers.setdefault(kind, []).append(handler)
+
+    def publish(self, kind: str, payload: dict):
+        """Queue an event for the other workers; sent on the next poll tick"""
+        self._outbox.append({
+            "id": str(uuid.uuid4()),
+            "origin": self.origin,
+            "kind": kind,
+            "payload": payload,
+            "created_at": datetime.now(timezone.utc),
+        })
+
+    async def start(self):
+        await self.collection.create_index("created_at", expireAfterSeconds=self.retention_seconds)
+        self._since = datetime.now(timezone.utc)
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            try:
+                await self._flush()
+                await self._poll()
+            except Exception as e:
+                logger.error(f"Event bus poll failed: {str(e)}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def _flush(self):
+        if not self._outbox:
+            return
+        events, self._outbox = self._outbox, []
+        try:
+            await self.collection.insert_many(events, ordered=False)
+        except Exception:
+            # Retried on the next tick; events may arrive twice, and receivers skip seen ids
+            self._outbox = events + self._outbox
+            raise
+        self.published += len(events)
+
+    async def _poll(self):
+        # Re-read a skew-sized window: another worker's event can land with an older timestamp
+        window_start = self._since - timedelta(seconds=self.max_skew_seconds)
+        cursor = self.collection.find(
+            {"created_at": {"$gte": window_start}, "origin": {"$ne": self.origin}},
+            {"_id": 0, "id": 1, "kind": 1, "payload": 1, "created_at": 1}
+        ).sort("created_at", 1)
+        async for event in cursor:
+            if event['id'] in self._seen:
+                continue
+            self._seen[event['id']] = event['created_at']
+            self._since = max(self._since, event['created_at'])
+            for handler in self._handlers.get(event['kind'], ()):
+                try:
+                    handler(event['payload'])
+                    self.applied += 1
+                except Exception as e:
+                    self.failed += 1
+                    logger.error(f"Event handler for {event['kind']} failed: {str(e)}")
+        horizon = self._since - timedelta(seconds=self.max_skew_seconds)
+        self._seen = {event_id: created for event_id, created in self._seen.items() if created >= horizon}
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        # Deliver what this worker learned before it goes away
+        try:
+            await self._flush()
+        except Exception as e:
+            logger.error(f"Event bus flush on shutdown failed: {str(e)}")
+
+    def stats(self) -> dict:
+        return {
+            "shared": True,
+            "published": self.published,
+            "pending": len(self._outbox),
+            "applied": self.applied,
+            "failed": self.failed,
+        }
@@ -10,15 +10,19 @@ const HistoryPage = ({ user, onLogout }) => {
   const navigate = useNavigate();
   const [predictions, setPredictions] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     fetchPredictions();
   }, []);
 
-  const fetchPredictions = async () => {
+  const fetchPredictions = async (cursor = null) => {
     try {
-      const response = await axios.get(`${API}/predictions`);
-      setPredictions(response.data);
+      const response = await axios.get(`${API}/predictions`, { params: cursor ? { cursor } : {} });
+      setPredictions((previous) => (cursor ? [...previous, ...response.data] : response.data));
+      // The API pages by cursor; the header is absent on the last page
+      setNextCursor(response.headers['x-next-cursor'] || null);
     } catch (error) {
       console.error('Failed to fetch predictions:', error);
     } finally {
@@ -26,6 +30,12 @@ const HistoryPage = ({ user, onLogout }) => {
     }
   };
 
+  const loadMore = async () => {
+    setLoadingMore(true);
+    await fetchPredictions(nextCursor);
+    setLoadingMore(false);
+  };
+
   const getRiskLevel = (assessment) => {
     const text = assessment.toLowerCase();
     if (text.includes('very high')) return { level: 'Very High', className: 'risk-very-high' };
@@ -127,6 +137,20 @@ const HistoryPage = ({ user, onLogout }) => {
                 </div>
               );
             })}
+            {nextCursor && (
+              <div className="flex justify-center pt-4">
+                <Button
+                  data-testid="load-more-button"
+                  onClick={loadMore}
+                  disabled={loadingMore}
+                  variant="outline"
+                  className="border-cyan-200 text-cyan-700 hover:bg-cyan-50 rounded-full px-6"
+                >
+                  {loadingMore && <Loader2 className="w-4 h-4 mr-2 animate-spin" />}
+                  Load more
+                </Button>
+              </div>
+            )}
           </div>
         )}
       </div>
@@ -27,8 +27,20 @@ const ResultPage = ({ user, onLogout }) => {
     }
   };
 
-  const getRiskLevel = (assessment) => {
-    const text = assessment.toLowerCase();
+  const RISK_CLASSES = {
+    'Very High': 'risk-very-high',
+    High: 'risk-high',
+    Moderate: 'risk-moderate',
+    Low: 'risk-low',
+  };
+
+  const getRiskLevel = (prediction) => {
+    // Prefer the local numeric score; older predictions only have the narrative
+    if (prediction.risk_score) {
+      const { risk_level, risk_percent } = prediction.risk_score;
+      return { level: `${risk_level} Risk`, className: RISK_CLASSES[risk_level], percent: risk_percent };
+    }
+    const text = prediction.risk_assessment.toLowerCase();
     if (text.includes('very high')) return { level: 'Very High Risk', className: 'risk-very-high' };
     if (text.includes('high')) return { level: 'High Risk', className: 'risk-high' };
     if (text.includes('moderate')) return { level: 'Moderate Risk', className: 'risk-moderate' };
@@ -54,7 +66,7 @@ const ResultPage = ({ user, onLogout }) => {
     );
   }
 
-  const risk = getRiskLevel(prediction.risk_assessment);
+  const risk = getRiskLevel(prediction);
 
   return (
     <div className="min-h-screen bg-gradient-to-br from-cyan-50 via-white to-teal-50 py-8 px-4" data-testid="result-page">
@@ -97,6 +109,11 @@ const ResultPage = ({ user, onLogout }) => {
             <div>
               <h2 className="text-sm font-medium text-cyan-600 uppercase tracking-wide mb-1">Overall Assessment</h2>
               <span className={`text-2xl font-bold risk-badge ${risk.className}`}>{risk.level}</span>
+              {risk.percent !== undefined && (
+                <p className="text-sm text-cyan-700 mt-2" data-testid="risk-percent">
+                  Estimated 10-year cardiovascular risk: {risk.percent}%
+                </p>
+              )}
             </div>
           </div>
         </div>
@@ -0,0 +1,283 @@
+"""Budget and anomaly alerts over the expense stream.
+
+Each new expense is checked against the user's monthly budget for its
+category (reading the month total from `expense_rollups`), and scored
+against an exponentially weighted mean/variance of that user's past
+amounts in the category. Running statistics live in `expense_stats`, so
+an event costs a constant number of reads and writes however long the
+history is. Imported batches go through `observe_many`, which folds each
+category's amounts in one compare-and-set and checks each touched budget
+once.
+
+The first observations are weighted 1/n rather than alpha, so the
+statistics start as a plain mean/variance and settle into the EWMA once
+n reaches 1/alpha. `ewma_history` reproduces the same recurrence with
+NumPy to backfill a user's whole history in one pass.
+"""
+import logging
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+import numpy as np
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from rollups import month_of
+
+logger = logging.getLogger(__name__)
+
+ANOMALY_SPREAD_FLOOR = 1.0          # absolute floor on the standard deviation
+ANOMALY_RELATIVE_SPREAD_FLOOR = 0.1  # ... and relative to the mean, so flat histories do not flag small bumps
+STATS_UPDATE_RETRIES = 5
+RECURRENCE_BLOCK = 64
+
+
+def ewma_update(state: Optional[dict], amount: float, alpha: float) -> dict:
+    """Fold one amount into {count, mean, variance}"""
+    if state is None:
+        return {"count": 1, "mean": amount, "variance": 0.0}
+    count = state['count'] + 1
+    weight = max(alpha, 1.0 / count)
+    diff = amount - state['mean']
+    return {
+        "count": count,
+        "mean": state['mean'] + weight * diff,
+        "variance": (1 - weight) * (state['variance'] + weight * diff * diff),
+    }
+
+
+def _spread(mean, variance):
+    return np.maximum(np.maximum(np.sqrt(variance), ANOMALY_RELATIVE_SPREAD_FLOOR * np.abs(mean)), ANOMALY_SPREAD_FLOOR)
+
+
+def anomaly_score(state: Optional[dict], amount: float, min_history: int) -> Optional[float]:
+    """Standardized distance of `amount` above the running mean, or None without enough history"""
+    if state is None or state['count'] < min_history:
+        return None
+    return (amount - state['mean']) / float(_spread(state['mean'], state['variance']))
+
+
+def _linear_recurrence(initial: float, decay: float, inputs: np.ndarray) -> np.ndarray:
+    """y[t] = decay * y[t-1] + inputs[t], vectorized in blocks small enough that decay**-block stays finite"""
+    out = np.empty_like(inputs)
+    powers = decay ** np.arange(1, RECURRENCE_BLOCK + 1)
+    for start in range(0, len(inputs), RECURRENCE_BLOCK):
+        chunk = inputs[start:start + RECURRENCE_BLOCK]
+        scale = powers[:len(chunk)]
+        out[start:start + len(chunk)] = scale * (initial + np.cumsum(chunk / scale))
+        initial = out[start + len(chunk) - 1]
+    return out
+
+
+def ewma_history(amounts: np.ndarray, alpha: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Mean and variance after each amount, matching repeated `ewma_update` calls"""
+    n = len(amounts)
+    counts = np.arange(1, n + 1)
+    # Warm-up: while 1/n > alpha the recurrence is an exact running mean/variance
+    warmup = min(n, int(np.count_nonzero(1.0 / counts > alpha)))
+    means = np.empty(n)
+    variances = np.empty(n)
+    head = amounts[:warmup]
+    means[:warmup] = np.cumsum(head) / counts[:warmup]
+    variances[:warmup] = np.maximum(np.cumsum(head * head) / counts[:warmup] - means[:warmup] ** 2, 0.0)
+    if warmup == n:
+        return means, variances
+
+    decay = 1 - alpha
+    tail = amounts[warmup:]
+    means[warmup:] = _linear_recurrence(means[warmup - 1], decay, alpha * tail)
+    prior_means = np.concatenate(([means[warmup - 1]], means[warmup:-1]))
+    diffs = tail - prior_means
+    variances[warmup:] = _linear_recurrence(variances[warmup - 1], decay, decay * alpha * diffs * diffs)
+    return means, variances
+
+
+class SpendingMonitor:
+    def __init__(self, stats, alerts, budgets, rollups, alpha: float = 0.1, z_threshold: float = 3.0,
+                 min_history: int = 5, budget_thresholds: Tuple[float, ...] = (0.8, 1.0)):
+        if not 0 < alpha < 1:
+            raise ValueError("alpha must be between 0 and 1")
+        self.stats_collection = stats
+        self.alerts = alerts
+        self.budgets = budgets
+        self.rollups = rollups
+        self.alpha = alpha
+        self.z_threshold = z_threshold
+        self.min_history = min_history
+        self.budget_thresholds = tuple(sorted(budget_thresholds))
+        self.observed = 0
+        self.budget_alerts = 0
+        self.anomaly_alerts = 0
+        self.stats_conflicts = 0
+
+    async def observe(self, expense: dict) -> List[dict]:
+        """Check one newly created expense and return the alerts it raised"""
+        self.observed += 1
+        raised = []
+        for check in (self._check_budget, self._check_anomaly):
+            alert = await check(expense)
+            if alert is not None:
+                raised.append(alert)
+        return raised
+
+    async def observe_many(self, expenses: List[dict]) -> List[dict]:
+        """Check a batch of newly imported expenses in order; returns the alerts raised"""
+        self.observed += len(expenses)
+        raised = []
+        by_category = defaultdict(list)
+        for expense in expenses:
+            by_category[(expense['user_id'], expense['category'])].append(expense)
+        for (user_id, category), rows in by_category.items():
+            priors = await self._update_stats(user_id, category, [row['amount'] for row in rows])
+            for expense, state in zip(rows, priors):
+                alert = await self._flag_anomaly(expense, state)
+                if alert is not None:
+                    raised.append(alert)
+
+        # Rollups already include the whole batch, so each touched bucket is checked once
+        last_in_bucket = {
+            (expense['user_id'], expense['category'], month_of(expense['date'])): expense for expense in expenses
+        }
+        for expense in last_in_bucket.values():
+            alert = await self._check_budget(expense)
+            if alert is not None:
+                raised.append(alert)
+        return raised
+
+    async def _raise(self, alert: dict) -> Optional[dict]:
+        """Store an alert once per dedupe key; returns None if it already existed"""
+        alert = {"id": str(uuid.uuid4()), "created_at": datetime.now(timezone.utc), **alert}
+        result = await self.alerts.update_one(
+            {"user_id": alert['user_id'], "dedupe_key": alert['dedupe_key']},
+            {"$setOnInsert": alert},
+            upsert=True
+        )
+        return alert if result.upserted_id is not None else None
+
+    async def _check_budget(self, expense: dict) -> Optional[dict]:
+        user_id, category = expense['user_id'], expense['category']
+        budget = await self.budgets.find_one({"user_id": user_id, "category": category}, {"_id": 0, "monthly_limit": 1})
+        if not budget:
+            return None
+        month = month_of(expense['date'])
+        bucket = await self.rollups.find_one(
+            {"user_id": user_id, "month": month, "category": category}, {"_id": 0, "total": 1}
+        )
+        total = bucket['total'] if bucket else 0.0
+        limit = budget['monthly_limit']
+        reached = [threshold for threshold in self.budget_thresholds if total >= threshold * limit]
+        if not reached:
+            return None
+        # Alert once per month for the highest threshold reached
+        threshold = reached[-1]
+        alert = await self._raise({
+            "user_id": user_id,
+            "type": "budget",
+            "category": category,
+            "month": month,
+            "expense_id": expense['id'],
+            "amount": expense['amount'],
+            "message": f"{category} spending for {month} reached {total / limit:.0%} of the {limit:.2f} budget",
+            "details": {"total": round(total, 2), "monthly_limit": limit, "threshold": threshold},
+            "dedupe_key": f"budget:{category}:{month}:{threshold}",
+        })
+        if alert:
+            self.budget_alerts += 1
+        return alert
+
+    async def _update_stats(self, user_id: str, category: str, amounts: List[float]) -> List[Optional[dict]]:
+        """Fold amounts in order with ewma_update, atomically; returns the state from before each one"""
+        key = {"user_id": user_id, "category": category}
+        for _ in range(STATS_UPDATE_RETRIES):
+            state = await self.stats_collection.find_one(key, {"_id": 0, "count": 1, "mean": 1, "variance": 1})
+            priors = []
+            current = state
+            for amount in amounts:
+                priors.append(current)
+                current = ewma_update(current, amount, self.alpha)
+            updated = {**current, "updated_at": datetime.now(timezone.utc)}
+            if state is None:
+                try:
+                    await self.stats_collection.insert_one({**key, **updated})
+                    return priors
+                except DuplicateKeyError:
+                    self.stats_conflicts += 1
+                    continue
+            # Compare-and-set on count so concurrent writers are folded in one at a time
+            result = await self.stats_collection.update_one({**key, "count": state['count']}, {"$set": updated})
+            if result.modified_count:
+                return priors
+            self.stats_conflicts += 1
+        logger.error(f"Gave up updating spending stats for {user_id}/{category} after {STATS_UPDATE_RETRIES} conflicts")
+        return [None] * len(amounts)
+
+    async def _check_anomaly(self, expense: dict) -> Optional[dict]:
+        [state] = await self._update_stats(expense['user_id'], expense['category'], [expense['amount']])
+        return await self._flag_anomaly(expense, state)
+
+    async def _flag_anomaly(self, expense: dict, state: Optional[dict]) -> Optional[dict]:
+        """Raise an alert if `expense` is far above `state`, the statistics from before it"""
+        score = anomaly_score(state, expense['amount'], self.min_history)
+        if score is None or score < self.z_threshold:
+            return None
+        alert = await self._raise(self._anomaly_alert(expense, state['mean'], score))
+        if alert:
+            self.anomaly_alerts += 1
+        return alert
+
+    @staticmethod
+    def _anomaly_alert(expense: dict, mean: float, score: float) -> dict:
+        return {
+            "user_id": expense['user_id'],
+            "type": "anomaly",
+            "category": expense['category'],
+            "month": month_of(expense['date']),
+            "expense_id": expense['id'],
+            "amount": expense['amount'],
+            "message": f"{expense['amount']:.2f} on {expense['category']} is well above your usual {mean:.2f}",
+            "details": {"z_score": round(float(score), 2), "typical_amount": round(float(mean), 2)},
+            "dedupe_key": f"anomaly:{expense['id']}",
+        }
+
+    async def backfill_user(self, expenses, user_id: str) -> dict:
+        """Recompute a user's running statistics from their full history and flag past outliers"""
+        by_category = defaultdict(list)
+        cursor = expenses.find(
+            {"user_id": user_id}, {"_id": 0, "id": 1, "category": 1, "amount": 1, "date": 1}
+        ).sort([("date", 1), ("id", 1)])
+        async for expense in cursor:
+            by_category[expense['category']].append(expense)
+
+        now = datetime.now(timezone.utc)
+        stats_operations = []
+        alerts_raised = 0
+        for category, rows in by_category.items():
+            amounts = np.fromiter((row['amount'] for row in rows), dtype=float, count=len(rows))
+            means, variances = ewma_history(amounts, self.alpha)
+            # Score each amount against the statistics from before it
+            prior_means = np.concatenate(([0.0], means[:-1]))
+            prior_variances = np.concatenate(([0.0], variances[:-1]))
+            scores = (amounts - prior_means) / _spread(prior_means, prior_variances)
+            flagged = np.flatnonzero((np.arange(len(rows)) >= self.min_history) & (scores >= self.z_threshold))
+            for index in flagged:
+                user_expense = {**rows[index], "user_id": user_id}
+                if await self._raise(self._anomaly_alert(user_expense, prior_means[index], scores[index])):
+                    alerts_raised += 1
+            stats_operations.append(UpdateOne(
+                {"user_id": user_id, "category": category},
+                {"$set": {"count": len(rows), "mean": float(means[-1]), "variance": float(variances[-1]), "updated_at": now}},
+                upsert=True
+            ))
+        if stats_operations:
+            await self.stats_collection.bulk_write(stats_operations, ordered=False)
+        return {"user_id": user_id, "categories": len(by_category), "alerts": alerts_raised}
+
+    def stats(self) -> dict:
+        return {
+            "observed": self.observed,
+            "budget_alerts": self.budget_alerts,
+            "anomaly_alerts": self.anomaly_alerts,
+            "stats_conflicts": self.stats_conflicts,
+        }
@@ -0,0 +1,54 @@
+"""In-process cache for the authentication hot path.
+
+`VerifiedTokenCache` remembers JWTs that already passed signature and
+expiry checks, keyed by the token's SHA-256 digest so raw tokens are never
+held, and drops each entry at the token's own `exp`.
+"""
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+class VerifiedTokenCache:
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[bytes, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode('utf-8')).digest()
+
+    def get(self, token: str) -> Optional[str]:
+        key = self._key(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        user_id, expires_at = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return user_id
+
+    def put(self, token: str, user_id: str, expires_at: float):
+        key = self._key(token)
+        self._entries[key] = (user_id, float(expires_at))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
@@ -0,0 +1,290 @@
+"""Local-first expense categorization.
+
+Lookups go through two in-process tiers before anything reaches the LLM:
+
+1. memo tables of normalized descriptions -> category: the user's own
+   labels, then labels other users agree on, then earlier LLM answers
+2. a multinomial naive Bayes model over description tokens, trained on the
+   user's and everyone's labelled history plus a small keyword seed list
+
+`predict` returns None when neither tier is confident, which is the cue
+for the caller to fall back to the LLM.
+
+Each user holds one vote per description in the global memo, and a
+description is only settled there once `min_global_votes` users have
+labelled it and a majority of them agree, so no single account decides
+categories for everyone else. Memos and per-user models are LRU tables
+with fixed caps, so memory stays bounded however many users and
+descriptions arrive.
+"""
+import math
+import re
+from collections import Counter, OrderedDict, defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, TypeVar
+
+V = TypeVar("V")
+
+_NON_WORD = re.compile(r"[^a-z&]+")
+
+SEED_WEIGHT = 3
+
+# Cold-start vocabulary so common merchants are recognised before any history exists
+KEYWORD_SEEDS = {
+    "Food & Dining": [
+        "restaurant", "cafe", "coffee", "starbucks", "mcdonalds", "pizza", "burger", "lunch", "dinner",
+        "breakfast", "grocery", "groceries", "supermarket", "bakery", "doordash", "ubereats", "grubhub",
+        "swiggy", "zomato", "kfc", "subway", "domino", "dominos", "food",
+    ],
+    "Transportation": [
+        "uber", "lyft", "ola", "taxi", "cab", "fuel", "gas", "petrol", "diesel", "parking", "toll",
+        "metro", "bus", "train", "subway fare", "transit",
+    ],
+    "Shopping": [
+        "amazon", "flipkart", "walmart", "target", "ikea", "clothes", "clothing", "shoes", "mall",
+        "electronics", "store", "shopping",
+    ],
+    "Entertainment": [
+        "netflix", "spotify", "hulu", "disney", "prime video", "movie", "movies", "cinema", "concert",
+        "game", "games", "steam", "playstation", "xbox", "theatre", "theater",
+    ],
+    "Bills & Utilities": [
+        "electricity", "electric", "water", "internet", "wifi", "broadband", "phone", "mobile", "rent",
+        "utility", "utilities", "bill", "insurance", "recharge",
+    ],
+    "Healthcare": [
+        "pharmacy", "doctor", "hospital", "clinic", "dentist", "medicine", "medical", "health",
+        "prescription", "lab",
+    ],
+    "Travel": [
+        "flight", "airline", "airlines", "hotel", "airbnb", "booking", "expedia", "trip", "vacation",
+        "resort",
+    ],
+    "Education": [
+        "tuition", "course", "udemy", "coursera", "books", "book", "school", "college", "university",
+        "exam", "textbook",
+    ],
+    "Personal Care": [
+        "salon", "haircut", "barber", "spa", "gym", "cosmetics", "skincare", "massage", "grooming",
+    ],
+}
+
+
+def _lru_get(table: "OrderedDict[str, V]", key: str, factory: Callable[[], V], max_size: int) -> V:
+    """Fetch or create `key`, marking it most recently used and evicting past `max_size`"""
+    value = table.get(key)
+    if value is None:
+        value = table[key] = factory()
+        if len(table) > max_size:
+            table.popitem(last=False)
+    else:
+        table.move_to_end(key)
+    return value
+
+
+def normalize_description(description: str) -> str:
+    """Lowercase and strip digits/punctuation: 'UBER *TRIP 8841' -> 'uber trip'"""
+    return " ".join(_NON_WORD.sub(" ", description.lower()).split())
+
+
+def tokenize(normalized: str) -> List[str]:
+    tokens = [token for token in normalized.split() if len(token) > 1]
+    # Adjacent pairs capture merchants like "prime video" or "whole foods"
+    return tokens + [f"{a}_{b}" for a, b in zip(tokens, tokens[1:])]
+
+
+class NaiveBayesModel:
+    """Multinomial naive Bayes with additive smoothing and incremental updates"""
+
+    def __init__(self, alpha: float = 0.1):
+        self.alpha = alpha
+        self.token_counts: Dict[str, Counter] = defaultdict(Counter)
+        self.token_totals: Counter = Counter()
+        self.doc_counts: Counter = Counter()
+        self.vocabulary: Counter = Counter()
+
+    @property
+    def documents(self) -> int:
+        return sum(self.doc_counts.values())
+
+    def add(self, tokens: Iterable[str], category: str, weight: int = 1):
+        for token in tokens:
+            self.token_counts[category][token] += weight
+            self.token_totals[category] += weight
+            self.vocabulary[token] += weight
+        self.doc_counts[category] += weight
+
+    def remove(self, tokens: Iterable[str], category: str, weight: int = 1):
+        if self.doc_counts[category] < weight:
+            return
+        for token in tokens:
+            if self.token_counts[category][token] >= weight:
+                self.token_counts[category][token] -= weight
+                self.token_totals[category] -= weight
+                self.vocabulary[token] -= weight
+                if self.vocabulary[token] <= 0:
+                    del self.vocabulary[token]
+        self.doc_counts[category] -= weight
+
+    def predict(self, tokens: List[str]) -> Optional[Tuple[str, float]]:
+        known = [token for token in tokens if token in self.vocabulary]
+        total_docs = self.documents
+        if not known or not total_docs:
+            return None
+
+        vocabulary_size = len(self.vocabulary)
+        scores = {}
+        for category, docs in self.doc_counts.items():
+            if docs <= 0:
+                continue
+            counts = self.token_counts[category]
+            denominator = self.token_totals[category] + self.alpha * vocabulary_size
+            score = math.log(docs / total_docs)
+            for token in known:
+                score += math.log((counts[token] + self.alpha) / denominator)
+            scores[category] = score
+
+        if not scores:
+            return None
+        # Softmax over log scores gives a confidence in [0, 1]
+        best = max(scores, key=scores.get)
+        peak = scores[best]
+        normalizer = sum(math.exp(score - peak) for score in scores.values())
+        return best, 1.0 / normalizer
+
+
+class ExpenseCategorizer:
+    def __init__(self, categories: List[str], confidence_threshold: float = 0.6, min_user_documents: int = 5,
+                 min_global_votes: int = 3, max_users: int = 10_000, max_user_memo: int = 5_000,
+                 max_memo_entries: int = 200_000):
+        self.categories = set(categories)
+        self.confidence_threshold = confidence_threshold
+        self.min_user_documents = min_user_documents
+        self.min_global_votes = min_global_votes
+        self.max_users = max_users
+        self.max_user_memo = max_user_memo
+        self.max_memo_entries = max_memo_entries
+        self.global_memo: "OrderedDict[str, Counter]" = OrderedDict()  # description -> votes, one per user
+        self.answer_memo: "OrderedDict[str, str]" = OrderedDict()  # description -> earlier LLM answer
+        self.user_memo: "OrderedDict[str, OrderedDict[str, str]]" = OrderedDict()
+        self.global_model = NaiveBayesModel()
+        self.user_models: "OrderedDict[str, NaiveBayesModel]" = OrderedDict()
+        self.hits: Counter = Counter()
+
+        for category, keywords in KEYWORD_SEEDS.items():
+            for keyword in keywords:
+                self.global_model.add(tokenize(normalize_description(keyword)), category, weight=SEED_WEIGHT)
+
+    def forget(self, user_id: str, description: str, category: str):
+        """Undo an earlier `learn` call, e.g. when the user corrects a label"""
+        normalized = normalize_description(description)
+        if not normalized or category not in self.categories:
+            return
+        tokens = tokenize(normalized)
+        if user_id in self.user_models:
+            self.user_models[user_id].remove(tokens, category)
+        memo = self.user_memo.get(user_id)
+        if memo is not None and memo.get(normalized) == category:
+            del memo[normalized]
+            self.global_model.remove(tokens, category)
+            self._unvote(normalized, category)
+
+    def _unvote(self, normalized: str, category: str):
+        votes = self.global_memo.get(normalized)
+        if not votes or votes[category] <= 0:
+            return
+        votes[category] -= 1
+        if votes[category] == 0:
+            del votes[category]
+        if not votes:
+            del self.global_memo[normalized]
+
+    def learn(self, user_id: str, description: str, category: str):
+        """Record a user-provided label"""
+        if category not in self.categories:
+            return
+        normalized = normalize_description(description)
+        if not normalized:
+            return
+        tokens = tokenize(normalized)
+        _lru_get(self.user_models, user_id, NaiveBayesModel, self.max_users).add(tokens, category)
+        memo = _lru_get(self.user_memo, user_id, OrderedDict, self.max_users)
+        previous = memo.get(normalized)
+        memo[normalized] = category
+        memo.move_to_end(normalized)
+        if len(memo) > self.max_user_memo:
+            memo.popitem(last=False)
+        # Shared state gets one vote per user and description, following their latest label, so
+        # repeating or relabelling an expense moves that vote rather than adding weight
+        if previous != category:
+            if previous:
+                self.global_model.remove(tokens, previous)
+                self._unvote(normalized, previous)
+            self.global_model.add(tokens, category)
+            _lru_get(self.global_memo, normalized, Counter, self.max_memo_entries)[category] += 1
+
+    def remember(self, description: str, category: str):
+        """Memoize a category produced elsewhere (e.g. by the LLM) without training on it"""
+        normalized = normalize_description(description)
+        if normalized and category in self.categories:
+            self.answer_memo[normalized] = category
+            self.answer_memo.move_to_end(normalized)
+            if len(self.answer_memo) > self.max_memo_entries:
+                self.answer_memo.popitem(last=False)
+
+    def predict(self, user_id: str, description: str,
+                min_confidence: Optional[float] = None) -> Optional[Tuple[str, float, str]]:
+        """Return (category, confidence, tier) or None when the LLM should decide.
+
+        `min_confidence` overrides the model tiers' threshold; 0 takes their best guess.
+        """
+        threshold = self.confidence_threshold if min_confidence is None else min_confidence
+        normalized = normalize_description(description)
+        if not normalized:
+            return None
+
+        memo = self.user_memo.get(user_id)
+        category = memo.get(normalized) if memo else None
+        if category:
+            self.user_memo.move_to_end(user_id)
+            self.hits["user_memo"] += 1
+            return category, 1.0, "user_memo"
+
+        votes = self.global_memo.get(normalized)
+        if votes:
+            category, count = votes.most_common(1)[0]
+            total = sum(votes.values())
+            if count >= self.min_global_votes and count * 2 > total:
+                self.global_memo.move_to_end(normalized)
+                self.hits["global_memo"] += 1
+                return category, count / total, "global_memo"
+
+        category = self.answer_memo.get(normalized)
+        if category:
+            self.answer_memo.move_to_end(normalized)
+            self.hits["answer_memo"] += 1
+            return category, 1.0, "answer_memo"
+
+        tokens = tokenize(normalized)
+        user_model = self.user_models.get(user_id)
+        if user_model is not None and user_model.documents >= self.min_user_documents:
+            prediction = user_model.predict(tokens)
+            if prediction and prediction[1] >= threshold:
+                self.hits["user_model"] += 1
+                return prediction[0], prediction[1], "user_model"
+
+        prediction = self.global_model.predict(tokens)
+        if prediction and prediction[1] >= threshold:
+            self.hits["global_model"] += 1
+            return prediction[0], prediction[1], "global_model"
+
+        self.hits["fallback"] += 1
+        return None
+
+    def stats(self) -> dict:
+        return {
+            "tiers": dict(self.hits),
+            "users": len(self.user_models),
+            "memo_entries": len(self.global_memo),
+            "answer_memo_entries": len(self.answer_memo),
+            "training_documents": self.global_model.documents,
+        }
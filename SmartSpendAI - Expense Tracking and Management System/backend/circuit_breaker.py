@@ -0,0 +1,198 @@
+"""Circuit breaker with latency-adaptive timeouts for upstream model calls.
+
+The breaker watches a rolling window of call outcomes. Once the window
+holds at least `min_calls` and the failed share reaches
+`failure_threshold`, it opens: for `open_seconds` every call fails at once
+with `CircuitOpenError`, so callers can answer from a cache or a local
+fallback instead of waiting on an upstream that is down. After that it is
+half-open and lets `half_open_probes` calls through; one success closes
+it, one failure opens it again.
+
+Each call is also bounded by a timeout that follows the upstream: the p99
+of recent successful latencies times `timeout_multiplier`, kept within
+[min_timeout, max_timeout]. Until `min_calls` successes have been seen it
+is `max_timeout`. A call that runs out of time counts as a failure.
+
+Exceptions listed in `ignored` (local capacity errors, say) pass through
+without being counted either way.
+"""
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Deque, Tuple, Type, TypeVar
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+STATE_CODES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, name: str, retry_after: float):
+        self.name = name
+        self.retry_after = retry_after
+        super().__init__(f"{name} is unavailable; retry in {max(1, math.ceil(retry_after))}s")
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, window_seconds: float = 10.0, min_calls: int = 10,
+                 failure_threshold: float = 0.5, open_seconds: float = 30.0, half_open_probes: int = 1,
+                 min_timeout: float = 5.0, max_timeout: float = 60.0, timeout_multiplier: float = 2.0,
+                 latency_samples: int = 200, ignored: Tuple[Type[BaseException], ...] = ()):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.timeout_multiplier = timeout_multiplier
+        self.ignored = ignored
+        self.state = CLOSED
+        self._outcomes: Deque[Tuple[float, bool]] = deque()  # (monotonic time, failed)
+        self._failures = 0
+        self._latencies: Deque[float] = deque(maxlen=latency_samples)  # successful calls only
+        self._opened_at = 0.0
+        self._probes = 0
+        self.calls = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.opened = 0
+
+    @property
+    def available(self) -> bool:
+        """False while open, so callers can skip straight to their fallback"""
+        if self.state == OPEN:
+            return time.monotonic() - self._opened_at >= self.open_seconds
+        return self.state == CLOSED or self._probes < self.half_open_probes
+
+    def timeout(self) -> float:
+        if len(self._latencies) < self.min_calls:
+            return self.max_timeout
+        return min(self.max_timeout, max(self.min_timeout, self._percentile(0.99) * self.timeout_multiplier))
+
+    def _percentile(self, fraction: float) -> float:
+        if not self._latencies:
+            return 0.0
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1)]
+
+    def _admit(self) -> bool:
+        """Raise if the call may not go upstream; returns whether it is a half-open probe"""
+        if self.state == OPEN:
+            remaining = self._opened_at + self.open_seconds - time.monotonic()
+            if remaining > 0:
+                self.rejected += 1
+                raise CircuitOpenError(self.name, remaining)
+            self.state = HALF_OPEN
+            self._probes = 0
+        if self.state == HALF_OPEN:
+            if self._probes >= self.half_open_probes:
+                self.rejected += 1
+                # The probe in flight settles it within one timeout
+                raise CircuitOpenError(self.name, self.timeout())
+            self._probes += 1
+            return True
+        return False
+
+    def _release(self, probe: bool):
+        if probe:
+            self._probes -= 1
+
+    def _record(self, probe: bool, failed: bool, elapsed: float):
+        self._release(probe)
+        self.calls += 1
+        now = time.monotonic()
+        if failed:
+            self.failed += 1
+        else:
+            self._latencies.append(elapsed)
+        if self.state == HALF_OPEN:
+            if failed:
+                self._trip(now)
+            elif probe:
+                self.state = CLOSED
+                self._outcomes.clear()
+                self._failures = 0
+            return
+        if self.state == OPEN:
+            # Settled after the breaker had already opened; the window restarts on close
+            return
+
+        self._outcomes.append((now, failed))
+        self._failures += failed
+        while self._outcomes and self._outcomes[0][0] < now - self.window_seconds:
+            self._failures -= self._outcomes.popleft()[1]
+        if len(self._outcomes) >= self.min_calls and self._failures >= self.failure_threshold * len(self._outcomes):
+            self._trip(now)
+
+    def _trip(self, now: float):
+        self.state = OPEN
+        self._opened_at = now
+        self._probes = 0
+        self.opened += 1
+
+    async def call(self, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run `fn()` under the adaptive timeout and record the outcome"""
+        probe = self._admit()
+        timeout = self.timeout()
+        started = time.monotonic()
+        try:
+            result = await asyncio.wait_for(fn(), timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            self._record(probe, True, time.monotonic() - started)
+            raise TimeoutError(f"{self.name} did not answer within {timeout:.1f}s")
+        except self.ignored:
+            self._release(probe)
+            raise
+        except Exception:
+            self._record(probe, True, time.monotonic() - started)
+            raise
+        except BaseException:
+            # Cancelled by the caller, which says nothing about upstream health
+            self._release(probe)
+            raise
+        self._record(probe, False, time.monotonic() - started)
+        return result
+
+    @asynccontextmanager
+    async def attempt(self):
+        """Guard a call that cannot be wrapped in one awaitable, such as a stream; no timeout is applied"""
+        probe = self._admit()
+        started = time.monotonic()
+        try:
+            yield
+        except self.ignored:
+            self._release(probe)
+            raise
+        except Exception:
+            self._record(probe, True, time.monotonic() - started)
+            raise
+        except BaseException:
+            self._release(probe)
+            raise
+        self._record(probe, False, time.monotonic() - started)
+
+    def stats(self) -> dict:
+        calls = len(self._outcomes)
+        return {
+            "state": self.state,
+            "state_code": STATE_CODES[self.state],
+            "window_calls": calls,
+            "error_rate": round(self._failures / calls, 4) if calls else 0.0,
+            "latency_p50_ms": round(self._percentile(0.5) * 1000, 1),
+            "latency_p99_ms": round(self._percentile(0.99) * 1000, 1),
+            "timeout_seconds": round(self.timeout(), 2),
+            "calls": self.calls,
+            "failed": self.failed,
+            "timeouts": self.timeouts,
+            "rejected": self.rejected,
+            "opened": self.opened,
+        }
@@ -0,0 +1,308 @@
+"""Month-end and next-month spending forecasts per user and category.
+
+Forecasts are computed from `expense_rollups`, never from raw expenses.
+`forecast_chunk` turns the monthly totals of many users into one
+(user, category) x month matrix and forecasts every row at once:
+
+- Users with two years of history get a seasonal index per calendar
+  month from their total spending, shrunk towards 1 while few years
+  back it.
+- The deseasonalized series is exponentially smoothed from the user's
+  first month with spending onwards.
+- The month-end projection adds the smoothed baseline for the unelapsed
+  part of the month to the month-to-date total. Rows without history
+  extrapolate the current pace.
+
+`ForecastEngine` runs this as a background job. Expense writes stamp
+`changed_at` on the user's forecast document. Each run recomputes only
+users stamped since the previous run started, except that a new month
+recomputes everyone. Chunks of users go to a process pool, and a lease
+in `state` keeps one worker running the job at a time.
+"""
+import asyncio
+import calendar
+import logging
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone, timedelta
+from multiprocessing import get_context
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from rollups import month_of
+
+logger = logging.getLogger(__name__)
+
+SEASONAL_MIN_MONTHS = 24
+SEASONAL_CLIP = (0.25, 4.0)
+JOB_ID = "expense_forecasts"
+
+
+def month_fraction_elapsed(as_of: datetime) -> float:
+    days = calendar.monthrange(as_of.year, as_of.month)[1]
+    seconds = (as_of.day - 1) * 86400 + as_of.hour * 3600 + as_of.minute * 60 + as_of.second
+    return seconds / (days * 86400)
+
+
+def forecast_chunk(rows: List[dict], as_of: datetime, history_months: int = 36, alpha: float = 0.3) -> Dict[str, dict]:
+    """Forecasts keyed by user for rollup rows ({user_id, month, category, total}) of many users"""
+    months = pd.period_range(end=pd.Period(month_of(as_of), freq="M"), periods=history_months + 1, freq="M")
+    labels = [str(month) for month in months]
+    frame = pd.DataFrame(rows, columns=["user_id", "month", "category", "total"])
+    frame = frame[frame["month"].isin(labels)]
+    if frame.empty:
+        return {}
+    matrix = frame.pivot_table(index=["user_id", "category"], columns="month", values="total",
+                               aggfunc="sum", fill_value=0.0).reindex(columns=labels, fill_value=0.0)
+    values = matrix.to_numpy(dtype=float)
+    history, month_to_date = values[:, :-1], values[:, -1]
+    rows_count, span = history.shape
+
+    # Per-user totals; a user's series starts at their first month with any spending
+    user_codes, user_ids = pd.factorize(matrix.index.get_level_values("user_id"))
+    totals = np.zeros((len(user_ids), span + 1))
+    np.add.at(totals, user_codes, np.abs(values))
+    spent = totals != 0
+    user_start = np.where(spent[:, :-1].any(axis=1), spent.argmax(axis=1), span)
+    user_observed = span - user_start
+    user_active = np.arange(span)[None, :] >= user_start[:, None]
+    observed, active = user_observed[user_codes], user_active[user_codes]
+
+    # Seasonal index per calendar month from the user's total spending, which is far less noisy
+    # than any one category: the month's mean over the overall mean, shared by the user's categories
+    calendar_month = np.asarray(months.month[:-1]) - 1
+    totals = totals[:, :-1]
+    overall = (totals * user_active).sum(axis=1) / np.maximum(user_active.sum(axis=1), 1)
+    user_seasonal = np.ones((len(user_ids), 12))
+    for month in range(12):
+        in_month = user_active & (calendar_month == month)[None, :]
+        samples = in_month.sum(axis=1)
+        mean = (totals * in_month).sum(axis=1) / np.maximum(samples, 1)
+        usable = (samples > 0) & (overall > 0) & (user_observed >= SEASONAL_MIN_MONTHS)
+        user_seasonal[usable, month] = mean[usable] / overall[usable]
+    # Shrunk towards 1 while only a few years back each index
+    years = user_observed / 12
+    user_seasonal = np.clip(1 + (user_seasonal - 1) * (years / (years + 1))[:, None], *SEASONAL_CLIP)
+    seasonal = user_seasonal[user_codes]
+
+    # Simple exponential smoothing of the deseasonalized series, all rows per step
+    deseasonalized = history / seasonal[:, calendar_month]
+    level = np.zeros(rows_count)
+    started = np.zeros(rows_count, dtype=bool)
+    for step in range(span):
+        current = deseasonalized[:, step]
+        level = np.where(started, alpha * current + (1 - alpha) * level, np.where(active[:, step], current, level))
+        started |= active[:, step]
+
+    this_month, next_month = months[-1].month - 1, (months[-1] + 1).month - 1
+    elapsed = month_fraction_elapsed(as_of)
+    has_history = observed > 0
+    pace = month_to_date / max(elapsed, 1 / 31)
+    month_end = np.where(has_history, month_to_date + level * seasonal[:, this_month] * (1 - elapsed), pace)
+    following = np.where(has_history, level * seasonal[:, next_month], pace)
+
+    forecasts: Dict[str, dict] = {}
+    for (user_id, category), spent, projected, upcoming, months_seen in zip(
+        matrix.index, month_to_date, month_end, following, observed
+    ):
+        forecast = forecasts.get(user_id)
+        if forecast is None:
+            forecast = forecasts[user_id] = {
+                "month": labels[-1],
+                "next_month": str(months[-1] + 1),
+                "history_months": int(months_seen),
+                "categories": [],
+            }
+        forecast["categories"].append({
+            "category": category,
+            "month_to_date": round(float(spent), 2),
+            "projected_month_end": round(float(projected), 2),
+            "next_month": round(float(upcoming), 2),
+        })
+    for forecast in forecasts.values():
+        forecast["categories"].sort(key=lambda row: row["projected_month_end"], reverse=True)
+        forecast["total"] = {
+            field: round(sum(row[field] for row in forecast["categories"]), 2)
+            for field in ("month_to_date", "projected_month_end", "next_month")
+        }
+    return forecasts
+
+
+def empty_forecast(as_of: datetime) -> dict:
+    month = pd.Period(month_of(as_of), freq="M")
+    return {
+        "month": str(month),
+        "next_month": str(month + 1),
+        "history_months": 0,
+        "categories": [],
+        "total": {"month_to_date": 0.0, "projected_month_end": 0.0, "next_month": 0.0},
+    }
+
+
+class ForecastEngine:
+    def __init__(self, rollups, forecasts, state, processes: int = 1, chunk_size: int = 500,
+                 history_months: int = 36, alpha: float = 0.3, interval_seconds: float = 900,
+                 lease_seconds: float = 600):
+        self.rollups = rollups
+        self.forecasts = forecasts
+        self.state = state
+        self.processes = processes
+        self.chunk_size = chunk_size
+        self.history_months = history_months
+        self.alpha = alpha
+        self.interval_seconds = interval_seconds
+        self.lease_seconds = lease_seconds
+        self.owner = str(uuid.uuid4())
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._task: Optional[asyncio.Task] = None
+        self.runs = 0
+        self.skipped_runs = 0
+        self.users_computed = 0
+        self.on_demand = 0
+        self.last_run: Optional[dict] = None
+
+    async def mark_changed(self, user_id: str):
+        await self.forecasts.update_one(
+            {"user_id": user_id}, {"$set": {"changed_at": datetime.now(timezone.utc)}}, upsert=True
+        )
+
+    def _compute(self, rows: List[dict], as_of: datetime):
+        if self.processes <= 1:
+            return asyncio.to_thread(forecast_chunk, rows, as_of, self.history_months, self.alpha)
+        if self._pool is None:
+            # Spawned workers import only this module, not the parent's threads or sockets
+            self._pool = ProcessPoolExecutor(self.processes, mp_context=get_context("spawn"))
+        return asyncio.get_running_loop().run_in_executor(
+            self._pool, forecast_chunk, rows, as_of, self.history_months, self.alpha
+        )
+
+    async def _load_rows(self, user_ids: List[str], as_of: datetime) -> List[dict]:
+        first_month = str(pd.Period(month_of(as_of), freq="M") - self.history_months)
+        return await self.rollups.find(
+            {"user_id": {"$in": user_ids}, "month": {"$gte": first_month}},
+            {"_id": 0, "user_id": 1, "month": 1, "category": 1, "total": 1}
+        ).to_list(None)
+
+    async def _forecast_users(self, user_ids: List[str], as_of: datetime) -> Dict[str, dict]:
+        computed = await self._compute(await self._load_rows(user_ids, as_of), as_of)
+        computed_at = datetime.now(timezone.utc)
+        forecasts = {
+            user_id: {**(computed.get(user_id) or empty_forecast(as_of)), "computed_at": computed_at}
+            for user_id in user_ids
+        }
+        await self.forecasts.bulk_write([
+            UpdateOne({"user_id": user_id}, {"$set": forecast}, upsert=True)
+            for user_id, forecast in forecasts.items()
+        ], ordered=False)
+        self.users_computed += len(forecasts)
+        return forecasts
+
+    async def get(self, user_id: str) -> dict:
+        """Saved forecast, computed on the spot for users the job has not reached this month"""
+        as_of = datetime.now(timezone.utc)
+        forecast = await self.forecasts.find_one({"user_id": user_id}, {"_id": 0, "user_id": 0, "changed_at": 0})
+        if forecast is None or forecast.get("month") != month_of(as_of):
+            self.on_demand += 1
+            forecast = (await self._forecast_users([user_id], as_of))[user_id]
+        return forecast
+
+    async def _acquire(self, now: datetime) -> Optional[dict]:
+        """Take the job lease; returns the previous state, {} on the first run, or None if another worker holds it"""
+        try:
+            previous = await self.state.find_one_and_update(
+                {"_id": JOB_ID, "$or": [{"lease_until": {"$lt": now}}, {"owner": self.owner}]},
+                {"$set": {"owner": self.owner, "lease_until": now + timedelta(seconds=self.lease_seconds)}},
+                upsert=True,
+                return_document=ReturnDocument.BEFORE
+            )
+        except DuplicateKeyError:
+            return None
+        return previous or {}
+
+    async def _renew(self):
+        await self.state.update_one(
+            {"_id": JOB_ID, "owner": self.owner},
+            {"$set": {"lease_until": datetime.now(timezone.utc) + timedelta(seconds=self.lease_seconds)}}
+        )
+
+    async def run(self, full: bool = False) -> Optional[dict]:
+        """Recompute changed users (or everyone); None when another worker holds the lease"""
+        started_at = datetime.now(timezone.utc)
+        previous = await self._acquire(started_at)
+        if previous is None:
+            self.skipped_runs += 1
+            return None
+        clock = time.perf_counter()
+        month = month_of(started_at)
+        full = full or previous.get("month") != month or previous.get("watermark") is None
+        try:
+            if full:
+                user_ids = set(await self.rollups.distinct("user_id")) | set(await self.forecasts.distinct("user_id"))
+            else:
+                user_ids = set(await self.forecasts.distinct("user_id", {"changed_at": {"$gte": previous["watermark"]}}))
+            user_ids = sorted(user_ids)
+            chunks = [user_ids[index:index + self.chunk_size] for index in range(0, len(user_ids), self.chunk_size)]
+            # Enough chunks in flight to keep every process busy while others load or write
+            limit = asyncio.Semaphore(max(1, self.processes) * 2)
+
+            async def forecast_chunk_users(chunk: List[str]):
+                async with limit:
+                    await self._forecast_users(chunk, started_at)
+                    await self._renew()
+
+            await asyncio.gather(*(forecast_chunk_users(chunk) for chunk in chunks))
+        except BaseException:
+            await self.state.update_one({"_id": JOB_ID, "owner": self.owner}, {"$set": {"lease_until": started_at}})
+            raise
+
+        report = {
+            "full": full,
+            "users": len(user_ids),
+            "seconds": round(time.perf_counter() - clock, 3),
+            "started_at": started_at,
+        }
+        # Changes stamped after this run started are picked up by the next one
+        await self.state.update_one(
+            {"_id": JOB_ID, "owner": self.owner},
+            {"$set": {"watermark": started_at, "month": month, "lease_until": started_at, "last_run": report}}
+        )
+        self.runs += 1
+        self.last_run = report
+        return report
+
+    async def _loop(self):
+        while True:
+            try:
+                report = await self.run()
+                if report and report["users"]:
+                    logger.info(f"Forecasts updated for {report['users']} users in {report['seconds']}s")
+            except Exception as e:
+                logger.error(f"Forecast run failed: {str(e)}")
+            await asyncio.sleep(self.interval_seconds)
+
+    async def start(self):
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> dict:
+        return {
+            "processes": self.processes,
+            "runs": self.runs,
+            "skipped_runs": self.skipped_runs,
+            "users_computed": self.users_computed,
+            "on_demand": self.on_demand,
+            "last_run": self.last_run,
+        }
@@ -0,0 +1,186 @@
+"""Incremental parsers for bank statement imports.
+
+Each parser is fed one physical line at a time and yields
+`(row_number, fields)` pairs as soon as a record is complete, where
+`fields` is a dict with any of description/amount/category/date, or an
+Exception describing why the row could not be parsed. Nothing beyond the
+current record is kept in memory.
+"""
+import codecs
+import csv
+import json
+import re
+from datetime import datetime, timezone
+from typing import AsyncIterator, Iterator, List, Optional, Tuple, Union
+
+ParsedRow = Tuple[int, Union[dict, Exception]]
+
+# Common bank-export column names mapped onto ExpenseCreate fields
+CSV_COLUMN_ALIASES = {
+    "description": "description",
+    "memo": "description",
+    "narration": "description",
+    "payee": "description",
+    "name": "description",
+    "details": "description",
+    "merchant": "description",
+    "amount": "amount",
+    "debit": "amount",
+    "value": "amount",
+    "category": "category",
+    "date": "date",
+    "transaction date": "date",
+    "posted date": "date",
+    "posting date": "date",
+}
+
+_AMOUNT_NOISE = re.compile(r"[^0-9.\-]")
+
+
+def clean_amount(value: str) -> str:
+    """Strip currency symbols and thousands separators: '$1,234.50' -> '1234.50'"""
+    value = value.strip()
+    if value.startswith("(") and value.endswith(")"):
+        value = "-" + value[1:-1]
+    return _AMOUNT_NOISE.sub("", value)
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Decode a byte stream incrementally and yield it line by line"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    buffer = ""
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        lines = buffer.split("\n")
+        buffer = lines.pop()
+        for line in lines:
+            yield line.rstrip("\r")
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer.rstrip("\r")
+
+
+class CsvRowParser:
+    def __init__(self):
+        self.header: Optional[List[str]] = None
+        self.pending: List[str] = []
+        self.row_number = 0
+
+    def feed(self, line: str) -> Iterator[ParsedRow]:
+        self.pending.append(line)
+        record = "\n".join(self.pending)
+        # An odd number of quotes means a quoted field continues on the next line
+        if record.count('"') % 2:
+            return
+        self.pending = []
+        if not record.strip():
+            return
+
+        values = next(csv.reader([record]))
+        if self.header is None:
+            self.header = [CSV_COLUMN_ALIASES.get(column.strip().lower(), column.strip().lower()) for column in values]
+            return
+
+        self.row_number += 1
+        if len(values) != len(self.header):
+            yield self.row_number, ValueError(f"Expected {len(self.header)} columns, got {len(values)}")
+            return
+        fields = {column: value.strip() for column, value in zip(self.header, values) if value.strip()}
+        if "amount" in fields:
+            fields["amount"] = clean_amount(fields["amount"])
+        yield self.row_number, fields
+
+    def close(self) -> Iterator[ParsedRow]:
+        if self.pending:
+            self.row_number += 1
+            yield self.row_number, ValueError("Unterminated quoted field")
+            self.pending = []
+
+
+class JsonLinesParser:
+    def __init__(self):
+        self.row_number = 0
+
+    def feed(self, line: str) -> Iterator[ParsedRow]:
+        if not line.strip():
+            return
+        self.row_number += 1
+        try:
+            fields = json.loads(line)
+        except ValueError as e:
+            yield self.row_number, ValueError(f"Invalid JSON: {e}")
+            return
+        if not isinstance(fields, dict):
+            yield self.row_number, ValueError("Each line must be a JSON object")
+            return
+        yield self.row_number, fields
+
+    def close(self) -> Iterator[ParsedRow]:
+        return iter(())
+
+
+class SkippedRow(Exception):
+    """A well-formed row that is intentionally not imported"""
+
+
+def parse_ofx_date(value: str) -> datetime:
+    """OFX dates look like YYYYMMDD[HHMMSS[.XXX]][[-5:EST]]"""
+    digits = value.split("[", 1)[0].split(".", 1)[0]
+    if len(digits) >= 14:
+        parsed = datetime.strptime(digits[:14], "%Y%m%d%H%M%S")
+    else:
+        parsed = datetime.strptime(digits[:8], "%Y%m%d")
+    return parsed.replace(tzinfo=timezone.utc)
+
+
+class OfxParser:
+    """Handles both SGML (OFX 1.x, unclosed leaf tags) and XML (OFX 2.x) statements.
+
+    Only debits are imported; credits are reported as skipped rows.
+    """
+
+    def __init__(self):
+        self.row_number = 0
+        self.current: Optional[dict] = None
+
+    def _finish(self) -> Iterator[ParsedRow]:
+        transaction, self.current = self.current, None
+        if transaction is None:
+            return
+        self.row_number += 1
+        try:
+            amount = float(clean_amount(transaction.get("TRNAMT", "")))
+            if amount >= 0:
+                yield self.row_number, SkippedRow("Credit transaction")
+                return
+            fields = {
+                "description": transaction.get("NAME") or transaction.get("MEMO") or "",
+                "amount": -amount,
+            }
+            if transaction.get("DTPOSTED"):
+                fields["date"] = parse_ofx_date(transaction["DTPOSTED"])
+            yield self.row_number, fields
+        except ValueError as e:
+            yield self.row_number, ValueError(f"Invalid transaction: {e}")
+
+    def feed(self, line: str) -> Iterator[ParsedRow]:
+        for token in line.split("<")[1:]:
+            tag, _, value = token.partition(">")
+            tag = tag.strip().upper()
+            if tag == "STMTTRN":
+                yield from self._finish()
+                self.current = {}
+            elif tag == "/STMTTRN":
+                yield from self._finish()
+            elif self.current is not None and tag and not tag.startswith("/"):
+                self.current[tag] = value.strip()
+
+    def close(self) -> Iterator[ParsedRow]:
+        yield from self._finish()
+
+
+PARSERS = {
+    "csv": CsvRowParser,
+    "jsonl": JsonLinesParser,
+    "ofx": OfxParser,
+}
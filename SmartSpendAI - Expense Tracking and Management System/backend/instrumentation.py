@@ -0,0 +1,279 @@
+"""Low-overhead runtime instrumentation exported in Prometheus text format.
+
+`Instrumentation` bundles the histograms the servers record into:
+
+- per-route HTTP latency, from a pure ASGI middleware;
+- Mongo command latency, from a pymongo command listener;
+- LLM request and password hashing latency, from explicit timers;
+- event-loop lag, from a monitor task. A watchdog thread also logs the
+  loop thread's stack whenever the loop stays blocked past a threshold.
+
+Recording a sample is a bisect plus a couple of additions under a lock,
+so it is cheap enough to leave on in production.
+"""
+import asyncio
+import bisect
+import logging
+import sys
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key: LabelKey, **extra) -> str:
+    pairs = list(key) + list(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        # label key -> [count per bucket..., +Inf count, sum]
+        self._series: Dict[LabelKey, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, **labels):
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += seconds
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(key, list(values)) for key, values in sorted(self._series.items())]
+        for key, values in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(key, le=bound)} {cumulative}")
+            cumulative += values[len(self.buckets)]
+            lines.append(f"{self.name}_bucket{_format_labels(key, le='+Inf')} {cumulative}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {values[-1]}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        lines.extend(f"{self.name}{_format_labels(key)} {value}" for key, value in values)
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: list = []
+        self._collectors: List[Tuple[str, Callable[[], dict]]] = []
+
+    def histogram(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, help_text, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        metric = Counter(name, help_text)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, prefix: str, collect: Callable[[], dict]):
+        """Expose the numeric fields of a stats() dict as `<prefix>_<field>` gauges"""
+        self._collectors.append((prefix, collect))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for prefix, collect in self._collectors:
+            try:
+                stats = collect()
+            except Exception as e:
+                logger.error(f"Metrics collector {prefix} failed: {str(e)}")
+                continue
+            for field, value in stats.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                lines.append(f"# TYPE {prefix}_{field} gauge")
+                lines.append(f"{prefix}_{field} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class TimingMiddleware:
+    """Pure ASGI middleware recording latency per (method, route template, status class)"""
+
+    def __init__(self, app, histogram: Histogram):
+        self.app = app
+        self.histogram = histogram
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # FastAPI stores the matched route in the scope; templates keep label cardinality bounded
+            route = scope.get("route")
+            self.histogram.observe(
+                time.perf_counter() - start,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=f"{status_code // 100}xx",
+            )
+
+
+class EventLoopMonitor:
+    def __init__(self, histogram: Histogram, stalls: Counter, interval: float = 0.05, threshold: float = 0.1):
+        self.histogram = histogram
+        self.stalls = stalls
+        self.interval = interval
+        self.threshold = threshold
+        self._heartbeat = time.perf_counter()
+        self._reported = False
+        self._loop_thread_id = None
+        self._task = None
+        self._stop = threading.Event()
+        self._watchdog = None
+
+    async def _tick(self):
+        while True:
+            start = time.perf_counter()
+            self._heartbeat = start
+            self._reported = False
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - start - self.interval)
+            self.histogram.observe(lag)
+            if lag >= self.threshold:
+                self.stalls.inc()
+
+    def _watch(self):
+        # Runs in its own thread so it can look at the loop thread while the loop is stuck
+        while not self._stop.wait(self.threshold / 2):
+            blocked = time.perf_counter() - self._heartbeat - self.interval
+            if blocked < self.threshold or self._reported:
+                continue
+            self._reported = True
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else "unavailable\n"
+            logger.warning(f"Event loop blocked for {blocked * 1000:.0f} ms; loop thread stack:\n{stack}")
+
+    def start(self):
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.perf_counter()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._tick())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+class Instrumentation:
+    def __init__(self, lag_threshold: float = 0.1):
+        self.registry = MetricsRegistry()
+        self.http = self.registry.histogram(
+            "http_request_duration_seconds", "HTTP request latency by route, including response streaming")
+        self.mongo = self.registry.histogram(
+            "mongo_command_duration_seconds", "MongoDB command round-trip latency")
+        self.mongo_failures = self.registry.counter(
+            "mongo_command_failures_total", "MongoDB commands that returned an error")
+        self.llm = self.registry.histogram(
+            "llm_request_duration_seconds", "Upstream LLM request latency")
+        self.password_hashing = self.registry.histogram(
+            "password_hash_duration_seconds", "bcrypt compute time on the hashing pool")
+        self.password_hash_queue = self.registry.histogram(
+            "password_hash_queue_seconds", "Time spent waiting for a free hashing thread")
+        self.loop_lag = self.registry.histogram(
+            "event_loop_lag_seconds", "Delay between a scheduled and an actual event loop wake-up", LAG_BUCKETS)
+        self.loop_stalls = self.registry.counter(
+            "event_loop_stalls_total", "Event loop wake-ups delayed past the blocking threshold")
+        self.loop_monitor = EventLoopMonitor(self.loop_lag, self.loop_stalls, threshold=lag_threshold)
+
+    def mongo_listener(self):
+        """A pymongo CommandListener feeding the Mongo histogram; pass it via event_listeners"""
+        from pymongo import monitoring
+
+        instrumentation = self
+
+        class MongoCommandTimer(monitoring.CommandListener):
+            def started(self, event):
+                pass
+
+            def succeeded(self, event):
+                instrumentation.mongo.observe(event.duration_micros / 1e6, command=event.command_name)
+
+            def failed(self, event):
+                instrumentation.mongo.observe(event.duration_micros / 1e6, command=event.command_name)
+                instrumentation.mongo_failures.inc(command=event.command_name)
+
+        return MongoCommandTimer()
+
+    def install(self, app):
+        app.add_middleware(TimingMiddleware, histogram=self.http)
+
+    def render(self) -> str:
+        return self.registry.render()
+
+    def start(self):
+        self.loop_monitor.start()
+
+    async def stop(self):
+        await self.loop_monitor.stop()
@@ -0,0 +1,218 @@
+"""Token-bucket rate limits per client and concurrency caps on upstream calls.
+
+A `RateLimit` is a budget: `rate` tokens per second refill a bucket that
+holds at most `burst`. Cheap routes and LLM-backed routes get separate
+budgets, and a request spends `cost` tokens from the bucket keyed by the
+policy and the client. When the bucket is short, the request fails with
+429 and a Retry-After that says when enough tokens will have refilled.
+
+`LocalBucketStore` keeps the buckets in process memory (an LRU of keys),
+so with several workers each one enforces the budget on its own.
+`MongoBucketStore` refills and spends atomically in one
+find_one_and_update against the server clock, so all workers share a
+single bucket. If Mongo errors, it falls back to its local store rather
+than rejecting traffic. Policies marked `shared` use the Mongo store when
+one is configured; all others stay local and cost no round trip.
+
+`ConcurrencyLimit` caps the calls in flight to an upstream model. A caller
+waits up to `max_wait` for a slot and then gets a 503 with Retry-After,
+instead of queueing behind a backlog that upstream cannot clear.
+"""
+import asyncio
+import logging
+import math
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, Optional
+
+from fastapi import Depends, HTTPException
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimit:
+    def __init__(self, name: str, rate: float, burst: float, shared: bool = False):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.shared = shared
+
+
+class RateLimitExceeded(HTTPException):
+    def __init__(self, policy: RateLimit, retry_after: float):
+        seconds = max(1, math.ceil(retry_after))
+        super().__init__(
+            status_code=429,
+            detail=f"Rate limit exceeded ({policy.name}); retry in {seconds}s",
+            headers={"Retry-After": str(seconds)}
+        )
+
+
+class UpstreamBusy(HTTPException):
+    def __init__(self, name: str, retry_after: float):
+        seconds = max(1, math.ceil(retry_after))
+        super().__init__(
+            status_code=503,
+            detail=f"{name} is at capacity; retry in {seconds}s",
+            headers={"Retry-After": str(seconds)}
+        )
+
+
+class LocalBucketStore:
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()  # key -> [tokens, monotonic time]
+
+    async def take(self, key: str, rate: float, burst: float, cost: float) -> float:
+        """Spend `cost` tokens; returns 0 on success, else seconds until they are available"""
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = [burst, now]
+            self._buckets[key] = bucket
+            # An evicted bucket comes back full, which is what an idle one would have refilled to anyway
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+        if bucket[0] >= cost:
+            bucket[0] -= cost
+            return 0.0
+        return (cost - bucket[0]) / rate
+
+    def stats(self) -> dict:
+        return {"keys": len(self._buckets)}
+
+
+class MongoBucketStore:
+    def __init__(self, collection, idle_seconds: int = 3600, fallback: Optional[LocalBucketStore] = None):
+        self.collection = collection
+        self.idle_seconds = idle_seconds
+        self.fallback = fallback or LocalBucketStore()
+        self.errors = 0
+
+    async def start(self):
+        # Buckets idle this long are full again, so dropping them loses nothing
+        await self.collection.create_index("updated_at", expireAfterSeconds=self.idle_seconds)
+
+    async def take(self, key: str, rate: float, burst: float, cost: float) -> float:
+        elapsed = {"$divide": [{"$subtract": ["$$NOW", {"$ifNull": ["$updated_at", "$$NOW"]}]}, 1000]}
+        pipeline = [
+            {"$set": {
+                "tokens": {"$min": [burst, {"$add": [{"$ifNull": ["$tokens", burst]}, {"$multiply": [elapsed, rate]}]}]},
+                "updated_at": "$$NOW",
+            }},
+            {"$set": {"allowed": {"$gte": ["$tokens", cost]}}},
+            {"$set": {"tokens": {"$cond": ["$allowed", {"$subtract": ["$tokens", cost]}, "$tokens"]}}},
+        ]
+        try:
+            bucket = await self.collection.find_one_and_update(
+                {"_id": key}, pipeline, projection={"tokens": 1, "allowed": 1},
+                upsert=True, return_document=ReturnDocument.AFTER
+            )
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Shared rate limit check failed, using the local bucket: {str(e)}")
+            return await self.fallback.take(key, rate, burst, cost)
+        return 0.0 if bucket['allowed'] else (cost - bucket['tokens']) / rate
+
+    def stats(self) -> dict:
+        return {"errors": self.errors, "fallback_keys": len(self.fallback._buckets)}
+
+
+class RateLimiter:
+    def __init__(self, local: Optional[LocalBucketStore] = None, shared: Optional[MongoBucketStore] = None,
+                 enabled: bool = True):
+        self.local = local or LocalBucketStore()
+        self.shared = shared
+        self.enabled = enabled
+        self._counts: Dict[str, list] = {}  # policy -> [allowed, limited]
+
+    async def start(self):
+        if self.shared is not None:
+            await self.shared.start()
+
+    async def check(self, policy: RateLimit, key: str, cost: float = 1) -> float:
+        """Spend from the client's bucket; returns 0 if allowed, else the Retry-After in seconds"""
+        if not self.enabled:
+            return 0.0
+        if cost > policy.burst:
+            # The bucket never holds that much, so waiting would not help either
+            raise HTTPException(
+                status_code=413,
+                detail=f"Request needs {cost:g} tokens but the {policy.name} limit allows at most {policy.burst:g} at once"
+            )
+        store = self.shared if policy.shared and self.shared is not None else self.local
+        wait = await store.take(f"{policy.name}:{key}", policy.rate, policy.burst, cost)
+        counts = self._counts.setdefault(policy.name, [0, 0])
+        counts[0 if wait == 0 else 1] += 1
+        return wait
+
+    async def enforce(self, policy: RateLimit, key: str, cost: float = 1):
+        wait = await self.check(policy, key, cost)
+        if wait:
+            raise RateLimitExceeded(policy, wait)
+
+    def dependency(self, policy: RateLimit, identify: Callable[..., Awaitable[str]], cost: float = 1):
+        """FastAPI dependency spending `cost` from the bucket of whoever `identify` (itself a dependency) returns"""
+        async def enforce_rate_limit(key: str = Depends(identify)):
+            await self.enforce(policy, key, cost)
+        return enforce_rate_limit
+
+    def stats(self) -> dict:
+        stats = {"enabled": self.enabled, "local_keys": len(self.local._buckets)}
+        for name, (allowed, limited) in self._counts.items():
+            stats[f"{name}_allowed"] = allowed
+            stats[f"{name}_limited"] = limited
+        if self.shared is not None:
+            stats.update({f"shared_{field}": value for field, value in self.shared.stats().items()})
+        return stats
+
+
+class ConcurrencyLimit:
+    def __init__(self, name: str, limit: int, max_wait: float):
+        self.name = name
+        self.limit = limit
+        self.max_wait = max_wait
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.in_flight = 0
+        self.waiting = 0
+        self.peak = 0
+        self.rejected = 0
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.limit)
+        return self._semaphore
+
+    @asynccontextmanager
+    async def slot(self):
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self.semaphore.acquire(), self.max_wait)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise UpstreamBusy(self.name, self.max_wait)
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self.semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "peak": self.peak,
+            "rejected": self.rejected,
+        }
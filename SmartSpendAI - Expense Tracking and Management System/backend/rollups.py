@@ -0,0 +1,210 @@
+"""Per-user monthly rollups of expenses.
+
+`expense_rollups` holds one document per (user_id, month, category) with
+the running `total`, `count` and `ai_categorized_count`. Expense writes
+apply `$inc` deltas computed from the before/after state of the expense,
+so summary and trend reads scan months x categories instead of every
+expense. `rebuild_rollups` recomputes the buckets from raw expenses to
+detect (and optionally repair) drift.
+"""
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo import DeleteMany, UpdateOne
+
+BucketKey = Tuple[str, str]  # (month, category)
+
+# Month bucket of an expense `date`, tolerating legacy ISO-string dates
+MONTH_KEY = {
+    "$cond": [
+        {"$eq": [{"$type": "$date"}, "string"]},
+        {"$substrCP": ["$date", 0, 7]},
+        {"$dateToString": {"format": "%Y-%m", "date": "$date"}}
+    ]
+}
+
+ROLLUP_PIPELINE = [
+    {"$project": {"_id": 0, "user_id": 1, "category": 1, "amount": 1, "ai_categorized": 1, "month": MONTH_KEY}},
+    {"$group": {
+        "_id": {"user_id": "$user_id", "month": "$month", "category": "$category"},
+        "total": {"$sum": "$amount"},
+        "count": {"$sum": 1},
+        "ai_categorized_count": {"$sum": {"$cond": [{"$eq": ["$ai_categorized", True]}, 1, 0]}}
+    }},
+    {"$sort": {"_id.user_id": 1}}
+]
+
+TOTAL_TOLERANCE = 0.005
+
+
+def month_of(value) -> str:
+    if isinstance(value, str):
+        return value[:7]
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return f"{value.year:04d}-{value.month:02d}"
+
+
+def expense_deltas(before: Optional[dict], after: Optional[dict]) -> Dict[BucketKey, list]:
+    """[total, count, ai_categorized_count] changes per bucket for one expense write.
+
+    `before` is None for an insert and `after` is None for a delete. When an
+    update moves the expense to another month or category, the old bucket is
+    debited and the new one credited.
+    """
+    deltas: Dict[BucketKey, list] = defaultdict(lambda: [0.0, 0, 0])
+    for expense, sign in ((before, -1), (after, 1)):
+        if expense is None:
+            continue
+        delta = deltas[(month_of(expense['date']), expense['category'])]
+        delta[0] += sign * expense['amount']
+        delta[1] += sign
+        delta[2] += sign if expense.get('ai_categorized') else 0
+    return {key: delta for key, delta in deltas.items() if any(delta)}
+
+
+def merge_deltas(expenses: Iterable[dict]) -> Dict[BucketKey, list]:
+    """Combined deltas for inserting many expenses at once"""
+    merged: Dict[BucketKey, list] = defaultdict(lambda: [0.0, 0, 0])
+    for expense in expenses:
+        for key, delta in expense_deltas(None, expense).items():
+            for index, value in enumerate(delta):
+                merged[key][index] += value
+    return dict(merged)
+
+
+async def apply_deltas(collection, user_id: str, deltas: Dict[BucketKey, list]):
+    if not deltas:
+        return
+    now = datetime.now(timezone.utc)
+    operations = [
+        UpdateOne(
+            {"user_id": user_id, "month": month, "category": category},
+            {
+                "$inc": {"total": total, "count": count, "ai_categorized_count": ai_count},
+                "$set": {"updated_at": now},
+            },
+            upsert=True
+        )
+        for (month, category), (total, count, ai_count) in deltas.items()
+    ]
+    # Buckets emptied by a delete or a move are dropped rather than kept at zero
+    if any(count < 0 for _, count, _ in deltas.values()):
+        operations.append(DeleteMany({"user_id": user_id, "count": {"$lte": 0}}))
+    await collection.bulk_write(operations, ordered=True)
+
+
+async def load_rollups(collection, user_id: str, start_month: Optional[str] = None,
+                       end_month: Optional[str] = None) -> List[dict]:
+    query = {"user_id": user_id}
+    month_range = {}
+    if start_month:
+        month_range["$gte"] = start_month
+    if end_month:
+        month_range["$lte"] = end_month
+    if month_range:
+        query["month"] = month_range
+    return await collection.find(query, {"_id": 0, "updated_at": 0}).sort("month", 1).to_list(None)
+
+
+def summarize_rollups(rows: List[dict]) -> dict:
+    """Shape rollup rows like the `$facet` output of the raw summary pipeline"""
+    totals = {"total_amount": 0.0, "expense_count": 0, "ai_categorized_count": 0}
+    by_category: Dict[str, list] = defaultdict(lambda: [0.0, 0])
+    by_month: Dict[str, list] = defaultdict(lambda: [0.0, 0])
+    for row in rows:
+        totals["total_amount"] += row['total']
+        totals["expense_count"] += row['count']
+        totals["ai_categorized_count"] += row.get('ai_categorized_count', 0)
+        for bucket in (by_category[row['category']], by_month[row['month']]):
+            bucket[0] += row['total']
+            bucket[1] += row['count']
+    return {
+        "totals": [totals],
+        "by_category": sorted(
+            ({"_id": category, "total": total, "count": count} for category, (total, count) in by_category.items()),
+            key=lambda row: row['total'],
+            reverse=True
+        ),
+        "by_month": [
+            {"_id": month, "total": total, "count": count}
+            for month, (total, count) in sorted(by_month.items())
+        ],
+    }
+
+
+def _differs(expected: dict, actual: Optional[dict]) -> bool:
+    if actual is None:
+        return True
+    return (
+        abs(expected['total'] - actual.get('total', 0.0)) > TOTAL_TOLERANCE
+        or expected['count'] != actual.get('count')
+        or expected['ai_categorized_count'] != actual.get('ai_categorized_count')
+    )
+
+
+async def _reconcile_user(rollups, user_id: str, expected: Dict[BucketKey, dict], repair: bool, report: dict):
+    actual = {
+        (row['month'], row['category']): row
+        async for row in rollups.find({"user_id": user_id}, {"_id": 0})
+    }
+    operations = []
+    now = datetime.now(timezone.utc)
+    for key, bucket in expected.items():
+        current = actual.pop(key, None)
+        if not _differs(bucket, current):
+            continue
+        report["missing" if current is None else "mismatched"] += 1
+        month, category = key
+        operations.append(UpdateOne(
+            {"user_id": user_id, "month": month, "category": category},
+            {"$set": {**bucket, "updated_at": now}},
+            upsert=True
+        ))
+    for month, category in actual:
+        report["extra"] += 1
+        operations.append(DeleteMany({"user_id": user_id, "month": month, "category": category}))
+
+    report["buckets"] += len(expected)
+    if operations:
+        report["users_with_drift"] += 1
+        if repair:
+            await rollups.bulk_write(operations, ordered=False)
+            report["repaired"] += len(operations)
+
+
+async def rebuild_rollups(expenses, rollups, repair: bool = True) -> dict:
+    """Recompute every bucket from raw expenses and compare it with the stored rollups.
+
+    With `repair=False` this only verifies. Writes that land while a user is
+    being reconciled can still race with the rebuild, so run it at a quiet
+    time or follow it with another verify.
+    """
+    report = {"users": 0, "buckets": 0, "missing": 0, "mismatched": 0, "extra": 0,
+              "users_with_drift": 0, "repaired": 0}
+    seen = set()
+    current_user = None
+    expected: Dict[BucketKey, dict] = {}
+
+    async for row in expenses.aggregate(ROLLUP_PIPELINE, allowDiskUse=True):
+        user_id = row['_id']['user_id']
+        if user_id != current_user:
+            if current_user is not None:
+                await _reconcile_user(rollups, current_user, expected, repair, report)
+            current_user, expected = user_id, {}
+            seen.add(user_id)
+            report["users"] += 1
+        expected[(row['_id']['month'], row['_id']['category'])] = {
+            "total": row['total'],
+            "count": row['count'],
+            "ai_categorized_count": row['ai_categorized_count'],
+        }
+    if current_user is not None:
+        await _reconcile_user(rollups, current_user, expected, repair, report)
+
+    # Users whose expenses are all gone but who still have buckets
+    for user_id in await rollups.distinct("user_id"):
+        if user_id not in seen:
+            await _reconcile_user(rollups, user_id, {}, repair, report)
+    return report
@@ -0,0 +1,230 @@
+"""Per-user trigram index over expense descriptions.
+
+Backs typo-tolerant prefix search and autocomplete. Descriptions are
+normalized and indexed once per distinct value (users repeat merchants
+heavily), each word padded pg_trgm-style so word starts carry weight. The
+last word of a query is left open-ended, so "starb" and "starbuks" both
+reach "Starbucks".
+
+Candidates come from the query's rarest trigrams only. A description
+needs `ceil(min_similarity * n)` of the query's n trigrams to qualify, so it
+must contain one of the rarest `n - needed + 1`. Each candidate is then
+scored by the share of query trigrams it contains.
+
+Indexes are built lazily from Mongo on a user's first query, then kept
+current with `add`/`remove`. Whole users are evicted least-recently-used
+first once the indexed expense count passes `max_documents`.
+"""
+import asyncio
+import math
+import re
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, List, Set, Tuple
+
+_NON_WORD = re.compile(r"[^\w&]+")
+
+
+def normalize(description: str) -> str:
+    return " ".join(_NON_WORD.sub(" ", (description or "").lower()).split())
+
+
+def trigrams(normalized: str, open_ended: bool = False) -> Set[str]:
+    """Trigrams of each word padded with two leading spaces and one trailing space.
+
+    With `open_ended` the last word gets no trailing pad, so it matches as a prefix.
+    """
+    words = normalized.split()
+    grams = set()
+    for position, word in enumerate(words):
+        padded = f"  {word}" if open_ended and position == len(words) - 1 else f"  {word} "
+        grams.update(padded[index:index + 3] for index in range(len(padded) - 2))
+    return grams
+
+
+class _Entry:
+    __slots__ = ("display", "grams", "ids")
+
+    def __init__(self, display: str, grams: frozenset):
+        self.display = display
+        self.grams = grams
+        self.ids: Set[str] = set()
+
+
+class UserIndex:
+    def __init__(self):
+        self.entries: Dict[str, _Entry] = {}
+        self.postings: Dict[str, Set[str]] = {}
+        self.documents: Dict[str, str] = {}  # expense id -> normalized description
+
+    def add(self, expense_id: str, description: str):
+        if expense_id in self.documents:
+            self.remove(expense_id)
+        normalized = normalize(description)
+        if not normalized:
+            return
+        entry = self.entries.get(normalized)
+        if entry is None:
+            entry = self.entries[normalized] = _Entry(description.strip(), frozenset(trigrams(normalized)))
+            for gram in entry.grams:
+                self.postings.setdefault(gram, set()).add(normalized)
+        entry.ids.add(expense_id)
+        self.documents[expense_id] = normalized
+
+    def remove(self, expense_id: str):
+        normalized = self.documents.pop(expense_id, None)
+        if normalized is None:
+            return
+        entry = self.entries[normalized]
+        entry.ids.discard(expense_id)
+        if entry.ids:
+            return
+        del self.entries[normalized]
+        for gram in entry.grams:
+            posting = self.postings[gram]
+            posting.discard(normalized)
+            if not posting:
+                del self.postings[gram]
+
+    def search(self, query: str, limit: int, min_similarity: float) -> List[dict]:
+        normalized = normalize(query)
+        grams = trigrams(normalized, open_ended=True)
+        if not grams:
+            return []
+        ordered = sorted(grams, key=lambda gram: len(self.postings.get(gram, ())))
+        needed = max(1, math.ceil(min_similarity * len(ordered)))
+        candidates = set()
+        for gram in ordered[:len(ordered) - needed + 1]:
+            candidates.update(self.postings.get(gram, ()))
+
+        scored = []
+        for candidate in candidates:
+            entry = self.entries[candidate]
+            overlap = len(grams & entry.grams)
+            if overlap >= needed:
+                # Whole-query prefix matches outrank equally similar fuzzy ones
+                scored.append((overlap / len(grams) + (0.5 if candidate.startswith(normalized) else 0.0),
+                               len(entry.ids), candidate))
+        scored.sort(key=lambda row: (-row[0], -row[1], len(row[2])))
+        return [
+            {
+                "description": self.entries[candidate].display,
+                "count": count,
+                "score": round(min(score, 1.0), 3),
+                "exact_prefix": score > 1.0 or candidate.startswith(normalized),
+            }
+            for score, count, candidate in scored[:limit]
+        ]
+
+    def expense_ids(self, description: str) -> Set[str]:
+        entry = self.entries.get(normalize(description))
+        return set(entry.ids) if entry else set()
+
+    @property
+    def size(self) -> int:
+        return len(self.documents)
+
+
+class SearchIndex:
+    def __init__(self, load: Callable[[str], Awaitable[List[Tuple[str, str]]]], max_documents: int = 1_000_000,
+                 min_similarity: float = 0.5):
+        self.load = load
+        self.max_documents = max_documents
+        self.min_similarity = min_similarity
+        self._users: "OrderedDict[str, UserIndex]" = OrderedDict()
+        self._loading: Dict[str, asyncio.Future] = {}
+        self._pending: Dict[str, List[Tuple[str, str, str]]] = {}
+        self.documents = 0
+        self.loads = 0
+        self.evictions = 0
+        self.queries = 0
+
+    async def _index_for(self, user_id: str) -> UserIndex:
+        index = self._users.get(user_id)
+        if index is not None:
+            self._users.move_to_end(user_id)
+            return index
+        loading = self._loading.get(user_id)
+        if loading is None:
+            # Writes that land while the rows are read or indexed are queued and replayed afterwards
+            self._pending[user_id] = []
+            loading = self._loading[user_id] = asyncio.ensure_future(self._build(user_id))
+            loading.add_done_callback(lambda _: self._loading.pop(user_id, None))
+        return await asyncio.shield(loading)
+
+    async def _build(self, user_id: str) -> UserIndex:
+        try:
+            rows = await self.load(user_id)
+            index = await asyncio.to_thread(self._index_rows, rows)
+            for operation, expense_id, description in self._pending[user_id]:
+                if operation == "add":
+                    index.add(expense_id, description)
+                else:
+                    index.remove(expense_id)
+        finally:
+            self._pending.pop(user_id, None)
+        self.loads += 1
+        self._users[user_id] = index
+        self.documents += index.size
+        self._evict(keep=user_id)
+        return index
+
+    @staticmethod
+    def _index_rows(rows: List[Tuple[str, str]]) -> UserIndex:
+        index = UserIndex()
+        for expense_id, description in rows:
+            index.add(expense_id, description)
+        return index
+
+    def _evict(self, keep: str):
+        while self.documents > self.max_documents and len(self._users) > 1:
+            user_id, index = next(iter(self._users.items()))
+            if user_id == keep:
+                self._users.move_to_end(user_id)
+                continue
+            del self._users[user_id]
+            self.documents -= index.size
+            self.evictions += 1
+
+    def add(self, user_id: str, expenses: Iterable[Tuple[str, str]]):
+        """Index new or edited (id, description) pairs; users not in memory are skipped"""
+        self._apply(user_id, [("add", expense_id, description) for expense_id, description in expenses])
+
+    def remove(self, user_id: str, expense_ids: Iterable[str]):
+        self._apply(user_id, [("remove", expense_id, "") for expense_id in expense_ids])
+
+    def _apply(self, user_id: str, operations: List[Tuple[str, str, str]]):
+        if user_id in self._pending:
+            self._pending[user_id].extend(operations)
+            return
+        index = self._users.get(user_id)
+        if index is None:
+            return
+        before = index.size
+        for operation, expense_id, description in operations:
+            if operation == "add":
+                index.add(expense_id, description)
+            else:
+                index.remove(expense_id)
+        self.documents += index.size - before
+        self._evict(keep=user_id)
+
+    async def search(self, user_id: str, query: str, limit: int = 10) -> List[dict]:
+        self.queries += 1
+        index = await self._index_for(user_id)
+        return index.search(query, limit, self.min_similarity)
+
+    async def matching_ids(self, user_id: str, query: str, limit: int = 20) -> List[Set[str]]:
+        """Expense ids behind each of the best `limit` matching descriptions, best first"""
+        self.queries += 1
+        index = await self._index_for(user_id)
+        return [index.expense_ids(match['description']) for match in index.search(query, limit, self.min_similarity)]
+
+    def stats(self) -> dict:
+        return {
+            "users": len(self._users),
+            "documents": self.documents,
+            "descriptions": sum(len(index.entries) for index in self._users.values()),
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "queries": self.queries,
+        }
@@ -0,0 +1,1437 @@
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query, Request, Response
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from dotenv import load_dotenv
+from fastapi.responses import StreamingResponse
+from starlette.middleware.cors import CORSMiddleware
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from pydantic import TypeAdapter, ValidationError
+import os
+import sys
+import math
+import asyncio
+import time
+from contextlib import asynccontextmanager
+import logging
+from pathlib import Path
+from pydantic import BaseModel, Field, EmailStr, ConfigDict
+from typing import List, Optional, Union
+from typing_extensions import TypedDict
+import uuid
+import re
+import json
+import hmac
+from datetime import datetime, timezone, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from passlib.context import CryptContext
+import jwt
+from emergentintegrations.llm.chat import LlmChat, UserMessage
+from categorizer import ExpenseCategorizer
+from importers import PARSERS, SkippedRow, iter_lines
+from pagination import build_keyset_filter, decode_cursor, encode_cursor
+from exporters import ENCODERS, MEDIA_TYPES, gzip_stream, parquet_available
+from auth_cache import VerifiedTokenCache
+from instrumentation import Instrumentation, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from resources import LazyDatabase, Resources
+from worker_sync import LocalEventBus, MongoEventBus, WorkerRegistry, secret_fingerprint
+from launcher import available_cores
+from rate_limit import ConcurrencyLimit, LocalBucketStore, MongoBucketStore, RateLimit, RateLimiter
+from circuit_breaker import CircuitBreaker
+from alerts import SpendingMonitor
+from search_index import SearchIndex
+from forecasting import ForecastEngine
+from rollups import (
+    MONTH_KEY, apply_deltas, expense_deltas, load_rollups, merge_deltas, rebuild_rollups, summarize_rollups
+)
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+# Instrumentation: latency histograms for routes, Mongo, the LLM and hashing, plus event-loop lag
+instrumentation = Instrumentation(lag_threshold=float(os.environ.get('LOOP_LAG_THRESHOLD_MS', '100')) / 1000)
+
+# Deployment: worker processes per host, as set by `python launcher.py serve --workers N` (or gunicorn/uvicorn)
+WORKERS = int(os.environ.get('WEB_CONCURRENCY', '1'))
+SHARED_CACHES = os.environ.get('SHARED_CACHES', 'auto').lower()
+SHARED_CACHES = WORKERS > 1 if SHARED_CACHES == 'auto' else SHARED_CACHES == 'true'
+
+# MongoDB connection: one pooled client per process, created on first use and closed by the lifespan
+mongo_url = os.environ['MONGO_URL']
+resources = Resources(
+    mongo_url,
+    os.environ['DB_NAME'],
+    max_pool_size=int(os.environ.get('MONGO_MAX_POOL_SIZE', '100')),
+    min_pool_size=int(os.environ.get('MONGO_MIN_POOL_SIZE', '4')),
+    event_listeners=[instrumentation.mongo_listener()]
+)
+db = LazyDatabase(resources)
+
+# Workers register with a JWT secret fingerprint; categorizer updates reach the other workers over the event bus
+worker_registry = WorkerRegistry(db.workers)
+event_bus = MongoEventBus(db.cache_events) if SHARED_CACHES else LocalEventBus()
+
+# Rate limits: a per-worker budget for every API call keyed by user (or client address), and a
+# smaller budget for requests that reach the LLM, shared by all workers when they share caches
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+API_RATE_LIMIT = RateLimit(
+    "api",
+    rate=float(os.environ.get('API_RATE_PER_SECOND', '20')),
+    burst=float(os.environ.get('API_RATE_BURST', '100'))
+)
+LLM_RATE_LIMIT = RateLimit(
+    "llm",
+    rate=float(os.environ.get('LLM_RATE_PER_MINUTE', '30')) / 60,
+    burst=float(os.environ.get('LLM_RATE_BURST', '10')),
+    shared=True
+)
+rate_limiter = RateLimiter(
+    LocalBucketStore(int(os.environ.get('RATE_LIMIT_MAX_KEYS', '100000'))),
+    MongoBucketStore(db.rate_limits) if SHARED_CACHES else None,
+    enabled=RATE_LIMIT_ENABLED
+)
+
+# Security
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', '12'))
+# Cores are split between worker processes, so each one gets a proportional share of hashing threads
+HASH_WORKERS = int(os.environ.get('HASH_WORKERS', str(max(1, min(4, available_cores() // WORKERS)))))
+HASH_QUEUE_LIMIT = int(os.environ.get('HASH_QUEUE_LIMIT', '64'))
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+security = HTTPBearer()
+# Metrics and watchdog data describe the deployment, so they are served only to scrapers holding this
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+metrics_security = HTTPBearer(auto_error=False)
+JWT_SECRET = os.environ.get('JWT_SECRET', 'your-secret-key')
+JWT_ALGORITHM = "HS256"
+JWT_EXPIRATION_HOURS = 24
+# Verification depends only on the token and JWT_SECRET, so per-worker caches never disagree
+token_cache = VerifiedTokenCache(int(os.environ.get('TOKEN_CACHE_SIZE', '10000')))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Connect, warm up and load in-memory state; release everything on shutdown"""
+    instrumentation.start()
+    await resources.warm()
+    await worker_registry.start(secret_fingerprint(JWT_SECRET))
+    await event_bus.start()
+    await rate_limiter.start()
+    await ensure_indexes()
+    await bootstrap_rollups()
+    await warm_categorizer()
+    if FORECAST_INTERVAL_SECONDS > 0:
+        await forecast_engine.start()
+    try:
+        yield
+    finally:
+        await forecast_engine.stop()
+        await event_bus.stop()
+        await worker_registry.stop()
+        await instrumentation.stop()
+        password_hasher.shutdown()
+        resources.close()
+
+# Create the main app
+app = FastAPI(lifespan=lifespan)
+
+# Create a router with the /api prefix
+api_router = APIRouter(prefix="/api")
+
+# Predefined expense categories
+PREDEFINED_CATEGORIES = [
+    "Food & Dining",
+    "Transportation",
+    "Shopping",
+    "Entertainment",
+    "Bills & Utilities",
+    "Healthcare",
+    "Travel",
+    "Education",
+    "Personal Care",
+    "Other"
+]
+
+# Local categorizer tiers answer most descriptions before the LLM is consulted
+CATEGORIZER_CONFIDENCE = float(os.environ.get('CATEGORIZER_CONFIDENCE', '0.6'))
+CATEGORIZER_BOOTSTRAP_LIMIT = int(os.environ.get('CATEGORIZER_BOOTSTRAP_LIMIT', '50000'))
+expense_categorizer = ExpenseCategorizer(
+    PREDEFINED_CATEGORIES,
+    confidence_threshold=CATEGORIZER_CONFIDENCE,
+    # Users who must agree on a description before their label applies to everyone
+    min_global_votes=int(os.environ.get('CATEGORIZER_MIN_GLOBAL_VOTES', '3')),
+    max_users=int(os.environ.get('CATEGORIZER_MAX_USERS', '10000')),
+    max_memo_entries=int(os.environ.get('CATEGORIZER_MAX_MEMO_ENTRIES', '200000'))
+)
+CATEGORIZATION_MODEL = "claude-3-7-sonnet-20250219"
+
+# Categorization requests in flight across all workers on this host; each worker takes an equal share
+LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', '32'))
+LLM_QUEUE_TIMEOUT_SECONDS = float(os.environ.get('LLM_QUEUE_TIMEOUT_SECONDS', '10'))
+llm_gate = ConcurrencyLimit("The categorization model", max(1, math.ceil(LLM_MAX_CONCURRENCY / WORKERS)), LLM_QUEUE_TIMEOUT_SECONDS)
+
+# Circuit breaker: opens once LLM_BREAKER_FAILURE_RATE of the calls in the window fail, after which
+# categorization answers locally for LLM_BREAKER_OPEN_SECONDS. Per-call timeouts track p99 latency
+llm_breaker = CircuitBreaker(
+    "The categorization model",
+    window_seconds=float(os.environ.get('LLM_BREAKER_WINDOW_SECONDS', '10')),
+    min_calls=int(os.environ.get('LLM_BREAKER_MIN_CALLS', '10')),
+    failure_threshold=float(os.environ.get('LLM_BREAKER_FAILURE_RATE', '0.5')),
+    open_seconds=float(os.environ.get('LLM_BREAKER_OPEN_SECONDS', '30')),
+    min_timeout=float(os.environ.get('LLM_MIN_TIMEOUT_SECONDS', '5')),
+    max_timeout=float(os.environ.get('LLM_TIMEOUT_SECONDS', '60')),
+    timeout_multiplier=float(os.environ.get('LLM_TIMEOUT_P99_MULTIPLIER', '2'))
+)
+
+# Every worker trains its own categorizer; labels learned by one are replayed by the others
+def learn_categories(user_id: str, labels: List[tuple]):
+    for description, category in labels:
+        expense_categorizer.learn(user_id, description, category)
+    if labels:
+        event_bus.publish("categorizer.learn", {"user_id": user_id, "labels": labels})
+
+def forget_category(user_id: str, description: str, category: str):
+    expense_categorizer.forget(user_id, description, category)
+    event_bus.publish("categorizer.forget", {"user_id": user_id, "description": description, "category": category})
+
+def remember_categories(labels: List[tuple]):
+    for description, category in labels:
+        expense_categorizer.remember(description, category)
+    if labels:
+        event_bus.publish("categorizer.remember", {"labels": labels})
+
+def apply_learned_categories(payload: dict):
+    for description, category in payload['labels']:
+        expense_categorizer.learn(payload['user_id'], description, category)
+
+def apply_remembered_categories(payload: dict):
+    for description, category in payload['labels']:
+        expense_categorizer.remember(description, category)
+
+event_bus.subscribe("categorizer.learn", apply_learned_categories)
+event_bus.subscribe("categorizer.forget", lambda payload: expense_categorizer.forget(
+    payload['user_id'], payload['description'], payload['category']
+))
+event_bus.subscribe("categorizer.remember", apply_remembered_categories)
+
+# Typo-tolerant description search; per-user indexes are built on first query and kept in an LRU
+SEARCH_INDEX_MAX_DOCUMENTS = int(os.environ.get('SEARCH_INDEX_MAX_DOCUMENTS', '1000000'))
+SEARCH_MIN_SIMILARITY = float(os.environ.get('SEARCH_MIN_SIMILARITY', '0.5'))
+
+async def load_search_rows(user_id: str) -> List[tuple]:
+    cursor = db.expenses.find({"user_id": user_id}, {"_id": 0, "id": 1, "description": 1}).batch_size(5000)
+    return [(row['id'], row['description']) async for row in cursor]
+
+search_index = SearchIndex(load_search_rows, max_documents=SEARCH_INDEX_MAX_DOCUMENTS, min_similarity=SEARCH_MIN_SIMILARITY)
+
+def index_expenses(user_id: str, items: List[tuple]):
+    search_index.add(user_id, items)
+    if items:
+        event_bus.publish("search.add", {"user_id": user_id, "items": items})
+
+def unindex_expenses(user_id: str, expense_ids: List[str]):
+    search_index.remove(user_id, expense_ids)
+    event_bus.publish("search.remove", {"user_id": user_id, "ids": expense_ids})
+
+event_bus.subscribe("search.add", lambda payload: search_index.add(payload['user_id'], payload['items']))
+event_bus.subscribe("search.remove", lambda payload: search_index.remove(payload['user_id'], payload['ids']))
+
+# Spending forecasts: a background job recomputes users whose expenses changed, spreading them over a process pool
+FORECAST_INTERVAL_SECONDS = float(os.environ.get('FORECAST_INTERVAL_SECONDS', '900'))
+FORECAST_PROCESSES = int(os.environ.get('FORECAST_PROCESSES', str(max(1, available_cores() // WORKERS))))
+forecast_engine = ForecastEngine(
+    db.expense_rollups,
+    db.expense_forecasts,
+    db.job_state,
+    processes=FORECAST_PROCESSES,
+    chunk_size=int(os.environ.get('FORECAST_CHUNK_USERS', '500')),
+    history_months=int(os.environ.get('FORECAST_HISTORY_MONTHS', '36')),
+    alpha=float(os.environ.get('FORECAST_ALPHA', '0.3')),
+    interval_seconds=FORECAST_INTERVAL_SECONDS
+)
+
+async def record_expense_deltas(user_id: str, deltas: dict):
+    """Apply rollup deltas and flag the user's forecast for the next run"""
+    await apply_deltas(db.expense_rollups, user_id, deltas)
+    await forecast_engine.mark_changed(user_id)
+
+# Bulk import tuning
+IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', '1000'))
+IMPORT_AI_BATCH_SIZE = int(os.environ.get('IMPORT_AI_BATCH_SIZE', '50'))
+IMPORT_AI_CONCURRENCY = int(os.environ.get('IMPORT_AI_CONCURRENCY', '4'))
+MAX_IMPORT_ERRORS = 1000
+
+# Budget and anomaly alerts on new expenses
+spending_monitor = SpendingMonitor(
+    db.expense_stats,
+    db.expense_alerts,
+    db.budgets,
+    db.expense_rollups,
+    alpha=float(os.environ.get('ALERT_EWMA_ALPHA', '0.1')),
+    z_threshold=float(os.environ.get('ALERT_Z_THRESHOLD', '3.0')),
+    min_history=int(os.environ.get('ALERT_MIN_HISTORY', '5')),
+    budget_thresholds=tuple(float(value) for value in os.environ.get('BUDGET_ALERT_THRESHOLDS', '0.8,1.0').split(','))
+)
+
+EXPENSE_EXPORT_COLUMNS = [
+    ("id", "string"),
+    ("date", "timestamp"),
+    ("description", "string"),
+    ("amount", "float"),
+    ("category", "string"),
+    ("ai_categorized", "bool"),
+    ("created_at", "timestamp"),
+]
+
+# ============= Models =============
+
+class UserCreate(BaseModel):
+    name: str
+    email: EmailStr
+    password: str
+
+class UserLogin(BaseModel):
+    email: EmailStr
+    password: str
+
+class User(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    name: str
+    email: EmailStr
+    password_hash: str
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class UserResponse(BaseModel):
+    id: str
+    name: str
+    email: str
+    token: str
+
+class ExpenseCreate(BaseModel):
+    description: str
+    amount: float
+    category: Optional[str] = None
+    date: Optional[datetime] = None
+    use_ai_categorization: bool = False
+
+class ExpenseUpdate(BaseModel):
+    description: Optional[str] = None
+    amount: Optional[float] = None
+    category: Optional[str] = None
+    date: Optional[datetime] = None
+
+class Expense(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    user_id: str
+    description: str
+    amount: float
+    category: str
+    date: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    ai_categorized: bool = False
+
+class ExpenseResponse(BaseModel):
+    id: str
+    description: str
+    amount: float
+    category: str
+    date: str
+    ai_categorized: bool
+
+# Stored expenses are already valid, so list responses are encoded straight from the
+# projected documents instead of being re-validated row by row through ExpenseResponse
+class ExpenseRow(TypedDict):
+    id: str
+    description: str
+    amount: float
+    category: str
+    date: Union[datetime, str]  # legacy rows may still hold ISO strings
+    ai_categorized: bool
+
+expense_rows = TypeAdapter(List[ExpenseRow])
+EXPENSE_ROW_PROJECTION = {"_id": 0, **{field: 1 for field in ExpenseRow.__annotations__}}
+
+class ImportRowError(BaseModel):
+    row: int
+    detail: str
+
+class ImportReport(BaseModel):
+    import_id: str
+    status: str
+    format: str
+    processed: int = 0
+    inserted: int = 0
+    failed: int = 0
+    skipped: int = 0
+    ai_categorized: int = 0
+    errors: List[ImportRowError] = []
+
+class CategorySummary(BaseModel):
+    category: str
+    total: float
+    count: int
+
+class MonthlySummary(BaseModel):
+    month: str
+    total: float
+    count: int
+
+class ExpenseSummary(BaseModel):
+    total_amount: float
+    expense_count: int
+    ai_categorized_count: int
+    by_category: List[CategorySummary]
+    by_month: List[MonthlySummary]
+
+class TrendBucket(BaseModel):
+    month: str
+    category: str
+    total: float
+    count: int
+
+class ForecastTotals(BaseModel):
+    month_to_date: float
+    projected_month_end: float
+    next_month: float
+
+class CategoryForecast(ForecastTotals):
+    category: str
+
+class SpendingForecast(BaseModel):
+    month: str
+    next_month: str
+    history_months: int
+    categories: List[CategoryForecast]
+    total: ForecastTotals
+    computed_at: datetime
+
+class BudgetUpdate(BaseModel):
+    monthly_limit: float = Field(..., gt=0)
+
+class Budget(BaseModel):
+    category: str
+    monthly_limit: float
+    updated_at: datetime
+
+class Alert(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    
+    id: str
+    type: str
+    category: str
+    month: str
+    expense_id: Optional[str] = None
+    amount: float
+    message: str
+    details: dict = {}
+    created_at: datetime
+
+# ============= Password Hashing =============
+
+class PasswordHasher:
+    """Runs passlib/bcrypt on a dedicated thread pool so hashing never blocks the event loop.
+
+    At most `queue_limit` calls may be queued or running; beyond that new
+    calls are rejected with 429 instead of piling up behind the pool.
+    """
+
+    def __init__(self, context: CryptContext, workers: int, queue_limit: int):
+        self.context = context
+        self.queue_limit = queue_limit
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    @staticmethod
+    def _timed(fn, *args):
+        start = time.perf_counter()
+        result = fn(*args)
+        return result, time.perf_counter() - start
+
+    async def _submit(self, operation: str, fn, *args):
+        if self.pending >= self.queue_limit:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=429,
+                detail="Too many authentication requests, please retry shortly",
+                headers={"Retry-After": "1"}
+            )
+        self.pending += 1
+        submitted = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            result, elapsed = await loop.run_in_executor(self._executor, self._timed, fn, *args)
+        finally:
+            self.pending -= 1
+        # Counters are only touched from the event loop thread
+        instrumentation.password_hashing.observe(elapsed, operation=operation)
+        instrumentation.password_hash_queue.observe(time.perf_counter() - submitted - elapsed, operation=operation)
+        self.completed += 1
+        self.total_seconds += elapsed
+        self.max_seconds = max(self.max_seconds, elapsed)
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._submit("hash", self.context.hash, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._submit("verify", self.context.verify, password, hashed)
+
+    def needs_rehash(self, hashed: str) -> bool:
+        return self.context.needs_update(hashed)
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.pending,
+            "queue_limit": self.queue_limit,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_latency_ms": round(self.total_seconds / self.completed * 1000, 2) if self.completed else 0.0,
+            "max_latency_ms": round(self.max_seconds * 1000, 2),
+            "rounds": BCRYPT_ROUNDS,
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+password_hasher = PasswordHasher(pwd_context, HASH_WORKERS, HASH_QUEUE_LIMIT)
+
+# ============= Utility Functions =============
+
+async def hash_password(password: str) -> str:
+    return await password_hasher.hash(password)
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await password_hasher.verify(plain_password, hashed_password)
+
+def create_access_token(user_id: str) -> str:
+    expire = datetime.now(timezone.utc) + timedelta(hours=JWT_EXPIRATION_HOURS)
+    to_encode = {"sub": user_id, "exp": expire}
+    return jwt.encode(to_encode, JWT_SECRET, algorithm=JWT_ALGORITHM)
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> str:
+    token = credentials.credentials
+    # Tokens that already verified are trusted until their own exp
+    user_id = token_cache.get(token)
+    if user_id is not None:
+        return user_id
+    try:
+        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        user_id: str = payload.get("sub")
+        if user_id is None or "exp" not in payload:
+            raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+        token_cache.put(token, user_id, payload["exp"])
+        return user_id
+    except jwt.ExpiredSignatureError:
+        raise HTTPException(status_code=401, detail="Token has expired")
+    except jwt.InvalidTokenError:
+        raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+
+async def rate_limit_key(request: Request) -> str:
+    """The verified user for authenticated requests, otherwise the client address"""
+    scheme, _, token = request.headers.get('authorization', '').partition(' ')
+    if scheme.lower() == 'bearer' and token:
+        try:
+            return "user:" + await get_current_user(HTTPAuthorizationCredentials(scheme=scheme, credentials=token))
+        except HTTPException:
+            pass  # The route's own authentication answers with the 401
+    return "ip:" + (request.client.host if request.client else "unknown")
+
+async def require_metrics_token(credentials: Optional[HTTPAuthorizationCredentials] = Depends(metrics_security)):
+    # Without a configured token the endpoints do not exist
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if credentials is None or not hmac.compare_digest(credentials.credentials.encode(), METRICS_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+
+api_rate_limit = rate_limiter.dependency(API_RATE_LIMIT, rate_limit_key)
+
+async def categorize_expense_with_ai(description: str) -> str:
+    """Use Claude AI to categorize an expense based on its description"""
+    try:
+        api_key = os.environ.get('EMERGENT_LLM_KEY')
+        
+        system_message = f"""You are an expense categorization assistant. Given an expense description, categorize it into ONE of these categories:
+{', '.join(PREDEFINED_CATEGORIES)}
+
+Rules:
+- Return ONLY the category name, nothing else
+- Choose the most appropriate category
+- If unsure, use 'Other'
+"""
+        
+        chat = LlmChat(
+            api_key=api_key,
+            session_id=f"categorize-{uuid.uuid4()}",
+            system_message=system_message
+        ).with_model("anthropic", CATEGORIZATION_MODEL)
+        
+        user_message = UserMessage(text=f"Categorize this expense: {description}")
+        async with llm_gate.slot():
+            with instrumentation.llm.time(provider="anthropic", mode="single"):
+                response = await llm_breaker.call(lambda: chat.send_message(user_message))
+        
+        return match_category(response.strip())
+            
+    except Exception as e:
+        logger.error(f"AI categorization error: {str(e)}")
+        return "Other"
+
+def match_category(category: str) -> str:
+    """Map a model answer onto PREDEFINED_CATEGORIES"""
+    # Validate the category
+    if category in PREDEFINED_CATEGORIES:
+        return category
+    # Try to find a close match
+    category_lower = category.lower()
+    for cat in PREDEFINED_CATEGORIES:
+        if cat.lower() in category_lower or category_lower in cat.lower():
+            return cat
+    return "Other"
+
+async def categorize_expenses_batch_with_ai(descriptions: List[str]) -> List[str]:
+    """Categorize many descriptions with a single LLM request"""
+    try:
+        system_message = f"""You are an expense categorization assistant. You will receive a numbered list of expense descriptions. Categorize each one into ONE of these categories:
+{', '.join(PREDEFINED_CATEGORIES)}
+
+Rules:
+- Return ONLY a JSON array of category names, one per description, in the same order
+- Choose the most appropriate category
+- If unsure, use 'Other'
+"""
+        
+        chat = LlmChat(
+            api_key=os.environ.get('EMERGENT_LLM_KEY'),
+            session_id=f"categorize-batch-{uuid.uuid4()}",
+            system_message=system_message
+        ).with_model("anthropic", CATEGORIZATION_MODEL)
+        
+        numbered = "\n".join(f"{index}. {description}" for index, description in enumerate(descriptions, 1))
+        async with llm_gate.slot():
+            with instrumentation.llm.time(provider="anthropic", mode="batch"):
+                response = await llm_breaker.call(
+                    lambda: chat.send_message(UserMessage(text=f"Categorize these expenses:\n{numbered}"))
+                )
+        
+        text = response.strip()
+        categories = json.loads(text[text.find('['):text.rfind(']') + 1])
+        if len(categories) != len(descriptions):
+            raise ValueError(f"Expected {len(descriptions)} categories, got {len(categories)}")
+        return [match_category(str(category)) for category in categories]
+    
+    except Exception as e:
+        logger.error(f"AI batch categorization error: {str(e)}")
+        return ["Other"] * len(descriptions)
+
+async def categorize_expense(user_id: str, description: str) -> str:
+    """Categorize from the local memo/model tiers, falling back to the LLM"""
+    prediction = expense_categorizer.predict(user_id, description)
+    if prediction is not None:
+        return prediction[0]
+    if not llm_breaker.available:
+        # The LLM is failing; take the local models' best guess now instead of waiting on it
+        prediction = expense_categorizer.predict(user_id, description, min_confidence=0.0)
+        return prediction[0] if prediction else "Other"
+    
+    # Only descriptions that reach the LLM spend from the user's LLM budget
+    await rate_limiter.enforce(LLM_RATE_LIMIT, user_id)
+    category = await categorize_expense_with_ai(description)
+    # "Other" is also the error fallback, so only memoize real answers
+    if category != "Other":
+        remember_categories([(description, category)])
+    return category
+
+async def categorize_expenses_batch(user_id: str, descriptions: List[str]) -> List[Optional[str]]:
+    """Categorize a batch locally first; leftovers go to the LLM many per request.
+    
+    Each LLM request spends one token of the user's LLM budget. Descriptions
+    left over once it runs out, or while the LLM's circuit breaker is open,
+    come back as None rather than failing the import.
+    """
+    categories: List[Optional[str]] = []
+    unresolved = {}
+    for index, description in enumerate(descriptions):
+        prediction = expense_categorizer.predict(user_id, description)
+        categories.append(prediction[0] if prediction else None)
+        if prediction is None:
+            unresolved.setdefault(description, []).append(index)
+    
+    if unresolved:
+        unique = list(unresolved)
+        chunks = [unique[i:i + IMPORT_AI_BATCH_SIZE] for i in range(0, len(unique), IMPORT_AI_BATCH_SIZE)]
+        semaphore = asyncio.Semaphore(IMPORT_AI_CONCURRENCY)
+        
+        async def run_chunk(chunk: List[str]) -> List[Optional[str]]:
+            async with semaphore:
+                if not llm_breaker.available or await rate_limiter.check(LLM_RATE_LIMIT, user_id):
+                    return [None] * len(chunk)
+                return await categorize_expenses_batch_with_ai(chunk)
+        
+        results = await asyncio.gather(*(run_chunk(chunk) for chunk in chunks))
+        answered = []
+        for chunk, chunk_categories in zip(chunks, results):
+            for description, category in zip(chunk, chunk_categories):
+                if category not in (None, "Other"):
+                    answered.append((description, category))
+                for index in unresolved[description]:
+                    categories[index] = category
+        remember_categories(answered)
+    
+    return categories
+
+async def warm_categorizer():
+    """Train the local categorizer on the most recent user-labelled expenses"""
+    cursor = db.expenses.find(
+        {"ai_categorized": {"$ne": True}},
+        {"_id": 0, "user_id": 1, "description": 1, "category": 1}
+    ).sort("created_at", -1).limit(CATEGORIZER_BOOTSTRAP_LIMIT)
+    async for expense in cursor:
+        expense_categorizer.learn(expense['user_id'], expense['description'], expense['category'])
+
+def build_date_filter(start_date: Optional[datetime], end_date: Optional[datetime]) -> dict:
+    """Build a Mongo range filter on the expense `date` field"""
+    date_filter = {}
+    if start_date is not None:
+        if start_date.tzinfo is None:
+            start_date = start_date.replace(tzinfo=timezone.utc)
+        date_filter['$gte'] = start_date
+    if end_date is not None:
+        if end_date.tzinfo is None:
+            end_date = end_date.replace(tzinfo=timezone.utc)
+        date_filter['$lte'] = end_date
+    return {"date": date_filter} if date_filter else {}
+
+def build_summary_pipeline(user_id: str, start_date: Optional[datetime], end_date: Optional[datetime]) -> list:
+    """Aggregate totals, category and month buckets in a single round-trip"""
+    match = {"user_id": user_id, **build_date_filter(start_date, end_date)}
+    return [
+        {"$match": match},
+        {"$project": {"_id": 0, "amount": 1, "category": 1, "ai_categorized": 1, "month": MONTH_KEY}},
+        {"$facet": {
+            "totals": [
+                {"$group": {
+                    "_id": None,
+                    "total_amount": {"$sum": "$amount"},
+                    "expense_count": {"$sum": 1},
+                    "ai_categorized_count": {"$sum": {"$cond": [{"$eq": ["$ai_categorized", True]}, 1, 0]}}
+                }}
+            ],
+            "by_category": [
+                {"$group": {"_id": "$category", "total": {"$sum": "$amount"}, "count": {"$sum": 1}}},
+                {"$sort": {"total": -1}}
+            ],
+            "by_month": [
+                {"$group": {"_id": "$month", "total": {"$sum": "$amount"}, "count": {"$sum": 1}}},
+                {"$sort": {"_id": 1}}
+            ]
+        }}
+    ]
+
+def json_rows(adapter: TypeAdapter, rows: list, headers: Optional[dict] = None) -> Response:
+    """Encode trusted rows in a single pass; returning a Response skips response_model validation"""
+    return Response(content=adapter.dump_json(rows), media_type="application/json", headers=headers)
+
+def build_export_response(rows, export_format: str, columns: list, basename: str, compress: bool) -> StreamingResponse:
+    """Stream rows from a cursor as a downloadable file, optionally gzipped on the fly"""
+    body = ENCODERS[export_format](rows, columns)
+    filename = f"{basename}-{datetime.now(timezone.utc):%Y%m%d}.{export_format}"
+    media_type = MEDIA_TYPES[export_format]
+    # Parquet pages are already compressed
+    if compress and export_format != "parquet":
+        body = gzip_stream(body)
+        filename += ".gz"
+        media_type = "application/gzip"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+# ============= Database Maintenance =============
+
+async def ensure_indexes():
+    """Create the indexes hot queries rely on; safe to run on every startup"""
+    await db.users.create_indexes([
+        IndexModel([("email", ASCENDING)], unique=True, name="email_unique"),
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+    ])
+    await db.expenses.create_indexes([
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+        IndexModel([("user_id", ASCENDING), ("date", DESCENDING), ("id", DESCENDING)], name="user_date_id"),
+        IndexModel([("user_id", ASCENDING), ("category", ASCENDING), ("date", DESCENDING)], name="user_category_date"),
+        IndexModel([("user_id", ASCENDING), ("description", TEXT)], name="user_description_text"),
+        IndexModel([("user_id", ASCENDING), ("description", ASCENDING)], name="user_description"),
+    ])
+    await db.expense_imports.create_indexes([
+        IndexModel([("import_id", ASCENDING), ("user_id", ASCENDING)], unique=True, name="import_user_unique"),
+    ])
+    await db.expense_rollups.create_indexes([
+        IndexModel([("user_id", ASCENDING), ("month", ASCENDING), ("category", ASCENDING)], unique=True, name="user_month_category_unique"),
+    ])
+    await db.budgets.create_indexes([
+        IndexModel([("user_id", ASCENDING), ("category", ASCENDING)], unique=True, name="user_category_unique"),
+    ])
+    await db.expense_stats.create_indexes([
+        IndexModel([("user_id", ASCENDING), ("category", ASCENDING)], unique=True, name="user_category_unique"),
+    ])
+    await db.expense_alerts.create_indexes([
+        IndexModel([("user_id", ASCENDING), ("dedupe_key", ASCENDING)], unique=True, name="user_dedupe_unique"),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="user_created_id"),
+    ])
+    await db.expense_forecasts.create_indexes([
+        IndexModel([("user_id", ASCENDING)], unique=True, name="user_unique"),
+        IndexModel([("changed_at", ASCENDING)], name="changed_at"),
+    ])
+
+async def migrate_string_dates(collection, fields: List[str], batch_size: int = 1000) -> int:
+    """Rewrite ISO-string date fields as native BSON datetimes"""
+    query = {"$or": [{field: {"$type": "string"}} for field in fields]}
+    projection = {field: 1 for field in fields}
+    operations = []
+    migrated = 0
+    async for doc in collection.find(query, projection):
+        update = {
+            field: datetime.fromisoformat(doc[field])
+            for field in fields
+            if isinstance(doc.get(field), str)
+        }
+        operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": update}))
+        if len(operations) >= batch_size:
+            await collection.bulk_write(operations, ordered=False)
+            migrated += len(operations)
+            operations = []
+    if operations:
+        await collection.bulk_write(operations, ordered=False)
+        migrated += len(operations)
+    return migrated
+
+async def run_date_migration():
+    await ensure_indexes()
+    users = await migrate_string_dates(db.users, ["created_at"])
+    expenses = await migrate_string_dates(db.expenses, ["date", "created_at"])
+    logger.info(f"Migrated string dates: {users} users, {expenses} expenses")
+
+async def run_rollup_rebuild(repair: bool):
+    await ensure_indexes()
+    report = await rebuild_rollups(db.expenses, db.expense_rollups, repair=repair)
+    logger.info(f"Rollup {'rebuild' if repair else 'verification'}: {report}")
+    return report
+
+async def run_alert_backfill(user_id: Optional[str] = None):
+    await ensure_indexes()
+    user_ids = [user_id] if user_id else await db.expenses.distinct("user_id")
+    for backfill_user_id in user_ids:
+        result = await spending_monitor.backfill_user(db.expenses, backfill_user_id)
+        logger.info(f"Alert statistics backfilled: {result}")
+
+async def run_forecasts(full: bool):
+    await ensure_indexes()
+    report = await forecast_engine.run(full=full)
+    await forecast_engine.stop()
+    if report is None:
+        logger.info("Forecasts not run: another worker holds the forecast job lease")
+    else:
+        logger.info(f"Forecast run: {report}")
+
+async def bootstrap_rollups():
+    """Populate expense_rollups once for databases that predate it"""
+    if await db.expense_rollups.find_one({}, {"_id": 1}) is None and await db.expenses.find_one({}, {"_id": 1}) is not None:
+        logger.info("expense_rollups is empty; building it from existing expenses")
+        report = await rebuild_rollups(db.expenses, db.expense_rollups, repair=True)
+        logger.info(f"Rollup rebuild: {report}")
+
+# ============= Authentication Routes =============
+
+@api_router.post("/auth/signup", response_model=UserResponse)
+async def signup(user_data: UserCreate):
+    # Check if user already exists
+    existing_user = await db.users.find_one({"email": user_data.email})
+    if existing_user:
+        raise HTTPException(status_code=400, detail="Email already registered")
+    
+    # Create new user
+    user = User(
+        name=user_data.name,
+        email=user_data.email,
+        password_hash=await hash_password(user_data.password)
+    )
+    
+    user_dict = user.model_dump()
+    
+    await db.users.insert_one(user_dict)
+    
+    # Create token
+    token = create_access_token(user.id)
+    
+    return UserResponse(
+        id=user.id,
+        name=user.name,
+        email=user.email,
+        token=token
+    )
+
+@api_router.post("/auth/login", response_model=UserResponse)
+async def login(credentials: UserLogin):
+    # Find user
+    user = await db.users.find_one({"email": credentials.email})
+    if not user or not await verify_password(credentials.password, user['password_hash']):
+        raise HTTPException(status_code=401, detail="Invalid email or password")
+    
+    # Transparently upgrade hashes created with a different cost factor
+    if password_hasher.needs_rehash(user['password_hash']):
+        await db.users.update_one(
+            {"id": user['id']},
+            {"$set": {"password_hash": await hash_password(credentials.password)}}
+        )
+    
+    # Create token
+    token = create_access_token(user['id'])
+    
+    return UserResponse(
+        id=user['id'],
+        name=user['name'],
+        email=user['email'],
+        token=token
+    )
+
+# ============= Expense Routes =============
+
+@api_router.get("/expenses", response_model=List[ExpenseResponse])
+async def get_expenses(
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    category: Optional[str] = None,
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    search: Optional[str] = None,
+    user_id: str = Depends(get_current_user)
+):
+    query = {"user_id": user_id, **build_date_filter(start_date, end_date)}
+    if category:
+        query['category'] = category
+    amount_filter = {}
+    if min_amount is not None:
+        amount_filter['$gte'] = min_amount
+    if max_amount is not None:
+        amount_filter['$lte'] = max_amount
+    if amount_filter:
+        query['amount'] = amount_filter
+    if search:
+        query['description'] = {"$regex": re.escape(search), "$options": "i"}
+    if cursor:
+        last_date, last_id = decode_cursor(cursor)
+        query = {"$and": [query, build_keyset_filter("date", last_date, last_id)]}
+    
+    # Fetch one extra row to know whether another page exists
+    expenses = await db.expenses.find(query, EXPENSE_ROW_PROJECTION).sort(
+        [("date", -1), ("id", -1)]
+    ).limit(limit + 1).to_list(limit + 1)
+    
+    headers = {}
+    if len(expenses) > limit:
+        expenses = expenses[:limit]
+        headers['X-Next-Cursor'] = encode_cursor(expenses[-1]['date'], expenses[-1]['id'])
+    
+    return json_rows(expense_rows, expenses, headers)
+
+@api_router.get("/expenses/search", response_model=List[ExpenseResponse])
+async def search_expenses(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(50, ge=1, le=500),
+    user_id: str = Depends(get_current_user)
+):
+    """Full-text search on descriptions, falling back to trigram matching for typos and partial words"""
+    expenses = []
+    mode = "text"
+    try:
+        expenses = await db.expenses.find(
+            {"user_id": user_id, "$text": {"$search": q}},
+            {**EXPENSE_ROW_PROJECTION, "score": {"$meta": "textScore"}}
+        ).sort([("score", {"$meta": "textScore"}), ("date", -1)]).limit(limit).to_list(limit)
+    except OperationFailure as e:
+        logger.error(f"Text search failed, using the trigram index: {str(e)}")
+    
+    if not expenses:
+        mode = "fuzzy"
+        # Best-matching descriptions first, newest expenses first within each
+        for expense_ids in await search_index.matching_ids(user_id, q):
+            remaining = limit - len(expenses)
+            if remaining <= 0:
+                break
+            expenses += await db.expenses.find(
+                {"user_id": user_id, "id": {"$in": list(expense_ids)}}, EXPENSE_ROW_PROJECTION
+            ).sort([("date", -1), ("id", -1)]).limit(remaining).to_list(remaining)
+    
+    for expense in expenses:
+        expense.pop('score', None)
+    return json_rows(expense_rows, expenses, {"X-Search-Mode": mode})
+
+@api_router.get("/expenses/autocomplete")
+async def autocomplete_descriptions(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(10, ge=1, le=50),
+    user_id: str = Depends(get_current_user)
+):
+    """Distinct past descriptions matching a prefix, tolerant of typos, most used first among equals"""
+    return await search_index.search(user_id, q, limit=limit)
+
+@api_router.post("/expenses", response_model=ExpenseResponse)
+async def create_expense(expense_data: ExpenseCreate, user_id: str = Depends(get_current_user)):
+    # Determine category
+    ai_categorized = False
+    if expense_data.use_ai_categorization and not expense_data.category:
+        category = await categorize_expense(user_id, expense_data.description)
+        ai_categorized = True
+    else:
+        category = expense_data.category or "Other"
+        if expense_data.category:
+            learn_categories(user_id, [(expense_data.description, category)])
+    
+    # Create expense
+    expense = Expense(
+        user_id=user_id,
+        description=expense_data.description,
+        amount=expense_data.amount,
+        category=category,
+        date=expense_data.date or datetime.now(timezone.utc),
+        ai_categorized=ai_categorized
+    )
+    
+    expense_dict = expense.model_dump()
+    
+    await db.expenses.insert_one(expense_dict)
+    index_expenses(user_id, [(expense.id, expense.description)])
+    await record_expense_deltas(user_id, expense_deltas(None, expense_dict))
+    try:
+        await spending_monitor.observe(expense_dict)
+    except Exception as e:
+        # Alerts are advisory; never fail the write because of them
+        logger.error(f"Spending alert check failed for expense {expense.id}: {str(e)}")
+    
+    return ExpenseResponse(
+        id=expense.id,
+        description=expense.description,
+        amount=expense.amount,
+        category=expense.category,
+        date=expense.date.isoformat(),
+        ai_categorized=ai_categorized
+    )
+
+async def flush_import_batch(user_id: str, batch: List[tuple], categorize: bool, report: ImportReport):
+    """Categorize and insert one batch of validated rows"""
+    needs_category = [index for index, (_, row) in enumerate(batch) if not row.category]
+    ai_categories = {}
+    if categorize and needs_category:
+        categories = await categorize_expenses_batch(user_id, [batch[index][1].description for index in needs_category])
+        ai_categories = {index: category for index, category in zip(needs_category, categories) if category is not None}
+    
+    learn_categories(user_id, [(row.description, row.category) for _, row in batch if row.category])
+    documents = []
+    for index, (row_number, row) in enumerate(batch):
+        date = row.date or datetime.now(timezone.utc)
+        if date.tzinfo is None:
+            date = date.replace(tzinfo=timezone.utc)
+        expense = Expense(
+            user_id=user_id,
+            description=row.description,
+            amount=row.amount,
+            category=row.category or ai_categories.get(index, "Other"),
+            date=date,
+            ai_categorized=index in ai_categories
+        )
+        documents.append(expense.model_dump())
+    
+    failed_indexes = set()
+    try:
+        result = await db.expenses.insert_many(documents, ordered=False)
+        inserted = len(result.inserted_ids)
+    except BulkWriteError as e:
+        inserted = e.details.get('nInserted', 0)
+        for write_error in e.details.get('writeErrors', []):
+            failed_indexes.add(write_error['index'])
+            report.failed += 1
+            if len(report.errors) < MAX_IMPORT_ERRORS:
+                report.errors.append(ImportRowError(row=batch[write_error['index']][0], detail=write_error.get('errmsg', 'Write failed')))
+    
+    saved = [document for index, document in enumerate(documents) if index not in failed_indexes]
+    index_expenses(user_id, [(document['id'], document['description']) for document in saved])
+    await record_expense_deltas(user_id, merge_deltas(saved))
+    try:
+        # Imports keep the running statistics and budget checks as current as single creates do
+        await spending_monitor.observe_many(saved)
+    except Exception as e:
+        # Alerts are advisory; never fail the import because of them
+        logger.error(f"Spending alert check failed for an import batch of {user_id}: {str(e)}")
+    report.inserted += inserted
+    report.ai_categorized += len(ai_categories)
+
+@api_router.get("/expenses/export")
+async def export_expenses(
+    export_format: str = Query("csv", alias="format", pattern="^(csv|ndjson|parquet)$"),
+    compress: bool = False,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    user_id: str = Depends(get_current_user)
+):
+    if export_format == "parquet" and not parquet_available():
+        raise HTTPException(status_code=501, detail="Parquet export requires pyarrow")
+    
+    query = {"user_id": user_id, **build_date_filter(start_date, end_date)}
+    projection = {"_id": 0, **{name: 1 for name, _ in EXPENSE_EXPORT_COLUMNS}}
+    rows = db.expenses.find(query, projection).sort([("date", -1), ("id", -1)]).batch_size(1000)
+    return build_export_response(rows, export_format, EXPENSE_EXPORT_COLUMNS, "expenses", compress)
+
+@api_router.post("/expenses/import", response_model=ImportReport)
+async def import_expenses(
+    request: Request,
+    source_format: str = Query(..., alias="format", pattern="^(csv|jsonl|ofx)$"),
+    import_id: Optional[str] = None,
+    categorize: bool = True,
+    user_id: str = Depends(get_current_user)
+):
+    """Stream a CSV, JSON-lines or OFX statement from the request body.
+    
+    Progress is persisted under `import_id` after every batch so clients can
+    poll GET /expenses/import/{import_id} while the upload is running.
+    """
+    report = ImportReport(import_id=import_id or str(uuid.uuid4()), status="running", format=source_format)
+    try:
+        await db.expense_imports.insert_one({**report.model_dump(), "user_id": user_id, "created_at": datetime.now(timezone.utc)})
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="Import id already used")
+    
+    async def save_progress():
+        await db.expense_imports.update_one(
+            {"import_id": report.import_id, "user_id": user_id},
+            {"$set": report.model_dump()}
+        )
+    
+    parser = PARSERS[source_format]()
+    batch = []
+    
+    def handle(parsed_rows):
+        for row_number, fields in parsed_rows:
+            report.processed += 1
+            if isinstance(fields, SkippedRow):
+                report.skipped += 1
+                continue
+            try:
+                if isinstance(fields, Exception):
+                    raise fields
+                batch.append((row_number, ExpenseCreate.model_validate(fields)))
+            except (ValueError, ValidationError) as e:
+                report.failed += 1
+                if len(report.errors) < MAX_IMPORT_ERRORS:
+                    report.errors.append(ImportRowError(row=row_number, detail=str(e)))
+    
+    try:
+        async for line in iter_lines(request.stream()):
+            handle(parser.feed(line))
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                await flush_import_batch(user_id, batch, categorize, report)
+                batch = []
+                await save_progress()
+        handle(parser.close())
+        if batch:
+            await flush_import_batch(user_id, batch, categorize, report)
+        report.status = "completed"
+    except Exception as e:
+        logger.error(f"Import {report.import_id} failed: {str(e)}")
+        report.status = "failed"
+        raise HTTPException(status_code=500, detail=f"Import failed after {report.processed} rows: {str(e)}")
+    finally:
+        await save_progress()
+    
+    return report
+
+@api_router.get("/expenses/import/{import_id}", response_model=ImportReport)
+async def get_import_status(import_id: str, user_id: str = Depends(get_current_user)):
+    report = await db.expense_imports.find_one({"import_id": import_id, "user_id": user_id}, {"_id": 0})
+    if not report:
+        raise HTTPException(status_code=404, detail="Import not found")
+    return ImportReport(**report)
+
+@api_router.put("/expenses/{expense_id}", response_model=ExpenseResponse)
+async def update_expense(
+    expense_id: str,
+    expense_data: ExpenseUpdate,
+    user_id: str = Depends(get_current_user)
+):
+    # Find expense
+    expense = await db.expenses.find_one({"id": expense_id, "user_id": user_id})
+    if not expense:
+        raise HTTPException(status_code=404, detail="Expense not found")
+    
+    # Update fields
+    update_dict = {}
+    if expense_data.description is not None:
+        update_dict['description'] = expense_data.description
+    if expense_data.amount is not None:
+        update_dict['amount'] = expense_data.amount
+    if expense_data.category is not None:
+        update_dict['category'] = expense_data.category
+    if expense_data.date is not None:
+        update_dict['date'] = expense_data.date if expense_data.date.tzinfo else expense_data.date.replace(tzinfo=timezone.utc)
+    
+    # A changed category (or a relabelled description) is a user correction
+    new_description = update_dict.get('description', expense['description'])
+    new_category = update_dict.get('category', expense['category'])
+    was_ai_categorized = expense.get('ai_categorized', False)
+    if new_category != expense['category'] or (not was_ai_categorized and new_description != expense['description']):
+        if not was_ai_categorized:
+            forget_category(user_id, expense['description'], expense['category'])
+        learn_categories(user_id, [(new_description, new_category)])
+        update_dict['ai_categorized'] = False
+    
+    updated_expense = expense
+    if update_dict:
+        # The pre-image comes from the write itself, so concurrent edits cannot skew the rollup deltas
+        previous = await db.expenses.find_one_and_update(
+            {"id": expense_id, "user_id": user_id},
+            {"$set": update_dict},
+            return_document=ReturnDocument.BEFORE
+        )
+        if not previous:
+            raise HTTPException(status_code=404, detail="Expense not found")
+        updated_expense = {**previous, **update_dict}
+        if updated_expense['description'] != previous['description']:
+            index_expenses(user_id, [(expense_id, updated_expense['description'])])
+        await record_expense_deltas(user_id, expense_deltas(previous, updated_expense))
+    
+    return ExpenseResponse(
+        id=updated_expense['id'],
+        description=updated_expense['description'],
+        amount=updated_expense['amount'],
+        category=updated_expense['category'],
+        date=updated_expense['date'] if isinstance(updated_expense['date'], str) else updated_expense['date'].isoformat(),
+        ai_categorized=updated_expense.get('ai_categorized', False)
+    )
+
+@api_router.delete("/expenses/{expense_id}")
+async def delete_expense(expense_id: str, user_id: str = Depends(get_current_user)):
+    deleted = await db.expenses.find_one_and_delete({"id": expense_id, "user_id": user_id})
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Expense not found")
+    unindex_expenses(user_id, [expense_id])
+    await record_expense_deltas(user_id, expense_deltas(deleted, None))
+    return {"message": "Expense deleted successfully"}
+
+@api_router.get("/expenses/summary", response_model=ExpenseSummary)
+async def get_expense_summary(
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    user_id: str = Depends(get_current_user)
+):
+    if start_date is None and end_date is None:
+        # Whole-history summaries come straight from the monthly rollups
+        facets = summarize_rollups(await load_rollups(db.expense_rollups, user_id))
+    else:
+        pipeline = build_summary_pipeline(user_id, start_date, end_date)
+        result = await db.expenses.aggregate(pipeline).to_list(1)
+        facets = result[0] if result else {}
+    
+    totals = facets.get('totals') or [{}]
+    return ExpenseSummary(
+        total_amount=round(totals[0].get('total_amount', 0.0), 2),
+        expense_count=totals[0].get('expense_count', 0),
+        ai_categorized_count=totals[0].get('ai_categorized_count', 0),
+        by_category=[
+            CategorySummary(category=row['_id'], total=round(row['total'], 2), count=row['count'])
+            for row in facets.get('by_category', [])
+        ],
+        by_month=[
+            MonthlySummary(month=row['_id'], total=round(row['total'], 2), count=row['count'])
+            for row in facets.get('by_month', [])
+        ]
+    )
+
+@api_router.get("/expenses/trends", response_model=List[TrendBucket])
+async def get_expense_trends(
+    months: int = Query(12, ge=1, le=120),
+    user_id: str = Depends(get_current_user)
+):
+    """Monthly totals per category for the last `months` months, read from the rollups"""
+    now = datetime.now(timezone.utc)
+    index = now.year * 12 + now.month - 1 - (months - 1)
+    start_month = f"{index // 12:04d}-{index % 12 + 1:02d}"
+    rows = await load_rollups(db.expense_rollups, user_id, start_month=start_month)
+    return [
+        TrendBucket(month=row['month'], category=row['category'], total=round(row['total'], 2), count=row['count'])
+        for row in rows
+    ]
+
+@api_router.get("/forecasts", response_model=SpendingForecast)
+async def get_spending_forecast(user_id: str = Depends(get_current_user)):
+    """Projected month-end and next-month spending per category, as saved by the forecast job"""
+    return await forecast_engine.get(user_id)
+
+@api_router.get("/categories")
+async def get_categories():
+    return {"categories": PREDEFINED_CATEGORIES}
+
+# ============= Budget & Alert Routes =============
+
+@api_router.get("/budgets", response_model=List[Budget])
+async def get_budgets(user_id: str = Depends(get_current_user)):
+    return await db.budgets.find({"user_id": user_id}, {"_id": 0, "user_id": 0}).sort("category", 1).to_list(None)
+
+@api_router.put("/budgets/{category}", response_model=Budget)
+async def set_budget(category: str, budget_data: BudgetUpdate, user_id: str = Depends(get_current_user)):
+    budget = Budget(category=category, monthly_limit=budget_data.monthly_limit, updated_at=datetime.now(timezone.utc))
+    await db.budgets.update_one(
+        {"user_id": user_id, "category": category},
+        {"$set": budget.model_dump()},
+        upsert=True
+    )
+    return budget
+
+@api_router.delete("/budgets/{category}")
+async def delete_budget(category: str, user_id: str = Depends(get_current_user)):
+    result = await db.budgets.delete_one({"user_id": user_id, "category": category})
+    if result.deleted_count == 0:
+        raise HTTPException(status_code=404, detail="Budget not found")
+    return {"message": "Budget deleted successfully"}
+
+@api_router.get("/alerts", response_model=List[Alert])
+async def get_alerts(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    alert_type: Optional[str] = Query(None, alias="type", pattern="^(budget|anomaly)$"),
+    category: Optional[str] = None,
+    user_id: str = Depends(get_current_user)
+):
+    query = {"user_id": user_id}
+    if alert_type:
+        query['type'] = alert_type
+    if category:
+        query['category'] = category
+    if cursor:
+        last_created, last_id = decode_cursor(cursor)
+        query = {"$and": [query, build_keyset_filter("created_at", last_created, last_id)]}
+    
+    alerts = await db.expense_alerts.find(query, {"_id": 0}).sort(
+        [("created_at", -1), ("id", -1)]
+    ).limit(limit + 1).to_list(limit + 1)
+    
+    if len(alerts) > limit:
+        alerts = alerts[:limit]
+        response.headers['X-Next-Cursor'] = encode_cursor(alerts[-1]['created_at'], alerts[-1]['id'])
+    return alerts
+
+# ============= Health Check =============
+
+# Operational stats, outside the client rate limit and behind the metrics token
+metrics_router = APIRouter(prefix="/api/metrics", dependencies=[Depends(require_metrics_token)])
+
+@metrics_router.get("/password-hashing")
+async def get_password_hashing_metrics():
+    return password_hasher.stats()
+
+@metrics_router.get("/auth-cache")
+async def get_auth_cache_metrics():
+    return token_cache.stats()
+
+@metrics_router.get("/alerts")
+async def get_alert_metrics():
+    return spending_monitor.stats()
+
+@metrics_router.get("/categorizer")
+async def get_categorizer_metrics():
+    return expense_categorizer.stats()
+
+@metrics_router.get("/forecasts")
+async def get_forecast_metrics():
+    return forecast_engine.stats()
+
+@metrics_router.get("/search-index")
+async def get_search_index_metrics():
+    return search_index.stats()
+
+@metrics_router.get("/rate-limits")
+async def get_rate_limit_metrics():
+    return {"limits": rate_limiter.stats(), "upstream": llm_gate.stats()}
+
+@metrics_router.get("/llm-breaker")
+async def llm_breaker_metrics():
+    return llm_breaker.stats()
+
+@metrics_router.get("/workers")
+async def get_worker_metrics():
+    return {
+        "worker_id": worker_registry.worker_id,
+        "pid": os.getpid(),
+        "workers_per_host": WORKERS,
+        "shared_caches": SHARED_CACHES,
+        "live_workers": await worker_registry.live_workers(),
+        "cache_events": event_bus.stats(),
+    }
+
+@api_router.get("/")
+async def root():
+    return {"message": "SmartSpendAI API", "status": "running"}
+
+# Include the router in the main app; every API call spends from the client's general budget
+app.include_router(api_router, dependencies=[Depends(api_rate_limit)])
+app.include_router(metrics_router)
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_credentials=True,
+    allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
+    allow_methods=["*"],
+    allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Search-Mode", "Retry-After"],
+)
+instrumentation.install(app)
+
+# Existing JSON stats are also exported as gauges
+instrumentation.registry.register_collector("password_hashing", password_hasher.stats)
+instrumentation.registry.register_collector("token_cache", token_cache.stats)
+instrumentation.registry.register_collector("categorizer", expense_categorizer.stats)
+instrumentation.registry.register_collector("cache_events", event_bus.stats)
+instrumentation.registry.register_collector("spending_alerts", spending_monitor.stats)
+instrumentation.registry.register_collector("search_index", search_index.stats)
+instrumentation.registry.register_collector("forecasts", forecast_engine.stats)
+instrumentation.registry.register_collector("rate_limits", rate_limiter.stats)
+instrumentation.registry.register_collector("llm_upstream", llm_gate.stats)
+instrumentation.registry.register_collector("llm_breaker", llm_breaker.stats)
+
+@app.get("/metrics", include_in_schema=False, dependencies=[Depends(require_metrics_token)])
+async def prometheus_metrics():
+    return Response(content=instrumentation.render(), media_type=METRICS_CONTENT_TYPE)
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+def main(command: List[str]):
+    """One-off maintenance, run through launcher.py: migrate-dates | rebuild-rollups | verify-rollups |
+    backfill-alerts [user_id] | forecast [--all]"""
+    if command == ["migrate-dates"]:
+        asyncio.run(run_date_migration())
+        resources.close()
+    elif command in (["rebuild-rollups"], ["verify-rollups"]):
+        report = asyncio.run(run_rollup_rebuild(repair=command[0] == "rebuild-rollups"))
+        resources.close()
+        drift = report["missing"] + report["mismatched"] + report["extra"]
+        sys.exit(1 if drift and command[0] == "verify-rollups" else 0)
+    elif command[:1] == ["backfill-alerts"] and len(command) <= 2:
+        asyncio.run(run_alert_backfill(command[1] if len(command) == 2 else None))
+        resources.close()
+    elif command in (["forecast"], ["forecast", "--all"]):
+        asyncio.run(run_forecasts(full=command[1:] == ["--all"]))
+        resources.close()
+    else:
+        print("Usage: python launcher.py serve [--workers N] [--host HOST] [--port PORT] | migrate-dates | "
+              "rebuild-rollups | verify-rollups | backfill-alerts [user_id] | forecast [--all]")
@@ -16,6 +16,8 @@ const API = `${BACKEND_URL}/api`;
 
 const Dashboard = ({ onLogout }) => {
   const [expenses, setExpenses] = useState([]);
+  const [summary, setSummary] = useState(null);
+  const [nextCursor, setNextCursor] = useState(null);
   const [categories, setCategories] = useState([]);
   const [isAddDialogOpen, setIsAddDialogOpen] = useState(false);
   const [isEditDialogOpen, setIsEditDialogOpen] = useState(false);
@@ -35,20 +37,34 @@ const Dashboard = ({ onLogout }) => {
 
   useEffect(() => {
     fetchExpenses();
+    fetchSummary();
     fetchCategories();
   }, []);
 
-  const fetchExpenses = async () => {
+  const fetchExpenses = async (cursor = null) => {
     try {
       const response = await axios.get(`${API}/expenses`, {
         headers: { Authorization: `Bearer ${token}` },
+        params: cursor ? { cursor } : {},
       });
-      setExpenses(response.data);
+      setExpenses((prev) => (cursor ? [...prev, ...response.data] : response.data));
+      setNextCursor(response.headers['x-next-cursor'] || null);
     } catch (err) {
       console.error('Error fetching expenses:', err);
     }
   };
 
+  const fetchSummary = async () => {
+    try {
+      const response = await axios.get(`${API}/expenses/summary`, {
+        headers: { Authorization: `Bearer ${token}` },
+      });
+      setSummary(response.data);
+    } catch (err) {
+      console.error('Error fetching summary:', err);
+    }
+  };
+
   const fetchCategories = async () => {
     try {
       const response = await axios.get(`${API}/categories`);
@@ -76,7 +92,7 @@ const Dashboard = ({ onLogout }) => {
         { headers: { Authorization: `Bearer ${token}` } }
       );
 
-      await fetchExpenses();
+      await Promise.all([fetchExpenses(), fetchSummary()]);
       setIsAddDialogOpen(false);
       resetForm();
     } catch (err) {
@@ -103,7 +119,7 @@ const Dashboard = ({ onLogout }) => {
         { headers: { Authorization: `Bearer ${token}` } }
       );
 
-      await fetchExpenses();
+      await Promise.all([fetchExpenses(), fetchSummary()]);
       setIsEditDialogOpen(false);
       resetForm();
       setEditingExpense(null);
@@ -121,7 +137,7 @@ const Dashboard = ({ onLogout }) => {
       await axios.delete(`${API}/expenses/${expenseId}`, {
         headers: { Authorization: `Bearer ${token}` },
       });
-      await fetchExpenses();
+      await Promise.all([fetchExpenses(), fetchSummary()]);
     } catch (err) {
       alert('Failed to delete expense');
     }
@@ -145,12 +161,10 @@ const Dashboard = ({ onLogout }) => {
     setError('');
   };
 
-  const totalExpenses = expenses.reduce((sum, exp) => sum + exp.amount, 0);
-  const categoryBreakdown = expenses.reduce((acc, exp) => {
-    acc[exp.category] = (acc[exp.category] || 0) + exp.amount;
-    return acc;
-  }, {});
-  const topCategory = Object.entries(categoryBreakdown).sort((a, b) => b[1] - a[1])[0];
+  const totalExpenses = summary?.total_amount || 0;
+  const expenseCount = summary?.expense_count || 0;
+  const topCategory = summary?.by_category?.[0];
+  const aiCategorizedCount = summary?.ai_categorized_count || 0;
 
   return (
     <div className="min-h-screen bg-gradient-to-br from-slate-900 via-purple-900 to-slate-900">
@@ -194,7 +208,7 @@ const Dashboard = ({ onLogout }) => {
             </CardHeader>
             <CardContent>
               <div className="text-2xl font-bold text-white" data-testid="total-expenses-amount">${totalExpenses.toFixed(2)}</div>
-              <p className="text-xs text-gray-400 mt-1">{expenses.length} transactions</p>
+              <p className="text-xs text-gray-400 mt-1">{expenseCount} transactions</p>
             </CardContent>
           </Card>
 
@@ -204,8 +218,8 @@ const Dashboard = ({ onLogout }) => {
               <TrendingUp className="h-4 w-4 text-purple-400" />
             </CardHeader>
             <CardContent>
-              <div className="text-2xl font-bold text-white" data-testid="top-category-name">{topCategory?.[0] || 'N/A'}</div>
-              <p className="text-xs text-gray-400 mt-1">{topCategory ? `$${topCategory[1].toFixed(2)}` : '$0.00'}</p>
+              <div className="text-2xl font-bold text-white" data-testid="top-category-name">{topCategory?.category || 'N/A'}</div>
+              <p className="text-xs text-gray-400 mt-1">{topCategory ? `$${topCategory.total.toFixed(2)}` : '$0.00'}</p>
             </CardContent>
           </Card>
 
@@ -216,7 +230,7 @@ const Dashboard = ({ onLogout }) => {
             </CardHeader>
             <CardContent>
               <div className="text-2xl font-bold text-white" data-testid="ai-categorized-count">
-                {expenses.filter((e) => e.ai_categorized).length}
+                {aiCategorizedCount}
               </div>
               <p className="text-xs text-gray-400 mt-1">Smart categorization</p>
             </CardContent>
@@ -399,6 +413,18 @@ const Dashboard = ({ onLogout }) => {
                     ))}
                   </TableBody>
                 </Table>
+                {nextCursor && (
+                  <div className="flex justify-center mt-4">
+                    <Button
+                      variant="ghost"
+                      className="text-gray-300 hover:text-white hover:bg-slate-700"
+                      onClick={() => fetchExpenses(nextCursor)}
+                      data-testid="load-more-expenses"
+                    >
+                      Load more
+                    </Button>
+                  </div>
+                )}
               </div>
             )}
           </CardContent>
@@ -0,0 +1,98 @@
+"""Micro-benchmark for the auth hot path caches.
+
+Replays a request mix in which a pool of users each send several requests
+with the same bearer token, and reports the token cache hit rate plus the
+per-request latency of a plain `jwt.decode` against the cached lookup.
+
+    python benchmarks/bench_auth_cache.py --users 500 --requests 20000
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+
+import jwt
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "HeartDiseasePrediction" / "backend"))
+from auth_cache import VerifiedTokenCache, UserProfileCache  # noqa: E402
+
+SECRET = "benchmark-secret"
+ALGORITHM = "HS256"
+
+
+def make_tokens(users: int):
+    expiration = datetime.now(timezone.utc) + timedelta(hours=1)
+    return [
+        jwt.encode({"user_id": f"user-{i}", "exp": expiration}, SECRET, algorithm=ALGORITHM)
+        for i in range(users)
+    ]
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def summarize(samples):
+    return {
+        "mean_us": round(statistics.fmean(samples) * 1e6, 2),
+        "p50_us": round(percentile(samples, 0.50) * 1e6, 2),
+        "p99_us": round(percentile(samples, 0.99) * 1e6, 2),
+    }
+
+
+def decode_only(tokens):
+    samples = []
+    for token in tokens:
+        start = time.perf_counter()
+        jwt.decode(token, SECRET, algorithms=[ALGORITHM])
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def cached(tokens, token_cache, profile_cache):
+    samples = []
+    for token in tokens:
+        start = time.perf_counter()
+        user_id = token_cache.get(token)
+        if user_id is None:
+            payload = jwt.decode(token, SECRET, algorithms=[ALGORITHM])
+            user_id = payload["user_id"]
+            token_cache.put(token, user_id, payload["exp"])
+        if profile_cache.get(user_id) is None:
+            profile_cache.put(user_id, {"id": user_id})
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--cache-size", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    tokens = make_tokens(args.users)
+    workload = [random.choice(tokens) for _ in range(args.requests)]
+
+    token_cache = VerifiedTokenCache(args.cache_size)
+    profile_cache = UserProfileCache(args.cache_size)
+    results = {
+        "users": args.users,
+        "requests": args.requests,
+        "decode_only": summarize(decode_only(workload)),
+        "cached": summarize(cached(workload, token_cache, profile_cache)),
+        "token_cache": token_cache.stats(),
+        "profile_cache": profile_cache.stats(),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
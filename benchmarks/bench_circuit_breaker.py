@@ -0,0 +1,117 @@
+"""Drive a backend through an upstream outage and back.
+
+Runs the LLM-backed scenario three times against the stub: healthy, with
+faults injected (every call failing, or hanging with --fault hang), and
+again once the breaker's open period has passed and the stub is healthy.
+Each phase reports latency, upstream calls, how many answers were
+degraded and the breaker's state afterwards. Heart predictions say so
+themselves (`degraded`); every expense in the workload is new and needs
+the model, so for SmartSpend it is the requests answered without an
+upstream call.
+
+    python benchmarks/bench_circuit_breaker.py --backend heart --fault errors
+    python benchmarks/bench_circuit_breaker.py --backend smartspend --fault hang --hang-ms 30000
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+from harness import METRICS_TOKEN, app_client, load_backend, run_workload
+from scenarios import SCENARIOS, BenchState
+from stub_llm import StubLlmServer
+
+WORKLOADS = {"heart": "prediction_burst", "smartspend": "ai_categorization"}
+
+
+async def run_phase(client, backend: str, state: BenchState, opts, stub: StubLlmServer) -> dict:
+    operations = await SCENARIOS[backend][WORKLOADS[backend]](client, state, opts)
+    flagged = []
+
+    def counted(operation):
+        async def wrapper(client):
+            response = await operation(client)
+            if response.status_code == 200 and response.json().get("degraded"):
+                flagged.append(response)
+            return response
+        return wrapper
+
+    before = stub.requests
+    result = await run_workload(client, [counted(operation) for operation in operations], opts.concurrency)
+    result["llm_requests"] = stub.requests - before
+    result["degraded"] = len(flagged) if backend == "heart" else result["requests"] - result["llm_requests"]
+    result["breaker"] = (await client.get(
+        "/api/metrics/llm-breaker", headers={"Authorization": f"Bearer {METRICS_TOKEN}"})).json()
+    return result
+
+
+async def bench(args) -> dict:
+    stub = StubLlmServer(args.llm_latency_ms, args.llm_jitter_ms)
+    await stub.start()
+    # Keep the per-user LLM budget out of the way; this measures the upstream, not the client
+    os.environ.update({
+        "RATE_LIMIT_ENABLED": "false",
+        "LLM_BREAKER_WINDOW_SECONDS": str(args.window_seconds),
+        "LLM_BREAKER_MIN_CALLS": str(args.min_calls),
+        "LLM_BREAKER_OPEN_SECONDS": str(args.open_seconds),
+        "LLM_TIMEOUT_SECONDS": str(args.llm_timeout),
+    })
+    try:
+        server = load_backend(args.backend, stub.url)
+        state = BenchState()
+        opts = SimpleNamespace(users=args.users, predictions=args.requests, concurrency=args.concurrency)
+        results = {}
+        async with app_client(server.app) as client:
+            for operation in await SCENARIOS[args.backend]["signup_storm"](client, state, opts):
+                await operation(client)
+
+            phases = [
+                ("healthy", {}),
+                ("fault", {"error_rate": 1.0} if args.fault == "errors" else {"slow_rate": 1.0, "slow_ms": args.hang_ms}),
+                ("recovered", {}),
+            ]
+            for name, faults in phases:
+                if name == "recovered":
+                    # Let the open period run out so the next call is the half-open probe
+                    await asyncio.sleep(args.open_seconds)
+                stub.inject(**faults)
+                result = await run_phase(client, args.backend, state, opts, stub)
+                results[name] = result
+                print(f"{args.backend}/{name}: p50 {result['latency_ms'].get('p50')} ms, "
+                      f"p99 {result['latency_ms'].get('p99')} ms, degraded {result['degraded']}/{result['requests']}, "
+                      f"upstream calls {result['llm_requests']}, breaker {result['breaker']['state']}",
+                      file=sys.stderr)
+        return {args.backend: results}
+    finally:
+        await stub.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the LLM circuit breaker through an injected outage")
+    parser.add_argument("--backend", choices=list(WORKLOADS), default="heart")
+    parser.add_argument("--fault", choices=["errors", "hang"], default="errors")
+    parser.add_argument("--hang-ms", type=float, default=30000)
+    parser.add_argument("--requests", type=int, default=200, help="Requests per phase")
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--llm-latency-ms", type=float, default=200)
+    parser.add_argument("--llm-jitter-ms", type=float, default=50)
+    parser.add_argument("--llm-timeout", type=float, default=60)
+    parser.add_argument("--window-seconds", type=float, default=10)
+    parser.add_argument("--min-calls", type=int, default=10)
+    parser.add_argument("--open-seconds", type=float, default=5)
+    parser.add_argument("--output", help="Write the results as JSON")
+    args = parser.parse_args()
+
+    results = asyncio.run(bench(args))
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump(results, handle, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""Micro-benchmark for list endpoint serialization.
+
+Compares, for the same synthetic Mongo documents, the response_model path
+(full documents, date fix-ups in Python, then FastAPI validating and
+encoding every row through the route's response model) with the one-pass
+encoding of projected rows that `/api/expenses` and `/api/predictions`
+now use. Both outputs are decoded and compared before timing.
+
+    python benchmarks/bench_list_serialization.py --rows 1000 10000 100000
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+
+from harness import load_backend
+
+ROUTES = {"heart": "/api/predictions", "smartspend": "/api/expenses"}
+LOOP = asyncio.new_event_loop()
+
+
+def expense_docs(count: int, rng: random.Random) -> list:
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "user_id": "user-1",
+            "description": f"Merchant {rng.randrange(500)} purchase",
+            "amount": round(rng.uniform(1, 500), 2),
+            "category": rng.choice(["Food & Dining", "Transportation", "Shopping", "Bills & Utilities"]),
+            "date": start + timedelta(minutes=rng.randrange(525600)),
+            "created_at": start + timedelta(minutes=rng.randrange(525600)),
+            "ai_categorized": rng.random() < 0.3,
+        }
+        for _ in range(count)
+    ]
+
+
+def prediction_docs(count: int, rng: random.Random) -> list:
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "user_id": "user-1",
+            "health_data": {
+                "age": rng.randint(30, 79), "gender": rng.choice(["male", "female"]),
+                "blood_pressure_systolic": rng.randint(100, 180), "blood_pressure_diastolic": rng.randint(60, 110),
+                "cholesterol_total": rng.randint(150, 300), "cholesterol_ldl": None, "cholesterol_hdl": rng.randint(30, 80),
+                "smoking": "never", "diabetes": "no", "family_history": "no", "bmi": round(rng.uniform(18, 35), 1),
+                "exercise_frequency": "3-4 days/week", "ecg_data": None, "stress_level": "moderate", "diet_quality": "good",
+            },
+            "risk_assessment": "Moderate cardiovascular risk driven mainly by blood pressure. " * 4,
+            "recommendations": "- Reduce sodium intake\n- Exercise 150 minutes a week\n" * 3,
+            "risk_score": {
+                "ten_year_risk": 0.083, "risk_percent": 8.3, "risk_level": "Moderate", "model": "framingham",
+                "factors": [{"factor": "Age", "value": "55 years", "relative_risk": 2.1, "modifiable": False}],
+            },
+            "batch_id": None,
+            "created_at": start + timedelta(minutes=rng.randrange(525600)),
+        }
+        for _ in range(count)
+    ]
+
+
+def response_model_path(server, backend: str, docs: list) -> bytes:
+    """What the endpoints did before: fix up dates, then let FastAPI validate and encode"""
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+
+    route = next(r for r in server.app.routes if getattr(r, "path", None) == ROUTES[backend] and "GET" in r.methods)
+    rows = [dict(doc) for doc in docs]
+    if backend == "smartspend":
+        for row in rows:
+            if isinstance(row['date'], datetime):
+                row['date'] = row['date'].isoformat()
+    content = LOOP.run_until_complete(serialize_response(field=route.response_field, response_content=rows))
+    return JSONResponse(content).body
+
+
+def fast_path(server, backend: str, docs: list) -> tuple:
+    if backend == "smartspend":
+        projection, adapter = server.EXPENSE_ROW_PROJECTION, server.expense_rows
+    else:
+        projection, adapter = server.PREDICTION_ROW_PROJECTION, server.prediction_rows
+    # Mongo applies the projection server-side; mimic it outside the timed section
+    rows = [{field: doc[field] for field in projection if field in doc} for doc in docs]
+    start = time.perf_counter()
+    body = server.json_rows(adapter, rows).body
+    return body, time.perf_counter() - start
+
+
+def normalized(body: bytes) -> list:
+    def fix(value):
+        if isinstance(value, dict):
+            return {key: fix(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [fix(item) for item in value]
+        if isinstance(value, str) and len(value) >= 20 and value[10:11] == "T":
+            try:
+                return datetime.fromisoformat(value.replace("Z", "+00:00"))
+            except ValueError:
+                return value
+        return value
+    return fix(json.loads(body))
+
+
+def bench_backend(backend: str, sizes: list, repeat: int, seed: int) -> dict:
+    server = load_backend(backend, llm_url="http://127.0.0.1:9/unused")
+    rng = random.Random(seed)
+    make = expense_docs if backend == "smartspend" else prediction_docs
+    results = {}
+    for size in sizes:
+        docs = make(size, rng)
+        baseline_body = response_model_path(server, backend, docs)
+        fast_body, _ = fast_path(server, backend, docs)
+        if normalized(baseline_body) != normalized(fast_body):
+            raise SystemExit(f"{backend}: fast path output differs from response_model output at {size} rows")
+
+        baseline, fast = [], []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            response_model_path(server, backend, docs)
+            baseline.append(time.perf_counter() - start)
+            fast.append(fast_path(server, backend, docs)[1])
+        baseline_ms = statistics.median(baseline) * 1000
+        fast_ms = statistics.median(fast) * 1000
+        results[str(size)] = {
+            "response_model_ms": round(baseline_ms, 2),
+            "fast_path_ms": round(fast_ms, 2),
+            "speedup": round(baseline_ms / fast_ms, 1) if fast_ms else None,
+            "bytes": len(fast_body),
+        }
+        print(f"{backend} {size:>7} rows: response_model {baseline_ms:9.2f} ms, "
+              f"fast path {fast_ms:8.2f} ms ({results[str(size)]['speedup']}x)", file=sys.stderr)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare list endpoint serialization paths")
+    parser.add_argument("--backend", choices=["all", *ROUTES], default="all")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", type=Path, help="Write the results as JSON")
+    args = parser.parse_args()
+
+    if args.backend == "all":
+        # Both backends are flat `server` modules, so each gets its own process
+        results = {}
+        for backend in ROUTES:
+            with tempfile.TemporaryDirectory() as tmp:
+                output = Path(tmp) / "result.json"
+                command = [sys.executable, __file__, "--backend", backend, "--repeat", str(args.repeat),
+                           "--seed", str(args.seed), "--output", str(output), "--rows", *map(str, args.rows)]
+                subprocess.run(command, check=True)
+                results.update(json.loads(output.read_text()))
+    else:
+        results = {args.backend: bench_backend(args.backend, args.rows, args.repeat, args.seed)}
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+    else:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
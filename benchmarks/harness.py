@@ -0,0 +1,171 @@
+"""Shared plumbing for the load tests: booting a backend in-process,
+driving requests through its ASGI app and collecting latency samples.
+"""
+import asyncio
+import importlib
+import os
+import statistics
+import sys
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Awaitable, Callable, List, Optional
+
+import httpx
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+BACKEND_DIRS = {
+    "heart": REPO_ROOT / "HeartDiseasePrediction" / "backend",
+    "smartspend": REPO_ROOT / "SmartSpendAI - Expense Tracking and Management System" / "backend",
+}
+# Metrics endpoints answer only to this bearer token
+METRICS_TOKEN = "benchmark-metrics-token"
+
+
+def use_mongo_stand_in():
+    """Point Motor at mongomock-motor so no mongod is needed"""
+    import motor.motor_asyncio
+    from mongomock_motor import AsyncMongoMockClient
+
+    motor.motor_asyncio.AsyncIOMotorClient = AsyncMongoMockClient
+
+
+class StubLlmChat:
+    """Drop-in for emergentintegrations' LlmChat that talks to the stub server.
+
+    emergentintegrations has no endpoint override, so SmartSpendAI's
+    categorization calls are routed here instead.
+    """
+
+    url: Optional[str] = None
+
+    def __init__(self, api_key=None, session_id=None, system_message=""):
+        self.system_message = system_message
+
+    def with_model(self, provider, model):
+        return self
+
+    async def send_message(self, user_message) -> str:
+        async with httpx.AsyncClient(timeout=60) as client:
+            response = await client.post(self.url, json={"messages": [
+                {"role": "system", "content": self.system_message},
+                {"role": "user", "content": user_message.text},
+            ]})
+            response.raise_for_status()
+            return response.json()["choices"][0]["message"]["content"]
+
+
+def load_backend(name: str, llm_url: str, mongo_url: Optional[str] = None, bcrypt_rounds: int = 10):
+    """Import a backend's server module configured for benchmarking.
+
+    Both backends are flat `server` modules, so only one can be loaded per
+    process; run.py starts a subprocess per backend.
+    """
+    if mongo_url is None:
+        use_mongo_stand_in()
+    os.environ.update({
+        "MONGO_URL": mongo_url or "mongodb://stand-in:27017",
+        "DB_NAME": f"benchmark_{name}_{int(time.time())}",
+        "JWT_SECRET": "benchmark-secret",
+        "METRICS_TOKEN": METRICS_TOKEN,
+        "EMERGENT_LLM_KEY": "benchmark-key",
+        "LLM_API_URL": llm_url,
+        "BCRYPT_ROUNDS": str(bcrypt_rounds),
+    })
+    sys.path.insert(0, str(BACKEND_DIRS[name]))
+    server = importlib.import_module("server")
+    if name == "smartspend":
+        StubLlmChat.url = llm_url
+        server.LlmChat = StubLlmChat
+    return server
+
+
+@asynccontextmanager
+async def app_client(app):
+    """Run the app's startup/shutdown hooks around an in-process HTTP client"""
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=120) as client:
+            yield client
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def latency_summary(samples: List[float]) -> dict:
+    if not samples:
+        return {}
+    return {
+        "mean": round(statistics.fmean(samples) * 1000, 3),
+        "p50": round(percentile(samples, 0.50) * 1000, 3),
+        "p95": round(percentile(samples, 0.95) * 1000, 3),
+        "p99": round(percentile(samples, 0.99) * 1000, 3),
+        "max": round(max(samples) * 1000, 3),
+    }
+
+
+class LoopLagMonitor:
+    """Samples how late a periodic wake-up fires, i.e. how long the loop was blocked"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task = None
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.perf_counter() - start - self.interval))
+
+    def start(self):
+        self.samples = []
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+
+
+Operation = Callable[[httpx.AsyncClient], Awaitable[httpx.Response]]
+
+
+async def run_workload(client: httpx.AsyncClient, operations: List[Operation], concurrency: int) -> dict:
+    """Run operations with at most `concurrency` in flight and summarize the run"""
+    queue: asyncio.Queue = asyncio.Queue()
+    for operation in operations:
+        queue.put_nowait(operation)
+    samples: List[float] = []
+    errors: dict = {}
+    monitor = LoopLagMonitor()
+
+    async def worker():
+        while not queue.empty():
+            operation = queue.get_nowait()
+            start = time.perf_counter()
+            try:
+                response = await operation(client)
+                failure = None if response.status_code < 400 else f"HTTP {response.status_code}"
+            except Exception as e:
+                failure = e.__class__.__name__
+            samples.append(time.perf_counter() - start)
+            if failure:
+                errors[failure] = errors.get(failure, 0) + 1
+
+    monitor.start()
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    duration = time.perf_counter() - started
+    await monitor.stop()
+
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "concurrency": concurrency,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(len(samples) / duration, 2) if duration else 0.0,
+        "latency_ms": latency_summary(samples),
+        "loop_lag_ms": latency_summary(monitor.samples),
+    }
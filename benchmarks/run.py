@@ -0,0 +1,147 @@
+"""Load-test the backends in-process and save the results as JSON.
+
+Each backend's FastAPI app is driven through an in-process ASGI client
+against mongomock-motor (or a real mongod with --mongo-url) and a stub LLM
+server with configurable latency. Every scenario reports p50/p95/p99
+latency, throughput and event-loop lag.
+
+    pip install -r benchmarks/requirements.txt
+    python benchmarks/run.py --backend all --llm-latency-ms 800
+    python benchmarks/run.py --backend heart --scenario prediction_burst --compare benchmarks/results/base.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+
+from harness import REPO_ROOT, app_client, load_backend, run_workload
+from scenarios import SCENARIOS, BenchState
+from stub_llm import StubLlmServer
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+COMPARED_METRICS = (("latency_ms", "p50"), ("latency_ms", "p95"), ("latency_ms", "p99"), ("loop_lag_ms", "p99"))
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def run_backend(args) -> dict:
+    stub = StubLlmServer(args.llm_latency_ms, args.llm_jitter_ms)
+    await stub.start()
+    try:
+        server = load_backend(args.backend, stub.url, args.mongo_url, args.bcrypt_rounds)
+        names = args.scenario or list(SCENARIOS[args.backend])
+        state = BenchState()
+        results = {}
+        async with app_client(server.app) as client:
+            for name in names:
+                builder = SCENARIOS[args.backend][name]
+                operations = await builder(client, state, args)
+                llm_before = stub.requests
+                result = await run_workload(client, operations, args.concurrency)
+                result["llm_requests"] = stub.requests - llm_before
+                results[name] = result
+                print(f"{args.backend}/{name}: {result['requests']} requests, "
+                      f"p95 {result['latency_ms'].get('p95')} ms, {result['throughput_rps']} req/s, "
+                      f"errors {sum(result['errors'].values())}", file=sys.stderr)
+        return {args.backend: results}
+    finally:
+        await stub.stop()
+
+
+def run_all(args) -> dict:
+    """Both backends are flat `server` modules, so each gets its own process"""
+    backends = {}
+    for backend in SCENARIOS:
+        with tempfile.TemporaryDirectory() as tmp:
+            output = Path(tmp) / "result.json"
+            command = [sys.executable, __file__, "--backend", backend, "--output", str(output)]
+            for option in ("users", "requests", "predictions", "seed_expenses", "concurrency",
+                           "llm_latency_ms", "llm_jitter_ms", "bcrypt_rounds", "seed", "mongo_url"):
+                value = getattr(args, option)
+                if value is not None:
+                    command += [f"--{option.replace('_', '-')}", str(value)]
+            subprocess.run(command, check=True)
+            backends.update(json.loads(output.read_text())["backends"])
+    return backends
+
+
+def compare(current: dict, baseline: dict):
+    print(f"\nCompared with {baseline.get('commit')} ({baseline.get('timestamp')}):")
+    for backend, scenarios in current["backends"].items():
+        for name, result in scenarios.items():
+            previous = baseline.get("backends", {}).get(backend, {}).get(name)
+            if not previous:
+                continue
+            changes = []
+            for group, metric in COMPARED_METRICS:
+                old, new = previous.get(group, {}).get(metric), result.get(group, {}).get(metric)
+                if old and new is not None:
+                    changes.append(f"{group.split('_')[0]} {metric} {(new - old) / old:+.1%}")
+            old_rps = previous.get("throughput_rps")
+            if old_rps:
+                changes.append(f"throughput {(result['throughput_rps'] - old_rps) / old_rps:+.1%}")
+            print(f"  {backend}/{name}: " + ", ".join(changes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the backends in-process")
+    parser.add_argument("--backend", choices=["all", *SCENARIOS], default="all")
+    parser.add_argument("--scenario", action="append", help="Scenario name; repeatable. Defaults to all for the backend")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=1000, help="Requests per read/CRUD scenario")
+    parser.add_argument("--predictions", type=int, default=100, help="Requests per LLM-backed scenario")
+    parser.add_argument("--seed-expenses", type=int, default=20, help="Untimed expenses created per user")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--llm-latency-ms", type=float, default=500)
+    parser.add_argument("--llm-jitter-ms", type=float, default=100)
+    parser.add_argument("--bcrypt-rounds", type=int, default=10)
+    parser.add_argument("--mongo-url", help="Use a real mongod instead of mongomock-motor")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/<timestamp>-<commit>.json)")
+    parser.add_argument("--compare", help="Previous result file to diff against")
+    args = parser.parse_args()
+
+    if args.scenario and args.backend == "all":
+        parser.error("--scenario requires a specific --backend")
+    for name in args.scenario or []:
+        if name not in SCENARIOS[args.backend]:
+            parser.error(f"Unknown scenario '{name}' for {args.backend}: choose from {', '.join(SCENARIOS[args.backend])}")
+
+    random.seed(args.seed)
+    now = datetime.now(timezone.utc)
+    commit = git_commit()
+    backends = run_all(args) if args.backend == "all" else asyncio.run(run_backend(args))
+    report = {
+        "commit": commit,
+        "timestamp": now.isoformat(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "backends": backends,
+    }
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{now:%Y%m%dT%H%M%S}-{commit}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"Results written to {output}", file=sys.stderr)
+
+    if args.compare:
+        compare(report, json.loads(Path(args.compare).read_text()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""Request mixes for each backend.
+
+A scenario builder receives the client, a shared `BenchState` and the run
+options, performs any untimed setup, and returns the list of operations
+to time. Scenarios run in the order listed, so later ones can reuse the
+accounts created by `signup_storm`.
+"""
+import random
+import uuid
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List
+
+from harness import Operation
+
+PASSWORD = "benchmark-password"
+
+HEART_PROFILE = {
+    "age": 54,
+    "gender": "male",
+    "blood_pressure_systolic": 142,
+    "blood_pressure_diastolic": 91,
+    "cholesterol_total": 232,
+    "cholesterol_ldl": 151,
+    "cholesterol_hdl": 41,
+    "smoking": "former",
+    "diabetes": "no",
+    "family_history": "yes",
+    "bmi": 27.4,
+    "exercise_frequency": "1-2 times per week",
+    "stress_level": "moderate",
+    "diet_quality": "average",
+}
+
+EXPENSE_DESCRIPTIONS = [
+    "Starbucks coffee", "Uber ride downtown", "Whole Foods groceries", "Netflix subscription",
+    "Shell gas station", "Amazon order", "Electricity bill", "Pharmacy prescription",
+    "Movie tickets", "Gym membership", "Restaurant dinner", "Train ticket",
+]
+
+
+@dataclass
+class BenchState:
+    run_id: str = field(default_factory=lambda: uuid.uuid4().hex[:8])
+    users: List[dict] = field(default_factory=list)
+    expenses: Dict[str, List[str]] = field(default_factory=dict)
+
+    def email(self, index: int) -> str:
+        return f"bench-{self.run_id}-{index}@loadtest.io"
+
+    def auth(self, user: dict) -> dict:
+        return {"Authorization": f"Bearer {user['token']}"}
+
+
+def _ensure_users(state: BenchState, minimum: int):
+    if len(state.users) < minimum:
+        raise RuntimeError("Run signup_storm first (or raise --users) to create accounts")
+
+
+# ---- HeartDiseasePrediction ----------------------------------------------
+
+async def heart_signup_storm(client, state: BenchState, opts) -> List[Operation]:
+    def signup(index: int) -> Operation:
+        async def operation(client):
+            response = await client.post("/api/auth/register", json={
+                "email": state.email(index), "password": PASSWORD, "full_name": f"Bench User {index}",
+            })
+            if response.status_code == 200:
+                state.users.append({"email": state.email(index), "token": response.json()["token"]})
+            return response
+        return operation
+
+    return [signup(index) for index in range(opts.users)]
+
+
+async def heart_login_storm(client, state: BenchState, opts) -> List[Operation]:
+    _ensure_users(state, 1)
+
+    def login(user: dict) -> Operation:
+        return lambda client: client.post("/api/auth/login", json={"email": user["email"], "password": PASSWORD})
+
+    return [login(random.choice(state.users)) for _ in range(opts.requests)]
+
+
+async def heart_auth_me(client, state: BenchState, opts) -> List[Operation]:
+    _ensure_users(state, 1)
+
+    def me(user: dict) -> Operation:
+        return lambda client: client.get("/api/auth/me", headers=state.auth(user))
+
+    return [me(random.choice(state.users)) for _ in range(opts.requests)]
+
+
+def _prediction(state: BenchState, user: dict, health_data: dict, path: str = "/api/predict") -> Operation:
+    return lambda client: client.post(path, json={"health_data": health_data}, headers=state.auth(user))
+
+
+def _varied_profile() -> dict:
+    profile = dict(HEART_PROFILE)
+    profile["age"] = random.randint(30, 80)
+    profile["blood_pressure_systolic"] = random.randint(100, 180)
+    profile["cholesterol_total"] = random.randint(150, 300)
+    return profile
+
+
+async def heart_prediction_burst(client, state: BenchState, opts) -> List[Operation]:
+    """Distinct inputs, so every request reaches the (stub) LLM"""
+    _ensure_users(state, 1)
+    return [_prediction(state, random.choice(state.users), _varied_profile()) for _ in range(opts.predictions)]
+
+
+async def heart_prediction_burst_cached(client, state: BenchState, opts) -> List[Operation]:
+    """Identical inputs, exercising the prediction cache and request coalescing"""
+    _ensure_users(state, 1)
+    return [_prediction(state, random.choice(state.users), HEART_PROFILE) for _ in range(opts.predictions)]
+
+
+async def heart_prediction_stream(client, state: BenchState, opts) -> List[Operation]:
+    _ensure_users(state, 1)
+    return [
+        _prediction(state, random.choice(state.users), _varied_profile(), "/api/predict/stream")
+        for _ in range(opts.predictions)
+    ]
+
+
+async def heart_history_pages(client, state: BenchState, opts) -> List[Operation]:
+    _ensure_users(state, 1)
+
+    def history(user: dict) -> Operation:
+        return lambda client: client.get("/api/predictions", params={"limit": 20}, headers=state.auth(user))
+
+    return [history(random.choice(state.users)) for _ in range(opts.requests)]
+
+
+# ---- SmartSpendAI --------------------------------------------------------
+
+async def smartspend_signup_storm(client, state: BenchState, opts) -> List[Operation]:
+    def signup(index: int) -> Operation:
+        async def operation(client):
+            response = await client.post("/api/auth/signup", json={
+                "name": f"Bench User {index}", "email": state.email(index), "password": PASSWORD,
+            })
+            if response.status_code == 200:
+                state.users.append({"email": state.email(index), "token": response.json()["token"]})
+            return response
+        return operation
+
+    return [signup(index) for index in range(opts.users)]
+
+
+async def smartspend_login_storm(client, state: BenchState, opts) -> List[Operation]:
+    _ensure_users(state, 1)
+
+    def login(user: dict) -> Operation:
+        return lambda client: client.post("/api/auth/login", json={"email": user["email"], "password": PASSWORD})
+
+    return [login(random.choice(state.users)) for _ in range(opts.requests)]
+
+
+def _expense_payload() -> dict:
+    return {
+        "description": random.choice(EXPENSE_DESCRIPTIONS),
+        "amount": round(random.uniform(3, 250), 2),
+        "category": "Other",
+    }
+
+
+async def smartspend_expense_crud_mix(client, state: BenchState, opts) -> List[Operation]:
+    """60% list, 20% create, 10% update, 5% delete, 5% summary"""
+    _ensure_users(state, 1)
+    # Untimed seed so list/update/delete have rows to work with
+    for user in state.users:
+        ids = state.expenses.setdefault(user["email"], [])
+        for _ in range(opts.seed_expenses):
+            response = await client.post("/api/expenses", json=_expense_payload(), headers=state.auth(user))
+            if response.status_code == 200:
+                ids.append(response.json()["id"])
+
+    def list_expenses(user):
+        return lambda client: client.get("/api/expenses", params={"limit": 50}, headers=state.auth(user))
+
+    def create(user):
+        async def operation(client):
+            response = await client.post("/api/expenses", json=_expense_payload(), headers=state.auth(user))
+            if response.status_code == 200:
+                state.expenses[user["email"]].append(response.json()["id"])
+            return response
+        return operation
+
+    def update(user):
+        async def operation(client):
+            ids = state.expenses[user["email"]]
+            expense_id = random.choice(ids) if ids else "missing"
+            return await client.put(f"/api/expenses/{expense_id}", json={"amount": round(random.uniform(3, 250), 2)},
+                                    headers=state.auth(user))
+        return operation
+
+    def delete(user):
+        async def operation(client):
+            ids = state.expenses[user["email"]]
+            expense_id = ids.pop(random.randrange(len(ids))) if ids else "missing"
+            return await client.delete(f"/api/expenses/{expense_id}", headers=state.auth(user))
+        return operation
+
+    def summary(user):
+        return lambda client: client.get("/api/expenses/summary", headers=state.auth(user))
+
+    mix = [(list_expenses, 60), (create, 20), (update, 10), (delete, 5), (summary, 5)]
+    builders, weights = zip(*mix)
+    return [
+        random.choices(builders, weights)[0](random.choice(state.users))
+        for _ in range(opts.requests)
+    ]
+
+
+async def smartspend_ai_categorization(client, state: BenchState, opts) -> List[Operation]:
+    """Unseen descriptions with AI categorization on, so the LLM fallback is hit"""
+    _ensure_users(state, 1)
+
+    def create(user):
+        payload = {
+            "description": f"Unlisted merchant {uuid.uuid4().hex[:10]}",
+            "amount": round(random.uniform(3, 250), 2),
+            "use_ai_categorization": True,
+        }
+        return lambda client: client.post("/api/expenses", json=payload, headers=state.auth(user))
+
+    return [create(random.choice(state.users)) for _ in range(opts.predictions)]
+
+
+ScenarioBuilder = Callable[..., List[Operation]]
+
+SCENARIOS: Dict[str, Dict[str, ScenarioBuilder]] = {
+    "heart": {
+        "signup_storm": heart_signup_storm,
+        "login_storm": heart_login_storm,
+        "auth_me": heart_auth_me,
+        "prediction_burst": heart_prediction_burst,
+        "prediction_burst_cached": heart_prediction_burst_cached,
+        "prediction_stream": heart_prediction_stream,
+        "history_pages": heart_history_pages,
+    },
+    "smartspend": {
+        "signup_storm": smartspend_signup_storm,
+        "login_storm": smartspend_login_storm,
+        "expense_crud_mix": smartspend_expense_crud_mix,
+        "ai_categorization": smartspend_ai_categorization,
+    },
+}
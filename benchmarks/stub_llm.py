@@ -0,0 +1,121 @@
+"""OpenAI-compatible chat completions stub with configurable latency.
+
+Answers `POST /v1/chat/completions` in both the plain and the streaming
+(`"stream": true`) form. Replies are shaped for the callers in this repo:
+a "Risk Assessment ... Recommendations ..." report for heart predictions,
+a single category for one expense and a JSON array of categories for a
+numbered batch of expenses.
+
+Faults can be injected, and changed while the server runs: `error_rate` of
+requests get a 500 after the usual latency, and `slow_rate` of requests
+take `slow_ms` instead, to stand in for an upstream that hangs.
+"""
+import asyncio
+import json
+import random
+import socket
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+PREDICTION_REPLY = (
+    "Risk Assessment\n"
+    "Overall risk is moderate. Blood pressure and cholesterol are above the "
+    "recommended range, while BMI and exercise frequency are within normal limits.\n\n"
+    "Recommendations\n"
+    "1. Recheck blood pressure within four weeks.\n"
+    "2. Discuss a lipid panel and statin therapy with your physician.\n"
+    "3. Keep up regular aerobic exercise and a Mediterranean-style diet.\n"
+)
+STREAM_CHUNK_CHARS = 24
+
+
+def build_reply(messages: list) -> str:
+    text = messages[-1].get("content", "") if messages else ""
+    if text.startswith("Categorize these expenses:"):
+        count = sum(1 for line in text.splitlines()[1:] if line.strip())
+        return json.dumps(["Shopping"] * count)
+    if text.startswith("Categorize this expense"):
+        return "Shopping"
+    return PREDICTION_REPLY
+
+
+class StubLlmServer:
+    def __init__(self, latency_ms: float = 500, jitter_ms: float = 0, stream_chunk_ms: float = 10,
+                 error_rate: float = 0.0, slow_rate: float = 0.0, slow_ms: float = 0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.stream_chunk_ms = stream_chunk_ms
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.slow_ms = slow_ms
+        self.requests = 0
+        self.errors = 0
+        self.port = None
+        self._server = None
+        self._task = None
+        self.app = Starlette(routes=[Route("/v1/chat/completions", self.completions, methods=["POST"])])
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/v1/chat/completions"
+
+    def inject(self, error_rate: float = 0.0, slow_rate: float = 0.0, slow_ms: float = 0.0):
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.slow_ms = slow_ms
+
+    async def _delay(self):
+        if random.random() < self.slow_rate:
+            delay = self.slow_ms
+        else:
+            delay = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        await asyncio.sleep(max(0.0, delay) / 1000)
+
+    async def completions(self, request: Request):
+        self.requests += 1
+        body = await request.json()
+        reply = build_reply(body.get("messages", []))
+        await self._delay()
+        if random.random() < self.error_rate:
+            self.errors += 1
+            return JSONResponse({"error": {"message": "Injected upstream failure", "type": "server_error"}},
+                                status_code=500)
+
+        if not body.get("stream"):
+            return JSONResponse({
+                "id": f"stub-{self.requests}",
+                "object": "chat.completion",
+                "model": body.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+            })
+
+        async def events():
+            for start in range(0, len(reply), STREAM_CHUNK_CHARS):
+                delta = {"content": reply[start:start + STREAM_CHUNK_CHARS]}
+                yield f"data: {json.dumps({'choices': [{'index': 0, 'delta': delta}]})}\n\n"
+                await asyncio.sleep(self.stream_chunk_ms / 1000)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    async def start(self):
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            self.port = probe.getsockname()[1]
+        config = uvicorn.Config(self.app, host="127.0.0.1", port=self.port, log_level="warning", lifespan="off")
+        self._server = uvicorn.Server(config)
+        # Leave Ctrl-C to the benchmark runner rather than the embedded server
+        self._server.install_signal_handlers = lambda: None
+        self._task = asyncio.create_task(self._server.serve())
+        while not self._server.started:
+            await asyncio.sleep(0.01)
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.should_exit = True
+            await self._task
+            self._server = None
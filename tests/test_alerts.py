@@ -0,0 +1,127 @@
+"""Spending statistics: the vectorized `ewma_history` backfill agrees with the
+online `ewma_update` recurrence, and imported batches fold into the same
+statistics and alerts as expenses created one at a time.
+
+    python -m pytest tests
+"""
+import asyncio
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / "SmartSpendAI - Expense Tracking and Management System" / "backend"))
+
+from alerts import RECURRENCE_BLOCK, SpendingMonitor, ewma_history, ewma_update  # noqa: E402
+
+
+def online_history(amounts, alpha: float):
+    state, means, variances = None, [], []
+    for amount in amounts:
+        state = ewma_update(state, float(amount), alpha)
+        means.append(state["mean"])
+        variances.append(state["variance"])
+    return np.array(means), np.array(variances)
+
+
+def assert_matches_online(amounts: np.ndarray, alpha: float):
+    means, variances = ewma_history(amounts, alpha)
+    expected_means, expected_variances = online_history(amounts, alpha)
+    scale = max(1.0, float(np.abs(amounts).max()))
+    np.testing.assert_allclose(means, expected_means, rtol=1e-9, atol=1e-9 * scale)
+    np.testing.assert_allclose(variances, expected_variances, rtol=1e-9, atol=1e-9 * scale * scale)
+
+
+@pytest.mark.parametrize("alpha", [0.01, 0.05, 0.1, 0.3, 0.5, 0.9])
+@pytest.mark.parametrize("seed", range(5))
+def test_backfill_matches_repeated_updates(alpha, seed):
+    rng = np.random.default_rng(seed)
+    # Several recurrence blocks, with the warm-up ending inside the first one or not at all
+    length = int(rng.integers(1, 5 * RECURRENCE_BLOCK))
+    amounts = np.round(rng.lognormal(mean=3.5, sigma=1.2, size=length), 2)
+    assert_matches_online(amounts, alpha)
+
+
+@pytest.mark.parametrize("alpha", [0.05, 0.1, 0.5])
+def test_backfill_handles_constant_runs_and_spikes(alpha):
+    amounts = np.array([20.0] * 150 + [5000.0] + [20.0] * 80 + [0.01] * 10)
+    assert_matches_online(amounts, alpha)
+
+
+@pytest.mark.parametrize("length", [1, 2, RECURRENCE_BLOCK, RECURRENCE_BLOCK + 1])
+def test_backfill_at_block_boundaries(length):
+    amounts = np.linspace(1.0, 100.0, length)
+    for alpha in (0.02, 0.1, 0.7):
+        assert_matches_online(amounts, alpha)
+
+
+def spending_monitor() -> SpendingMonitor:
+    db = AsyncMongoMockClient()["alert_tests"]
+    return SpendingMonitor(db.expense_stats, db.spending_alerts, db.budgets, db.expense_rollups)
+
+
+def imported_expenses(seed: int) -> list:
+    rng = np.random.default_rng(seed)
+    expenses = []
+    for index in range(120):
+        category = ["Food & Dining", "Shopping", "Transportation"][index % 3]
+        amount = float(rng.lognormal(3.0, 0.4))
+        if index in (60, 61, 95):
+            amount *= 25
+        expenses.append({"id": f"e{index:03d}", "user_id": "u1", "category": category, "amount": round(amount, 2),
+                         "date": datetime(2026, 3, 1 + index % 28, tzinfo=timezone.utc)})
+    return expenses
+
+
+async def monitor_state(monitor: SpendingMonitor):
+    stats = {
+        row["category"]: (row["count"], row["mean"], row["variance"])
+        async for row in monitor.stats_collection.find({}, {"_id": 0})
+    }
+    alerts = sorted([row["dedupe_key"] async for row in monitor.alerts.find({}, {"_id": 0})])
+    return stats, alerts
+
+
+@pytest.mark.parametrize("batch_size", [1, 7, 50, 120])
+def test_imported_batches_match_single_creates(batch_size):
+    async def scenario():
+        expenses = imported_expenses(batch_size)
+        one_by_one, batched = spending_monitor(), spending_monitor()
+        for expense in expenses:
+            await one_by_one.observe(expense)
+        for start in range(0, len(expenses), batch_size):
+            await batched.observe_many(expenses[start:start + batch_size])
+
+        (stats, alerts), (batched_stats, batched_alerts) = await monitor_state(one_by_one), await monitor_state(batched)
+        assert alerts == batched_alerts
+        assert {"anomaly:e060", "anomaly:e095"} <= set(alerts)
+        assert stats.keys() == batched_stats.keys()
+        for category, values in stats.items():
+            assert batched_stats[category] == pytest.approx(values, rel=1e-12)
+        assert batched.observed == len(expenses)
+
+    asyncio.run(scenario())
+
+
+def test_an_imported_batch_checks_each_budget_once():
+    async def scenario():
+        monitor = spending_monitor()
+        await monitor.budgets.insert_one({"user_id": "u1", "category": "Shopping", "monthly_limit": 100.0})
+        # The import has already applied its rollup deltas when the monitor runs
+        await monitor.rollups.insert_one({"user_id": "u1", "month": "2026-03", "category": "Shopping",
+                                          "total": 130.0, "count": 3})
+        expenses = [
+            {"id": f"s{index}", "user_id": "u1", "category": "Shopping", "amount": 43.33,
+             "date": datetime(2026, 3, 10 + index, tzinfo=timezone.utc)}
+            for index in range(3)
+        ]
+        raised = await monitor.observe_many(expenses)
+        assert [alert["dedupe_key"] for alert in raised] == ["budget:Shopping:2026-03:1.0"]
+        assert raised[0]["expense_id"] == "s2"
+        assert await monitor.observe_many(expenses[:1]) == []
+
+    asyncio.run(scenario())
@@ -0,0 +1,118 @@
+"""Batch screening against the LLM budget: a batch runs in full or is refused whole.
+
+Drives the heart backend's /api/predict/batch in process through the
+benchmark harness (mongomock-motor and a local stub model server). The
+batch budget is lowered so a second 1k-row batch no longer fits.
+
+    python -m pytest tests
+"""
+import asyncio
+import json
+import os
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / "benchmarks"))
+
+from harness import app_client, load_backend  # noqa: E402
+from scenarios import HEART_PROFILE  # noqa: E402
+from stub_llm import StubLlmServer  # noqa: E402
+
+BATCH_BURST = 1500
+
+
+def distinct_rows(count: int) -> list:
+    """`count` profiles that render `count` different prompts"""
+    return [
+        {**HEART_PROFILE, "age": 30 + index % 50, "cholesterol_total": 150 + index // 50}
+        for index in range(count)
+    ]
+
+
+@pytest.fixture(scope="module")
+def backend():
+    """One app lifespan and stub model server for the module, on a loop the tests drive"""
+    os.environ.update({
+        "BATCH_LLM_RATE_BURST": str(BATCH_BURST),
+        # Practically no refill while the tests run
+        "BATCH_LLM_RATE_PER_HOUR": "1",
+    })
+    loop = asyncio.new_event_loop()
+    stub = StubLlmServer(latency_ms=1)
+    loop.run_until_complete(stub.start())
+    server = load_backend("heart", stub.url, bcrypt_rounds=4)
+    client_context = app_client(server.app)
+    client = loop.run_until_complete(client_context.__aenter__())
+    try:
+        yield loop, client, stub
+    finally:
+        loop.run_until_complete(client_context.__aexit__(None, None, None))
+        loop.run_until_complete(stub.stop())
+        loop.close()
+
+
+def run_as_new_user(backend, scenario):
+    loop, client, stub = backend
+
+    async def run():
+        response = await client.post("/api/auth/register", json={
+            "email": f"batch-{uuid.uuid4().hex[:8]}@example.com", "password": "batch-password",
+            "full_name": "Batch Tester",
+        })
+        headers = {"Authorization": f"Bearer {response.json()['token']}"}
+        return await scenario(client, headers, stub)
+
+    return loop.run_until_complete(run())
+
+
+def batch_lines(response) -> list:
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_a_batch_within_the_budget_runs_every_row(backend):
+    async def scenario(client, headers, stub):
+        calls = stub.requests
+        response = await client.post("/api/predict/batch", json=distinct_rows(1000), headers=headers)
+        assert response.status_code == 200
+        lines = batch_lines(response)
+        assert lines[0]["unique_prompts"] == 1000
+        results = [line for line in lines if line["type"] == "result"]
+        assert len(results) == 1000
+        assert {line["status"] for line in results} == {"completed"}
+        assert lines[-1]["completed"] == 1000 and lines[-1]["failed"] == 0
+        assert stub.requests - calls == 1000
+
+        # Single predictions spend from their own bucket, which the batch left alone
+        single = await client.post("/api/predict", json={"health_data": HEART_PROFILE}, headers=headers)
+        assert single.status_code == 200
+
+    run_as_new_user(backend, scenario)
+
+
+def test_a_batch_that_does_not_fit_is_refused_whole(backend):
+    async def scenario(client, headers, stub):
+        first = await client.post("/api/predict/batch", json=distinct_rows(1000), headers=headers)
+        assert first.status_code == 200
+        calls = stub.requests
+
+        # 500 tokens left: a second 1k batch is refused before any row runs
+        second = await client.post("/api/predict/batch", json=distinct_rows(1000), headers=headers)
+        assert second.status_code == 429
+        assert int(second.headers["Retry-After"]) > 0
+        assert stub.requests == calls
+
+    run_as_new_user(backend, scenario)
+
+
+def test_a_batch_above_the_burst_is_rejected_as_too_large(backend):
+    async def scenario(client, headers, stub):
+        calls = stub.requests
+        response = await client.post("/api/predict/batch", json=distinct_rows(BATCH_BURST + 1), headers=headers)
+        assert response.status_code == 413
+        assert stub.requests == calls
+
+    run_as_new_user(backend, scenario)
@@ -0,0 +1,82 @@
+"""Keyset cursors: round-trips, ties on the sort key and rejected tokens.
+
+Pages are read the way the list endpoints read them, newest first with
+the id as tie-breaker, from mongomock.
+
+    python -m pytest tests
+"""
+import base64
+import filecmp
+import json
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import mongomock
+import pytest
+from fastapi import HTTPException
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+BACKEND_DIRS = [
+    REPO_ROOT / "HeartDiseasePrediction" / "backend",
+    REPO_ROOT / "SmartSpendAI - Expense Tracking and Management System" / "backend",
+]
+sys.path.insert(0, str(BACKEND_DIRS[0]))
+
+from pagination import build_keyset_filter, decode_cursor, encode_cursor  # noqa: E402
+
+
+def read_all_pages(collection, field: str, limit: int) -> list:
+    """Follow next cursors from the first page to the last, as a client would"""
+    ids, cursor = [], None
+    while True:
+        query = {"user_id": "u1"}
+        if cursor:
+            last_value, last_id = decode_cursor(cursor)
+            query = {"$and": [query, build_keyset_filter(field, last_value, last_id)]}
+        rows = list(collection.find(query).sort([(field, -1), ("id", -1)]).limit(limit + 1))
+        page, more = rows[:limit], len(rows) > limit
+        ids.extend(row["id"] for row in page)
+        if not more:
+            return ids
+        cursor = encode_cursor(page[-1][field], page[-1]["id"])
+
+
+def test_round_trip():
+    date = datetime(2026, 3, 14, 9, 26, 53, 589000)
+    cursor = encode_cursor(date, "a1b2")
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (date, "a1b2")
+
+
+def test_pages_split_ties_on_the_sort_key_by_id():
+    collection = mongomock.MongoClient().db.expenses
+    same_day = datetime(2026, 3, 1)
+    rows = [{"user_id": "u1", "id": f"e{i:02d}", "date": same_day} for i in range(7)]
+    rows += [{"user_id": "u1", "id": f"f{i:02d}", "date": same_day - timedelta(days=i)} for i in range(1, 5)]
+    rows.append({"user_id": "u2", "id": "e99", "date": same_day})
+    collection.insert_many(rows)
+
+    for limit in (1, 2, 3, 5, 50):
+        ids = read_all_pages(collection, "date", limit)
+        assert ids == [f"e{i:02d}" for i in reversed(range(7))] + [f"f{i:02d}" for i in range(1, 5)]
+
+
+@pytest.mark.parametrize("cursor", [
+    "garbage!",
+    "",
+    base64.urlsafe_b64encode(b"not json").decode(),
+    base64.urlsafe_b64encode(json.dumps({"v": "2026-03-01T00:00:00"}).encode()).decode(),
+    base64.urlsafe_b64encode(json.dumps({"v": "yesterday", "id": "e1"}).encode()).decode(),
+    base64.urlsafe_b64encode(json.dumps({"v": "2026-03-01T00:00:00", "id": {"$gt": ""}}).encode()).decode(),
+    base64.urlsafe_b64encode(json.dumps(["2026-03-01T00:00:00", "e1"]).encode()).decode(),
+    "é",
+])
+def test_rejects_tampered_cursors_with_400(cursor):
+    with pytest.raises(HTTPException) as raised:
+        decode_cursor(cursor)
+    assert raised.value.status_code == 400
+
+
+def test_backends_share_one_pagination_module():
+    assert filecmp.cmp(BACKEND_DIRS[0] / "pagination.py", BACKEND_DIRS[1] / "pagination.py", shallow=False)
@@ -0,0 +1,117 @@
+"""MongoBucketStore against a collection that evaluates its update pipeline.
+
+mongomock does not evaluate $$NOW, so `PipelineCollection` applies the
+handful of aggregation operators the store uses, against a clock the
+tests move by hand.
+
+    python -m pytest tests
+"""
+import asyncio
+import filecmp
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+from fastapi import HTTPException
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+BACKEND_DIRS = [
+    REPO_ROOT / "HeartDiseasePrediction" / "backend",
+    REPO_ROOT / "SmartSpendAI - Expense Tracking and Management System" / "backend",
+]
+sys.path.insert(0, str(BACKEND_DIRS[0]))
+
+from rate_limit import MongoBucketStore, RateLimit, RateLimiter  # noqa: E402
+
+
+class PipelineCollection:
+    def __init__(self):
+        self.now = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        self.docs = {}
+        self.fail = False
+
+    def advance(self, seconds: float):
+        self.now += timedelta(seconds=seconds)
+
+    def _eval(self, expr, doc):
+        if isinstance(expr, str):
+            if expr == "$$NOW":
+                return self.now
+            return doc.get(expr[1:]) if expr.startswith("$") else expr
+        if not isinstance(expr, dict):
+            return expr
+        (op, args), = expr.items()
+        values = [self._eval(arg, doc) for arg in args]
+        if op == "$ifNull":
+            return values[0] if values[0] is not None else values[1]
+        if op == "$subtract":
+            difference = values[0] - values[1]
+            return difference.total_seconds() * 1000 if isinstance(difference, timedelta) else difference
+        if op == "$cond":
+            return values[1] if values[0] else values[2]
+        operators = {
+            "$add": lambda a, b: a + b,
+            "$multiply": lambda a, b: a * b,
+            "$divide": lambda a, b: a / b,
+            "$min": min,
+            "$gte": lambda a, b: a >= b,
+        }
+        return operators[op](*values)
+
+    async def find_one_and_update(self, flt, pipeline, projection=None, upsert=False, return_document=None):
+        if self.fail:
+            raise ConnectionError("mongo down")
+        doc = dict(self.docs.get(flt["_id"], {"_id": flt["_id"]}))
+        for stage in pipeline:
+            # Fields in one $set are computed from the document as it was before the stage
+            doc.update({field: self._eval(expr, doc) for field, expr in stage["$set"].items()})
+        self.docs[flt["_id"]] = doc
+        return {field: doc[field] for field in ("_id", *projection)}
+
+
+def take(store, cost=1):
+    return asyncio.run(store.take("llm:u1", rate=0.5, burst=3, cost=cost))
+
+
+def test_denies_once_the_burst_is_spent():
+    store = MongoBucketStore(PipelineCollection())
+    assert [take(store) for _ in range(3)] == [0.0, 0.0, 0.0]
+    # Empty bucket at 0.5 tokens/s: one token is two seconds away
+    assert take(store) == pytest.approx(2.0)
+    assert store.collection.docs["llm:u1"]["tokens"] == pytest.approx(0.0)
+
+
+def test_refills_at_the_rate_up_to_the_burst():
+    collection = PipelineCollection()
+    store = MongoBucketStore(collection)
+    for _ in range(3):
+        take(store)
+    collection.advance(3)
+    assert take(store) == 0.0
+    # 1.5 refilled, 1 spent
+    assert take(store) == pytest.approx(1.0)
+    collection.advance(3600)
+    assert [take(store) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert take(store) > 0
+
+
+def test_falls_back_to_the_local_bucket_when_mongo_fails():
+    collection = PipelineCollection()
+    collection.fail = True
+    store = MongoBucketStore(collection)
+    assert [take(store) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert take(store) > 0
+    assert store.stats() == {"errors": 4, "fallback_keys": 1}
+
+
+def test_rejects_a_cost_above_the_burst():
+    limiter = RateLimiter(shared=MongoBucketStore(PipelineCollection()))
+    policy = RateLimit("llm", rate=0.5, burst=3, shared=True)
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(limiter.enforce(policy, "u1", cost=4))
+    assert raised.value.status_code == 413
+
+
+def test_backends_share_one_rate_limit_module():
+    assert filecmp.cmp(BACKEND_DIRS[0] / "rate_limit.py", BACKEND_DIRS[1] / "rate_limit.py", shallow=False)
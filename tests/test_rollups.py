@@ -0,0 +1,181 @@
+"""Incremental expense rollups agree with a rebuild from raw expenses.
+
+Expenses are written the way the expense routes write them: each create,
+update and delete applies `expense_deltas` of the before/after state,
+and bulk imports apply `merge_deltas`. The rollups kept that way must
+equal what `rebuild_rollups` computes from scratch.
+
+mongomock lacks `$type` and pymongo's current bulk operations, so the
+rebuild reads months with `$dateToString` (every date here is a BSON
+datetime) and bulk writes are replayed one operation at a time.
+
+    python -m pytest tests
+"""
+import asyncio
+import copy
+import random
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+from pymongo import DeleteMany, UpdateOne
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / "SmartSpendAI - Expense Tracking and Management System" / "backend"))
+
+import rollups  # noqa: E402
+from rollups import apply_deltas, expense_deltas, merge_deltas, rebuild_rollups  # noqa: E402
+
+CATEGORIES = ["Food & Dining", "Transportation", "Shopping", "Bills & Utilities"]
+
+
+class BulkWriteCollection:
+    """A mongomock-motor collection whose bulk_write replays each operation"""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    async def bulk_write(self, operations, ordered=True):
+        for operation in operations:
+            if isinstance(operation, UpdateOne):
+                await self.collection.update_one(operation._filter, operation._doc, upsert=operation._upsert)
+            elif isinstance(operation, DeleteMany):
+                await self.collection.delete_many(operation._filter)
+            else:
+                raise TypeError(f"unexpected bulk operation {operation!r}")
+
+
+class ExpenseStore:
+    """Raw expenses plus incrementally maintained rollups, written like the routes write them"""
+
+    def __init__(self):
+        db = AsyncMongoMockClient()["rollup_tests"]
+        self.expenses = db.expenses
+        self.rollups = BulkWriteCollection(db.expense_rollups)
+        self.ids = 0
+
+    def expense(self, user_id: str, month: int, category: str, amount: float, ai: bool = False) -> dict:
+        self.ids += 1
+        return {"id": f"e{self.ids}", "user_id": user_id, "date": datetime(2026, month, 1 + self.ids % 27, 12),
+                "category": category, "amount": amount, "ai_categorized": ai}
+
+    async def create(self, expense: dict):
+        await self.expenses.insert_one(dict(expense))
+        await apply_deltas(self.rollups, expense["user_id"], expense_deltas(None, expense))
+
+    async def import_many(self, user_id: str, expenses: list):
+        await self.expenses.insert_many([dict(expense) for expense in expenses])
+        await apply_deltas(self.rollups, user_id, merge_deltas(expenses))
+
+    async def update(self, expense_id: str, **changes) -> dict:
+        previous = await self.expenses.find_one({"id": expense_id}, {"_id": 0})
+        updated = {**previous, **changes}
+        await self.expenses.replace_one({"id": expense_id}, updated)
+        await apply_deltas(self.rollups, previous["user_id"], expense_deltas(previous, updated))
+        return updated
+
+    async def delete(self, expense_id: str):
+        deleted = await self.expenses.find_one_and_delete({"id": expense_id}, {"_id": 0})
+        await apply_deltas(self.rollups, deleted["user_id"], expense_deltas(deleted, None))
+
+
+@pytest.fixture(autouse=True)
+def datetime_months(monkeypatch):
+    pipeline = copy.deepcopy(rollups.ROLLUP_PIPELINE)
+    pipeline[0]["$project"]["month"] = {"$dateToString": {"format": "%Y-%m", "date": "$date"}}
+    monkeypatch.setattr(rollups, "ROLLUP_PIPELINE", pipeline)
+
+
+async def rollup_rows(collection) -> list:
+    rows = await collection.find({}, {"_id": 0, "updated_at": 0}).to_list(None)
+    return sorted(
+        (row["user_id"], row["month"], row["category"], round(row["total"], 2), row["count"],
+         row["ai_categorized_count"])
+        for row in rows
+    )
+
+
+async def assert_matches_rebuild(store: ExpenseStore):
+    # Verifying the incremental rollups finds no drift ...
+    report = await rebuild_rollups(store.expenses, store.rollups, repair=False)
+    assert (report["missing"], report["mismatched"], report["extra"]) == (0, 0, 0)
+    # ... and a rebuild into an empty collection produces the same rows
+    fresh = BulkWriteCollection(AsyncMongoMockClient()["rollup_tests"].fresh_rollups)
+    await rebuild_rollups(store.expenses, fresh, repair=True)
+    assert await rollup_rows(store.rollups) == await rollup_rows(fresh)
+
+
+def test_create_update_and_delete_match_a_rebuild():
+    async def scenario():
+        store = ExpenseStore()
+        lunch = store.expense("u1", 3, "Food & Dining", 12.5, ai=True)
+        taxi = store.expense("u1", 3, "Transportation", 30.0)
+        rent = store.expense("u1", 4, "Bills & Utilities", 1200.0)
+        for expense in (lunch, taxi, rent):
+            await store.create(expense)
+        await store.import_many("u1", [store.expense("u1", 3, "Shopping", 40.0, ai=True),
+                                       store.expense("u1", 4, "Shopping", 15.25)])
+        await store.create(store.expense("u2", 3, "Food & Dining", 8.0))
+
+        # Moving the only transportation expense empties its bucket, which must disappear
+        await store.update(taxi["id"], category="Shopping", ai_categorized=True)
+        await store.update(rent["id"], date=datetime(2026, 5, 1), amount=1250.0)
+        await store.delete(lunch["id"])
+        await assert_matches_rebuild(store)
+
+        rows = await rollup_rows(store.rollups)
+        assert not [row for row in rows if row[0] == "u1" and row[2] in ("Transportation", "Food & Dining")]
+        assert ("u1", "2026-03", "Shopping", 70.0, 2, 2) in rows
+        assert not [row for row in rows if row[1] == "2026-04" and row[2] == "Bills & Utilities"]
+
+        # A user whose last expense is deleted keeps no buckets at all
+        u2_expense = await store.expenses.find_one({"user_id": "u2"})
+        await store.delete(u2_expense["id"])
+        assert not [row for row in await rollup_rows(store.rollups) if row[0] == "u2"]
+        await assert_matches_rebuild(store)
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_random_write_sequences_match_a_rebuild(seed):
+    async def scenario():
+        rng = random.Random(seed)
+        store = ExpenseStore()
+        live = []
+
+        def random_expense():
+            return store.expense(rng.choice(["u1", "u2", "u3"]), rng.randint(1, 4), rng.choice(CATEGORIES),
+                                 round(rng.uniform(1, 200), 2), ai=rng.random() < 0.3)
+
+        for _ in range(150):
+            action = rng.random()
+            if action < 0.35 or not live:
+                expense = random_expense()
+                await store.create(expense)
+                live.append(expense["id"])
+            elif action < 0.45:
+                expenses = [random_expense() for _ in range(rng.randint(1, 5))]
+                user_id = expenses[0]["user_id"]
+                expenses = [{**expense, "user_id": user_id} for expense in expenses]
+                await store.import_many(user_id, expenses)
+                live.extend(expense["id"] for expense in expenses)
+            elif action < 0.75:
+                changes = rng.choice([
+                    {"category": rng.choice(CATEGORIES)},
+                    {"amount": round(rng.uniform(1, 200), 2)},
+                    {"date": datetime(2026, rng.randint(1, 4), 15)},
+                    {"ai_categorized": rng.random() < 0.5},
+                ])
+                await store.update(rng.choice(live), **changes)
+            else:
+                expense_id = live.pop(rng.randrange(len(live)))
+                await store.delete(expense_id)
+        await assert_matches_rebuild(store)
+
+    asyncio.run(scenario())
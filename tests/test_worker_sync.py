@@ -0,0 +1,87 @@
+"""WorkerRegistry's JWT secret check across expired and re-created worker documents.
+
+mongomock never runs TTL expiry, so tests delete a worker's document to
+stand in for it.
+
+    python -m pytest tests
+"""
+import asyncio
+import filecmp
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+BACKEND_DIRS = [
+    REPO_ROOT / "HeartDiseasePrediction" / "backend",
+    REPO_ROOT / "SmartSpendAI - Expense Tracking and Management System" / "backend",
+]
+sys.path.insert(0, str(BACKEND_DIRS[0]))
+
+from worker_sync import SecretMismatchError, WorkerRegistry, secret_fingerprint  # noqa: E402
+
+FINGERPRINT = secret_fingerprint("shared-secret")
+
+
+def workers_collection():
+    return AsyncMongoMockClient()["worker_sync_tests"]["workers"]
+
+
+def test_a_worker_doc_re_created_by_its_heartbeat_keeps_its_identity():
+    async def scenario():
+        collection = workers_collection()
+        first = WorkerRegistry(collection)
+        await first.start(FINGERPRINT)
+        original = await collection.find_one({"_id": first.worker_id})
+
+        # The heartbeat stalled past the TTL and the document expired
+        await collection.delete_one({"_id": first.worker_id})
+        await first._beat()
+        recreated = await collection.find_one({"_id": first.worker_id})
+        for field in ("jwt_fingerprint", "host", "pid", "started_at"):
+            assert recreated[field] == original[field]
+
+        # A worker starting next sees only matching secrets
+        second = WorkerRegistry(collection)
+        await second.start(FINGERPRINT)
+        assert len(await second.live_workers()) == 2
+        await first.stop()
+        await second.stop()
+
+    asyncio.run(scenario())
+
+
+def test_documents_without_a_fingerprint_do_not_trip_the_check():
+    async def scenario():
+        collection = workers_collection()
+        # Left behind by an older heartbeat that upserted only last_seen
+        await collection.insert_one({"_id": "bare", "last_seen": datetime.now(timezone.utc)})
+        registry = WorkerRegistry(collection)
+        await registry.start(FINGERPRINT)
+        await registry.stop()
+
+    asyncio.run(scenario())
+
+
+def test_a_different_secret_is_still_refused():
+    async def scenario():
+        collection = workers_collection()
+        running = WorkerRegistry(collection)
+        await running.start(FINGERPRINT)
+        await collection.delete_one({"_id": running.worker_id})
+        await running._beat()
+
+        newcomer = WorkerRegistry(collection)
+        with pytest.raises(SecretMismatchError):
+            await newcomer.start(secret_fingerprint("another-secret"))
+        assert await collection.find_one({"_id": newcomer.worker_id}) is None
+        await running.stop()
+
+    asyncio.run(scenario())
+
+
+def test_backends_share_one_worker_sync_module():
+    assert filecmp.cmp(BACKEND_DIRS[0] / "worker_sync.py", BACKEND_DIRS[1] / "worker_sync.py", shallow=False)